@@ -0,0 +1,161 @@
+# Prospe/benchmarks/acumulados.py
+"""
+Comprueba los resúmenes leídos de los acumulados (datos/acumulados.py)
+contra agrupar las filas filtradas (agrupar(aplicar_especificacion(...))),
+con filtros de valores y rangos de fechas al azar, tanto con los acumulados
+recién construidos como leídos del snapshot en disco. Cuenta cuántas
+consultas resolvió el acumulado y cuántas tuvieron que ir a las filas.
+
+    python benchmarks/acumulados.py [filas] [consultas]
+"""
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos import acumulados, snapshot
+from datos.acumulados import obtener_acumulados, resumir_acumulados
+from datos.motor_analitico import agrupar
+from datos.motor_kpis import COLUMNAS_KPI, FUENTES_KPIS, GRANOS_KPIS, preparar_filas_kpis
+from filtros.especificacion import aplicar_especificacion, fechas, valores
+
+FILAS_POR_DEFECTO = 20_000
+CONSULTAS_POR_DEFECTO = 200
+INICIO = pd.Timestamp("2024-01-01")
+DIAS = 500
+
+
+def hoja_kpis(filas, rng):
+    # Una hoja semanal de KPIs cruda, limpia con la misma preparación que el motor de KPIs.
+    dias = INICIO + pd.to_timedelta(rng.integers(0, DIAS, size=filas), unit="D")
+    crudo = pd.DataFrame({
+        "Fecha": dias.strftime("%d/%m/%Y"),
+        "Invites enviadas": rng.integers(0, 50, size=filas).astype(str),
+        "Mensajes Enviados": rng.integers(0, 30, size=filas).astype(str),
+        "Respuestas": rng.choice(["1", "2", "3 - Realizadas", ""], size=filas),
+        "Sesiones agendadas": rng.choice(["si", "no", "1", "0", ""], size=filas),
+        "Analista": rng.choice(["Ana", "Beto", "", " Ana "], size=filas),
+        "Región": rng.choice(["Norte", "Sur", ""], size=filas),
+    })
+    return preparar_filas_kpis(crudo, FUENTES_KPIS["semanales"]).reset_index(drop=True)
+
+
+def sesiones(filas, rng):
+    # Como la vista de Sesiones: claves Int64 con vacíos, categóricas y texto.
+    df = pd.DataFrame({"Fecha": INICIO + pd.to_timedelta(rng.integers(0, DIAS, size=filas), unit="D")})
+    df["Año"] = df["Fecha"].dt.year.astype("Int64")
+    df["NumSemana"] = df["Fecha"].dt.isocalendar().week.astype("Int64")
+    df.loc[rng.random(filas) < 0.02, "NumSemana"] = pd.NA
+    df["AñoMes"] = df["Fecha"].dt.strftime("%Y-%m")
+    df["AE"] = pd.Categorical(rng.choice(["Ana", "Beto", "No Asignado Ae"], size=filas))
+    df["País"] = rng.choice(["Mexico", "Chile", "No Especificado"], size=filas)
+    df["Proceso"] = rng.choice(["Outbound", "Inbound", None], size=filas)
+    return df.sort_values("Fecha", ignore_index=True)
+
+
+def dia_al_azar(rng, probabilidad=0.5):
+    if rng.random() >= probabilidad:
+        return None
+    return (INICIO + pd.Timedelta(days=int(rng.integers(0, DIAS)))).date()
+
+
+def rango_al_azar(rng):
+    # La mitad de las veces semanas completas (lunes a domingo), que el acumulado semanal resuelve.
+    desde, hasta = dia_al_azar(rng), dia_al_azar(rng)
+    if desde is not None and rng.random() < 0.5:
+        desde -= dt.timedelta(days=desde.weekday())
+        hasta = desde + dt.timedelta(days=int(rng.integers(1, 9)) * 7 - 1)
+    return fechas("Fecha", desde, hasta)
+
+
+def elegir(rng, opciones):
+    return list(rng.choice(opciones, size=rng.integers(0, len(opciones)), replace=False))
+
+
+CASOS = {
+    "kpis": {
+        "datos": hoja_kpis, "granos": GRANOS_KPIS, "sumas": COLUMNAS_KPI,
+        "grupos": (["Año", "NumSemana"], ["AñoMes"], ["Analista"], ["Año", "NumSemana", "Analista"],
+                   ["Año", "MesNum", "AñoMes"], ["Mes"]),
+        "especificacion": lambda rng: [
+            rango_al_azar(rng), valores("Analista", elegir(rng, ["Ana", "Beto", "N/D"])),
+            valores("Región", elegir(rng, ["Norte", "Sur", "N/D"])),
+            valores("Año", 2024 if rng.random() < 0.3 else None)],
+    },
+    "sesiones": {
+        "datos": sesiones, "sumas": (),
+        "granos": {"semanal": ("Año", "NumSemana", "AE", "País", "Proceso"),
+                   "mensual": ("Año", "AñoMes", "AE", "País", "Proceso")},
+        "grupos": (["Año", "NumSemana"], ["AñoMes", "AE"], ["País"]),
+        "especificacion": lambda rng: [
+            rango_al_azar(rng), valores("AE", elegir(rng, ["Ana", "Beto"])),
+            valores("País", elegir(rng, ["Mexico", "Chile"])),
+            valores("NumSemana", [3, 4] if rng.random() < 0.2 else []),
+            valores("Proceso", ["Outbound"] if rng.random() < 0.2 else None)],
+    },
+}
+
+
+def comprobar(nombre, caso, filas, consultas, rng):
+    df = caso["datos"](filas, rng)
+    sumas = list(caso["sumas"])
+    especificaciones = [caso["especificacion"](rng) for _ in range(consultas)]
+    for origen in ("construidos", "leídos de disco"):
+        acumulado = obtener_acumulados(f"benchmark_{nombre}", df, caso["granos"], sumas)
+        if origen == "leídos de disco":
+            assert all(snapshot.leer_snapshot(f"acumulado_benchmark_{nombre}_{grano}") is not None
+                       for grano in caso["granos"])
+        a_filas = [0]
+        agrupar_filas = acumulados.agrupar
+
+        def contar(*args, **kwargs):
+            a_filas[0] += 1
+            return agrupar_filas(*args, **kwargs)
+
+        # Tiempos solo de las consultas que resolvió el acumulado, frente a agrupar sus filas.
+        t_acumulados = t_filas = 0.0
+        acumulados.agrupar = contar
+        try:
+            for especificacion in especificaciones:
+                for grupos in caso["grupos"]:
+                    a_filas_antes = a_filas[0]
+                    inicio = time.perf_counter()
+                    resumen = resumir_acumulados(acumulado, df, especificacion, grupos, sumas)
+                    t_resumen = time.perf_counter() - inicio
+                    inicio = time.perf_counter()
+                    esperado = agrupar(aplicar_especificacion(df, especificacion), grupos, sumas)
+                    if a_filas[0] == a_filas_antes:
+                        t_acumulados += t_resumen
+                        t_filas += time.perf_counter() - inicio
+                    pd.testing.assert_frame_equal(resumen.reset_index(drop=True), esperado,
+                                                  check_dtype=not esperado.empty,
+                                                  check_categorical=not esperado.empty)
+        finally:
+            acumulados.agrupar = agrupar_filas
+        total = consultas * len(caso["grupos"])
+        print(f"  {nombre} ({origen}): {total - a_filas[0]} de {total} consultas desde el acumulado")
+        print(f"    esas consultas desde los acumulados: {t_acumulados:8.3f} s")
+        print(f"    esas consultas agrupando las filas:  {t_filas:8.3f} s")
+
+
+def main(filas=FILAS_POR_DEFECTO, consultas=CONSULTAS_POR_DEFECTO):
+    rng = np.random.default_rng(0)
+    print(f"{filas:,} filas por caso, {consultas} especificaciones al azar")
+    with tempfile.TemporaryDirectory() as directorio:
+        # Los snapshots del benchmark no se mezclan con los de la aplicación.
+        snapshot.DIRECTORIO_SNAPSHOTS = directorio
+        for nombre, caso in CASOS.items():
+            comprobar(nombre, caso, filas, consultas, rng)
+    print("  resultados idénticos")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else FILAS_POR_DEFECTO,
+         int(sys.argv[2]) if len(sys.argv) > 2 else CONSULTAS_POR_DEFECTO)
@@ -0,0 +1,162 @@
+# Prospe/benchmarks/filtros_indice.py
+"""
+Comprueba el filtrado del dashboard por índice de bitmaps
+(filtros/indice_filtros.py) y por especificación (filtros/especificacion.py)
+contra un filtrado directo con pandas, fila a fila como lo hacía la página:
+mismas filas con y sin índice, mismos conteos de la barra lateral y mismas
+agregaciones (datos/motor_analitico.agrupar) con cada motor disponible.
+
+    python benchmarks/filtros_indice.py [filas] [consultas]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos import motor_analitico
+from datos.carga_datos import COLUMNA_FECHA_INVITE, limpiar_datos_base
+from datos.motor_analitico import agrupar
+from filtros.aplicar_filtros import aplicar_filtros, conteos_facetas, especificacion_dashboard
+from filtros.especificacion import aplicar_especificacion
+from filtros.indice_filtros import (COLUMNA_FECHA_INDICE, DIMENSIONES_INDICE, DIMENSIONES_SI_NO_INDICE,
+                                    construir_indice_filtros)
+from utils.limpieza import (EMBUDO_INVITE_ACEPTADA, EMBUDO_OPORTUNIDAD, EMBUDO_RESPUESTA, EMBUDO_SESION,
+                            agregar_columnas_embudo)
+
+FILAS_POR_DEFECTO = 50_000
+CONSULTAS_POR_DEFECTO = 200
+# Valores de cada columna de la barra lateral, con vacíos y variantes como en la hoja.
+VALORES_HOJA = {
+    "Fuente de la Lista": ["Linkedin", "Evento", "Referido", "", "N/A"],
+    "Proceso": ["Outbound", "Inbound", "Reactivación", ""],
+    "Pais": ["Mexico", "Chile", "Colombia", "Peru", ""],
+    "Industria": ["Retail", "Finanzas", "Salud", "Tecnología", ""],
+    "Avatar": ["ceo", "Director", "gerente", "CEO ", ""],
+    "¿Quién Prospecto?": ["Ana", "Beto", "Carla", ""],
+    "¿Invite Aceptada?": ["Si", "si ", "No", "", "SI"],
+    "Sesion Agendada?": ["Si", "No", "", "no"],
+    "Respuesta Primer Mensaje": ["Si", "No", "", "Interesado"],
+}
+SUMAS = [EMBUDO_INVITE_ACEPTADA, EMBUDO_RESPUESTA, EMBUDO_SESION, EMBUDO_OPORTUNIDAD]
+
+
+def vista_dashboard(filas, semilla=0):
+    # La hoja cruda pasa por la misma limpieza que la vista del dashboard.
+    rng = np.random.default_rng(semilla)
+    fechas = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 700, size=filas), unit="D")
+    crudo = pd.DataFrame({columna: rng.choice(v, size=filas) for columna, v in VALORES_HOJA.items()})
+    crudo[COLUMNA_FECHA_INVITE] = np.where(rng.random(filas) < 0.01, "", fechas.strftime("%d/%m/%Y"))
+    crudo["Fecha Primer Mensaje"] = rng.choice(["", "05/02/2024", "no"], size=filas)
+    return agregar_columnas_embudo(limpiar_datos_base(crudo))
+
+
+def filtros_al_azar(df, rng):
+    # Los argumentos de aplicar_filtros: por columna "– Todos –", una lista de valores o nada.
+    filtros = []
+    for columna in DIMENSIONES_INDICE:
+        opciones = sorted(df[columna].astype(object).astype(str).unique())
+        sorteo = rng.random()
+        if sorteo < 0.5:
+            filtros.append(["– Todos –"])
+        elif sorteo < 0.6:
+            filtros.append([])
+        else:
+            filtros.append(list(rng.choice(opciones, size=rng.integers(1, 3), replace=False)))
+    for _ in DIMENSIONES_SI_NO_INDICE:
+        filtros.append(rng.choice(["– Todos –", "Si", "No"]))
+    if rng.random() < 0.5:
+        desde = pd.Timestamp("2023-01-01") + pd.Timedelta(days=int(rng.integers(0, 700)))
+        filtros += [desde.date(), (desde + pd.Timedelta(days=int(rng.integers(0, 200)))).date()]
+    else:
+        filtros += [None, None]
+    return filtros
+
+
+def filtrar_referencia(df, *filtros):
+    # Referencia: una máscara por filtro directamente sobre las columnas, sin índice ni especificación.
+    mascara = pd.Series(True, index=df.index)
+    for columna, seleccion in zip(DIMENSIONES_INDICE, filtros):
+        if seleccion and "– Todos –" not in seleccion:
+            mascara &= df[columna].astype(object).astype(str).isin(seleccion)
+    for columna, seleccion in zip(DIMENSIONES_SI_NO_INDICE, filtros[len(DIMENSIONES_INDICE):]):
+        if seleccion != "– Todos –":
+            mascara &= df[columna].astype(str).str.strip().str.lower() == seleccion.strip().lower()
+    fecha_ini, fecha_fin = filtros[-2:]
+    if fecha_ini and fecha_fin:
+        dias = df[COLUMNA_FECHA_INDICE].dt.normalize()
+        mascara &= (dias >= pd.Timestamp(fecha_ini)) & (dias <= pd.Timestamp(fecha_fin))
+    return df[mascara]
+
+
+def conteos_referencia(df, *filtros):
+    conteos = {}
+    for posicion, columna in enumerate(DIMENSIONES_INDICE + DIMENSIONES_SI_NO_INDICE):
+        otros = list(filtros)
+        otros[posicion] = None if columna in DIMENSIONES_INDICE else "– Todos –"
+        serie = filtrar_referencia(df, *otros)[columna].astype(object).astype(str)
+        if columna in DIMENSIONES_SI_NO_INDICE:
+            serie = serie.str.strip().str.lower()
+        conteos[columna] = serie.value_counts().to_dict()
+    return conteos
+
+
+def agrupar_referencia(df, grupos):
+    agrupado = df.groupby(grupos, observed=True)
+    return pd.concat([agrupado.size().rename("n"), agrupado[SUMAS].sum()], axis=1).reset_index()
+
+
+def _cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def main(filas=FILAS_POR_DEFECTO, consultas=CONSULTAS_POR_DEFECTO):
+    df = vista_dashboard(filas)
+    indice, t_indice = _cronometrar(lambda: construir_indice_filtros(df))
+    print(f"Vista del dashboard sintética: {len(df):,} filas; índice construido en {t_indice:.3f} s")
+
+    motores = ["pandas"] + (["duckdb"] if motor_analitico.duckdb is not None else [])
+    usar_duckdb = motor_analitico.usar_duckdb
+    rng = np.random.default_rng(1)
+    lotes = [filtros_al_azar(df, rng) for _ in range(consultas)]
+    for motor in motores:
+        motor_analitico.usar_duckdb = lambda motor=motor: motor == "duckdb"
+        t_indice = t_sin_indice = t_referencia = 0.0
+        try:
+            for filtros in lotes:
+                referencia, t = _cronometrar(lambda: filtrar_referencia(df, *filtros))
+                t_referencia += t
+                con_indice, t = _cronometrar(lambda: aplicar_filtros(df, *filtros, indice=indice))
+                t_indice += t
+                sin_indice, t = _cronometrar(lambda: aplicar_especificacion(df, especificacion_dashboard(*filtros)))
+                t_sin_indice += t
+                pd.testing.assert_frame_equal(con_indice, referencia)
+                pd.testing.assert_frame_equal(sin_indice, referencia)
+
+                conteos = conteos_facetas(indice, *filtros)
+                esperados = conteos_referencia(df, *filtros)
+                for columna, por_valor in conteos.items():
+                    assert {v: n for v, n in por_valor.items() if n} == esperados[columna], columna
+
+                for grupos in (["Pais"], ["¿Quién Prospecto?", "Avatar"]):
+                    pd.testing.assert_frame_equal(agrupar(con_indice, grupos, SUMAS),
+                                                  agrupar_referencia(referencia, grupos),
+                                                  check_dtype=not referencia.empty)
+        finally:
+            motor_analitico.usar_duckdb = usar_duckdb
+        print(f"  motor {motor}: {consultas} consultas")
+        print(f"    máscaras pandas (referencia): {t_referencia:8.3f} s")
+        print(f"    especificación sin índice:    {t_sin_indice:8.3f} s")
+        print(f"    especificación con índice:    {t_indice:8.3f} s")
+    print("  filas, conteos de la barra lateral y agregaciones: resultados idénticos")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else FILAS_POR_DEFECTO,
+         int(sys.argv[2]) if len(sys.argv) > 2 else CONSULTAS_POR_DEFECTO)
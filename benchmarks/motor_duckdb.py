@@ -0,0 +1,143 @@
+# Prospe/benchmarks/motor_duckdb.py
+"""
+Comprueba el motor duckdb de datos/motor_analitico.py contra pandas: con
+especificaciones y agrupaciones al azar sobre columnas como las de las
+vistas (categóricas, texto con vacíos y variantes, Int64 con nulos, fechas
+con NaT, enteros pequeños que desbordan al sumar), aplicar_especificacion y
+agrupar deben dar el mismo DataFrame con los dos motores. Cuenta cuántas
+consultas resolvió el SQL y cuántas se repitieron con pandas. Sin DuckDB
+instalado (requirements-duckdb.txt) no hay nada que comprobar.
+
+    python benchmarks/motor_duckdb.py [filas] [consultas]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos import motor_analitico
+from datos.motor_analitico import agrupar
+from filtros.especificacion import aplicar_especificacion, fechas, valores
+
+FILAS_POR_DEFECTO = 50_000
+CONSULTAS_POR_DEFECTO = 200
+INICIO = pd.Timestamp("2024-01-01")
+DIAS = 500
+# Valores de las columnas de texto, con vacíos y variantes como en las hojas.
+VALORES_TEXTO = {
+    "Pais": ["Mexico", "Chile", "Peru", None, np.nan],
+    "Respuesta": ["Si", " si", "SI ", "No", "no", "", None],
+    "Mixta": [1, "1", "Otro", None],
+}
+GRUPOS = (["Analista"], ["Pais"], ["Año", "NumSemana"], ["Analista", "Pais"], ["Respuesta"], ["Mixta"])
+SUMAS = ["Invites", "Sesion", "Respuestas", "Monto"]
+
+
+def vista(filas, rng):
+    dias = INICIO + pd.to_timedelta(rng.integers(0, DIAS, size=filas), unit="D")
+    df = pd.DataFrame({"Fecha": dias.where(rng.random(filas) >= 0.01)})
+    df["Año"] = df["Fecha"].dt.year.astype("Int64")
+    df["NumSemana"] = df["Fecha"].dt.isocalendar().week.astype("Int64")
+    # Con una categoría sin filas, que groupby(observed=True) no devuelve.
+    df["Analista"] = pd.Categorical(rng.choice(["Ana", "Beto", "Carla"], size=filas),
+                                    categories=["Ana", "Beto", "Carla", "Sin Filas"])
+    for columna, opciones in VALORES_TEXTO.items():
+        df[columna] = pd.Series(opciones, dtype=object).iloc[rng.integers(0, len(opciones), size=filas)].to_numpy()
+    df["Invites"] = rng.integers(0, 100, size=filas).astype(np.int8)
+    df["Sesion"] = rng.random(filas) < 0.3
+    df["Respuestas"] = pd.array(rng.integers(0, 5, size=filas), dtype="Int64")
+    df.loc[rng.random(filas) < 0.05, "Respuestas"] = pd.NA
+    df["Monto"] = np.where(rng.random(filas) < 0.05, np.nan, rng.random(filas) * 1000)
+    return df
+
+
+def dia_al_azar(rng):
+    if rng.random() < 0.5:
+        return None
+    return (INICIO + pd.Timedelta(days=int(rng.integers(0, DIAS)))).date()
+
+
+def elegir(rng, opciones):
+    return list(rng.choice(np.array(opciones, dtype=object), size=rng.integers(0, len(opciones)), replace=False))
+
+
+def especificacion_al_azar(rng):
+    return [
+        fechas("Fecha", dia_al_azar(rng), dia_al_azar(rng)),
+        valores("Analista", elegir(rng, ["Ana", "Beto", "Sin Filas", "N/D"])),
+        valores("Pais", elegir(rng, ["Mexico", "Chile", "nan", "N/D"])),
+        valores("Respuesta", elegir(rng, ["si", "no", "", "none"]), normalizar=True),
+        valores("Año", 2024 if rng.random() < 0.3 else None),
+        valores("Mixta", elegir(rng, [1, "1", "Otro"]) if rng.random() < 0.2 else None),
+    ]
+
+
+def main(filas=FILAS_POR_DEFECTO, consultas=CONSULTAS_POR_DEFECTO):
+    if motor_analitico.duckdb is None:
+        print("DuckDB no está instalado (pip install -r requirements-duckdb.txt): nada que comprobar")
+        return
+    rng = np.random.default_rng(0)
+    df = vista(filas, rng)
+    especificaciones = [especificacion_al_azar(rng) for _ in range(consultas)]
+    print(f"{filas:,} filas, {consultas} especificaciones al azar, {len(GRUPOS)} agrupaciones cada una")
+
+    usar_duckdb, posiciones_consulta = motor_analitico.usar_duckdb, motor_analitico.posiciones_consulta
+    agrupar_sql = motor_analitico._agrupar_sql
+    # Solo cuentan las llamadas con el motor duckdb: [intentadas, repetidas con pandas].
+    intentos = {"filtros": [0, 0], "agregaciones": [0, 0]}
+
+    def contar_posiciones(*args, **kwargs):
+        posiciones = posiciones_consulta(*args, **kwargs)
+        if motor_analitico.usar_duckdb():
+            intentos["filtros"][0] += 1
+            intentos["filtros"][1] += posiciones is None
+        return posiciones
+
+    def contar_agrupar(*args, **kwargs):
+        intentos["agregaciones"][0] += 1
+        try:
+            return agrupar_sql(*args, **kwargs)
+        except motor_analitico._ERRORES_SQL:
+            intentos["agregaciones"][1] += 1
+            raise
+
+    t = {"pandas": [0.0, 0.0], "duckdb": [0.0, 0.0]}
+    especificacion_mod = sys.modules["filtros.especificacion"]
+    especificacion_mod.posiciones_consulta = contar_posiciones
+    motor_analitico._agrupar_sql = contar_agrupar
+    try:
+        for especificacion in especificaciones:
+            resultados = {}
+            for motor in t:
+                motor_analitico.usar_duckdb = lambda motor=motor: motor == "duckdb"
+                inicio = time.perf_counter()
+                filtrado = aplicar_especificacion(df, especificacion)
+                t[motor][0] += time.perf_counter() - inicio
+                inicio = time.perf_counter()
+                agrupados = [agrupar(filtrado, grupos, SUMAS) for grupos in GRUPOS]
+                t[motor][1] += time.perf_counter() - inicio
+                resultados[motor] = filtrado, agrupados
+            (filtrado, agrupados), (filtrado_sql, agrupados_sql) = resultados["pandas"], resultados["duckdb"]
+            pd.testing.assert_frame_equal(filtrado_sql, filtrado)
+            for esperado, obtenido in zip(agrupados, agrupados_sql):
+                pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=not esperado.empty)
+    finally:
+        motor_analitico.usar_duckdb = usar_duckdb
+        especificacion_mod.posiciones_consulta = posiciones_consulta
+        motor_analitico._agrupar_sql = agrupar_sql
+
+    for nombre, (total, a_pandas) in intentos.items():
+        print(f"  {nombre} con SQL: {total - a_pandas} de {total} (el resto repetidos con pandas)")
+    for motor, (t_filtros, t_agregaciones) in t.items():
+        print(f"  motor {motor:<7} filtros: {t_filtros:8.3f} s   agregaciones: {t_agregaciones:8.3f} s")
+    print("  resultados idénticos")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else FILAS_POR_DEFECTO,
+         int(sys.argv[2]) if len(sys.argv) > 2 else CONSULTAS_POR_DEFECTO)
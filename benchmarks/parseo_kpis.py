@@ -0,0 +1,79 @@
+# Prospe/benchmarks/parseo_kpis.py
+"""
+Compara el parseo de una hoja semanal de KPIs celda a celda (el antiguo
+parse_kpi_value con .apply) con datos/kpis.parsear_valores_kpi, y comprueba
+que ambos dan el mismo resultado.
+
+    python benchmarks/parseo_kpis.py [filas]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos.kpis import AFIRMATIVOS_SESION, parsear_valores_kpi
+
+FILAS_POR_DEFECTO = 50_000
+KPI_COLUMNS_ORDERED = ["Invites enviadas", "Mensajes Enviados", "Respuestas", "Sesiones agendadas"]
+# Lo que se encuentra en las hojas: números, vacíos, "n - texto", respuestas sí/no y ruido.
+VALORES_HOJA = ["0", "1", "2", "3", "12", "25", "7.0", " 4 ", "", "  ", "nan", "N/A",
+                "3 - Realizadas", "10-2", "- 5", "Si", "sí", "VC", "yes", "no", "pendiente"]
+
+
+def parse_kpi_value(value_str, column_name=""):
+    # Implementación celda a celda que reemplaza parsear_valores_kpi (referencia del benchmark).
+    cleaned_val = str(value_str).strip().lower()
+    if not cleaned_val: return 0.0
+    try:
+        num_val = pd.to_numeric(cleaned_val, errors='raise')
+        return 0.0 if pd.isna(num_val) else float(num_val)
+    except ValueError:
+        pass
+    if column_name == "Sesiones agendadas":
+        if cleaned_val in ['vc', 'si', 'sí', 'yes', 'true', '1', '1.0']: return 1.0
+        return 0.0
+    first_part = cleaned_val.split('-')[0].strip()
+    if not first_part: return 0.0
+    try:
+        num_val_from_part = pd.to_numeric(first_part, errors='raise')
+        return 0.0 if pd.isna(num_val_from_part) else float(num_val_from_part)
+    except ValueError:
+        return 0.0
+
+
+def hoja_semanal(filas, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({col: rng.choice(VALORES_HOJA, size=filas) for col in KPI_COLUMNS_ORDERED})
+
+
+def _cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def main(filas=FILAS_POR_DEFECTO):
+    df = hoja_semanal(filas)
+    celdas = filas * len(KPI_COLUMNS_ORDERED)
+    print(f"Hoja semanal sintética: {filas:,} filas x {len(KPI_COLUMNS_ORDERED)} KPIs ({celdas:,} celdas)")
+
+    antes, t_antes = _cronometrar(lambda: {
+        col: df[col].apply(parse_kpi_value, column_name=col) for col in KPI_COLUMNS_ORDERED})
+    despues, t_despues = _cronometrar(lambda: {
+        col: parsear_valores_kpi(df[col], AFIRMATIVOS_SESION if col == "Sesiones agendadas" else ())
+        for col in KPI_COLUMNS_ORDERED})
+
+    for col in KPI_COLUMNS_ORDERED:
+        pd.testing.assert_series_equal(antes[col], despues[col], check_names=False)
+    print(f"  celda a celda (.apply):  {t_antes:8.3f} s")
+    print(f"  por columna:             {t_despues:8.3f} s")
+    print(f"  aceleración:             {t_antes / t_despues:8.1f}x  (resultados idénticos)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else FILAS_POR_DEFECTO)
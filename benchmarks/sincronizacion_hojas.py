@@ -0,0 +1,194 @@
+# Prospe/benchmarks/sincronizacion_hojas.py
+"""
+Comprueba la sincronización incremental de hojas (datos/sincronizacion.py)
+contra una lectura completa: sobre una hoja simulada se editan, añaden,
+insertan y borran filas dentro y fuera de la ventana de la cola (VENTANA_COLA)
+y, tras sincronizar, las filas limpias deben ser las mismas que limpiando la
+hoja entera. Las ediciones fuera de la ventana solo se recogen en la
+resincronización periódica (RESINCRONIZAR_CADA), y el script lo comprueba.
+
+    python benchmarks/sincronizacion_hojas.py [filas]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos.motor_kpis import FUENTES_KPIS, preparar_filas_kpis
+from datos.sincronizacion import PRIMERA_FILA_DATOS, RESINCRONIZAR_CADA, VENTANA_COLA, sincronizar_hoja
+
+FILAS_POR_DEFECTO = 2_000
+ENCABEZADOS = ["Fecha", "Invites enviadas", "Mensajes Enviados", "Respuestas", "Sesiones agendadas",
+               "Mes", "Semana", "Analista", "Región"]
+CONFIG = FUENTES_KPIS["semanales"]
+
+
+class HojaSimulada:
+    """Lo que usa la sincronización de un gspread.Worksheet, sobre una lista de filas."""
+
+    def __init__(self, valores, filas_extra=50):
+        self.valores = [list(f) for f in valores]
+        self.filas_extra = filas_extra
+        self.llamadas = 0
+
+    @property
+    def row_count(self):
+        # La cuadrícula de Sheets suele tener filas vacías después de los datos.
+        return len(self.valores) + self.filas_extra
+
+    def get_all_values(self):
+        self.llamadas += 1
+        return [list(f) for f in self.valores]
+
+    def _rango(self, rango):
+        inicio, fin = (int(n) for n in rango.split(":"))
+        # Como la API: sin las celdas vacías al final de cada fila.
+        filas = [list(f) for f in self.valores[inicio - 1:fin]]
+        for f in filas:
+            while f and f[-1] == "":
+                f.pop()
+        return filas
+
+    def batch_get(self, rangos):
+        self.llamadas += 1
+        return [self._rango(r) for r in rangos]
+
+
+def fila(rng, i):
+    fecha = pd.Timestamp("2024-01-01") + pd.Timedelta(days=int(i % 400))
+    return [fecha.strftime("%d/%m/%Y"), *(str(n) for n in rng.integers(0, 30, size=3)),
+            rng.choice(["0", "1", "si", "no", ""]), fecha.strftime("%B"), f"Semana {fecha.isocalendar().week}",
+            rng.choice(["Ana", "Beto", ""]), rng.choice(["Norte", "Sur", ""])]
+
+
+def limpiar(filas):
+    return preparar_filas_kpis(filas, CONFIG)
+
+
+def lectura_completa(valores):
+    # Referencia: toda la hoja limpia de una vez, con el número de fila como índice.
+    filas = valores[1:]
+    if not filas:
+        return None
+    indice = range(PRIMERA_FILA_DATOS, PRIMERA_FILA_DATOS + len(filas))
+    return limpiar(pd.DataFrame(filas, columns=valores[0], index=indice))
+
+
+def iguales(df, referencia):
+    if df is None or referencia is None:
+        return df is None and referencia is None
+    try:
+        pd.testing.assert_frame_equal(df, referencia)
+        return True
+    except AssertionError:
+        return False
+
+
+def escenarios(n, rng):
+    # (nombre, cambio sobre las filas de la hoja, ¿se recoge sin esperar a la resincronización?)
+    dentro, fuera = n - VENTANA_COLA // 2, VENTANA_COLA // 4
+
+    def editar(i):
+        def cambio(v):
+            v[i][1] = str(int(v[i][1] or 0) + 100)
+        return cambio
+
+    def vaciar_celda_final(v):
+        v[n][-1] = ""
+
+    def anadir(v):
+        v.extend(fila(rng, n + k) for k in range(30))
+
+    def borrar_cola(v):
+        del v[-20:]
+
+    def borrar(i):
+        def cambio(v):
+            del v[i]
+        return cambio
+
+    def insertar(i):
+        def cambio(v):
+            v.insert(i, fila(rng, i))
+        return cambio
+
+    def renombrar_encabezado(v):
+        v[0][-1] = "Zona"
+
+    def vaciar(v):
+        del v[1:]
+
+    return [
+        ("sin cambios", lambda v: None, True),
+        ("edición dentro de la ventana", editar(dentro), True),
+        ("última celda vaciada", vaciar_celda_final, True),
+        ("filas añadidas al final", anadir, True),
+        ("filas borradas al final", borrar_cola, True),
+        ("fila borrada dentro de la ventana", borrar(dentro), True),
+        ("fila borrada fuera de la ventana", borrar(fuera), True),
+        ("fila insertada fuera de la ventana", insertar(fuera), True),
+        ("encabezado renombrado", renombrar_encabezado, True),
+        ("hoja sin filas de datos", vaciar, True),
+        ("edición fuera de la ventana", editar(fuera), False),
+    ]
+
+
+def comprobar(nombre, valores, cambio, inmediato, clave):
+    hoja = HojaSimulada(valores)
+    sincronizar_hoja(clave, hoja, limpiar)
+    cambio(hoja.valores)
+    referencia = lectura_completa(hoja.valores)
+    hoja.llamadas = 0
+    for intento in range(1, RESINCRONIZAR_CADA + 1):
+        df, n_filas = sincronizar_hoja(clave, hoja, limpiar)
+        if iguales(df, referencia):
+            assert n_filas == len(hoja.valores) - 1, nombre
+            assert inmediato == (intento == 1), f"{nombre}: recogido en la sincronización {intento}"
+            print(f"  {nombre:<38} igual a la lectura completa tras {intento} sincronización(es)")
+            return
+    raise AssertionError(f"{nombre}: distinto de la lectura completa tras {RESINCRONIZAR_CADA} sincronizaciones")
+
+
+def comprobar_con_valores(nombre, valores, cambio, clave):
+    # Con la hoja completa ya leída (libro principal) todos los cambios se recogen al momento.
+    sincronizar_hoja(clave, None, limpiar, valores=valores)
+    nuevos = [list(f) for f in valores]
+    cambio(nuevos)
+    df, _ = sincronizar_hoja(clave, None, limpiar, valores=nuevos)
+    assert iguales(df, lectura_completa(nuevos)), f"{nombre} (con valores)"
+
+
+def _cronometrar(funcion, repeticiones=5):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main(filas=FILAS_POR_DEFECTO):
+    rng = np.random.default_rng(0)
+    valores = [ENCABEZADOS] + [fila(rng, i) for i in range(filas)]
+    print(f"Hoja simulada: {filas:,} filas, VENTANA_COLA={VENTANA_COLA}, RESINCRONIZAR_CADA={RESINCRONIZAR_CADA}")
+
+    for i, (nombre, cambio, inmediato) in enumerate(escenarios(filas, rng)):
+        comprobar(nombre, valores, cambio, inmediato, f"benchmark::{i}")
+        comprobar_con_valores(nombre, valores, cambio, f"benchmark_valores::{i}")
+    print("  con la hoja completa (valores=): todos los cambios recogidos al momento")
+
+    hoja = HojaSimulada(valores)
+    sincronizar_hoja("benchmark::tiempos", hoja, limpiar)
+    hoja.valores[-1][1] = "99"
+    t_incremental = _cronometrar(lambda: sincronizar_hoja("benchmark::tiempos", hoja, limpiar, resincronizar_cada=10**9))
+    t_completa = _cronometrar(lambda: lectura_completa(hoja.get_all_values()))
+    print(f"  sincronización incremental: {t_incremental:8.4f} s")
+    print(f"  lectura completa:           {t_completa:8.4f} s")
+    print("  resultados idénticos")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else FILAS_POR_DEFECTO)
@@ -1,11 +1,13 @@
 import streamlit as st
-from utils.limpieza import limpiar_valor_kpi, estandarizar_avatar
+from datos.cubo_embudo import PROSPECTADOS, resumen_embudo
+from datos.kpis import agregar_tasas
+from utils.limpieza import EMBUDO_INVITE_ACEPTADA, EMBUDO_RESPUESTA, EMBUDO_SESION
 import pandas as pd
 import plotly.express as px
 
 
 def mostrar_analisis_por_avatar(
-        df):  
+        df, cubo=None):
     st.markdown("---")
     st.markdown(
         "### 👤 Análisis de Rendimiento por Avatar (Enfoque Agendamiento)")
@@ -22,35 +24,21 @@ def mostrar_analisis_por_avatar(
         )
         return
 
-    df_analisis = df.copy()
-    df_analisis["Avatar"] = df_analisis["Avatar"].apply(estandarizar_avatar)
+    # "Avatar" llega ya estandarizado (alias aplicado sobre sus categorías al cargar).
+    resumen_avatar = resumen_embudo(df, "Avatar", cubo)[
+        ["Avatar", PROSPECTADOS, EMBUDO_INVITE_ACEPTADA, EMBUDO_RESPUESTA, EMBUDO_SESION]].rename(columns={
+            PROSPECTADOS: "Prospectados",
+            EMBUDO_INVITE_ACEPTADA: "Invites_Aceptadas",
+            EMBUDO_RESPUESTA: "Respuestas_1er_Msj",
+            EMBUDO_SESION: "Sesiones_Agendadas"})
 
-    resumen_avatar = df_analisis.groupby("Avatar").agg(
-        Prospectados=("Avatar", "count"),
-        Invites_Aceptadas=("¿Invite Aceptada?", lambda col:
-                           (col.apply(limpiar_valor_kpi) == "si").sum()),
-        Respuestas_1er_Msj=("Respuesta Primer Mensaje", lambda col: (col.apply(
-            lambda x: limpiar_valor_kpi(x) not in ["no", "", "nan"])).sum()),
-        Sesiones_Agendadas=(
-            "Sesion Agendada?", lambda col:
-            (col.apply(limpiar_valor_kpi) == "si").sum())).reset_index()
-
-    # Calcular Tasas Clave para Agendamiento
-    resumen_avatar["Tasa Aceptación (%)"] = (
-        resumen_avatar["Invites_Aceptadas"] / resumen_avatar["Prospectados"] *
-        100).round(1).fillna(0)
-    resumen_avatar["Tasa Respuesta (vs Acept.) (%)"] = (
-        resumen_avatar["Respuestas_1er_Msj"] /
-        resumen_avatar["Invites_Aceptadas"] * 100).round(1).fillna(0)
-    resumen_avatar["Tasa Sesiones (vs Resp.) (%)"] = (
-        resumen_avatar["Sesiones_Agendadas"] /
-        resumen_avatar["Respuestas_1er_Msj"] * 100).round(1).fillna(0)
-    resumen_avatar["Tasa Sesiones Global (vs Prosp.) (%)"] = (
-        resumen_avatar["Sesiones_Agendadas"] / resumen_avatar["Prospectados"] *
-        100).round(1).fillna(0)
-
-    # Reemplazar Inf con 0 si alguna división fue por cero y no se manejó con fillna antes
-    resumen_avatar.replace([float('inf'), -float('inf')], 0, inplace=True)
+    # Calcular Tasas Clave para Agendamiento (0 donde el denominador es 0)
+    resumen_avatar = agregar_tasas(resumen_avatar, {
+        "Tasa Aceptación (%)": ("Invites_Aceptadas", "Prospectados"),
+        "Tasa Respuesta (vs Acept.) (%)": ("Respuestas_1er_Msj", "Invites_Aceptadas"),
+        "Tasa Sesiones (vs Resp.) (%)": ("Sesiones_Agendadas", "Respuestas_1er_Msj"),
+        "Tasa Sesiones Global (vs Prosp.) (%)": ("Sesiones_Agendadas", "Prospectados"),
+    })
 
     if resumen_avatar.empty:
         st.info(
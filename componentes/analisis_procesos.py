@@ -1,13 +1,16 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-from utils.limpieza import limpiar_valor_kpi
+from datos.cubo_embudo import PROSPECTADOS, resumen_embudo
+from datos.kpis import calcular_tasa
+from utils.limpieza import EMBUDO_SESION
 
 
 
 def mostrar_analisis_procesos_con_prospectador(df_filtrado,
                                                top_n_grafico_proceso=10,
-                                               mostrar_tabla_proceso=True):
+                                               mostrar_tabla_proceso=True,
+                                               cubo=None):
     dimension_col_proceso = "Proceso"  # Columna de Proceso
     titulo_dimension_proceso = "Procesos"
 
@@ -24,18 +27,17 @@ def mostrar_analisis_procesos_con_prospectador(df_filtrado,
         return
 
     # --- Análisis General de Procesos (Gráfico y Tabla Opcional) ---
-    resumen_proceso_completo = df_filtrado.groupby(
-        dimension_col_proceso, as_index=False).agg(
-            Total_Prospectados=(dimension_col_proceso, 'count'),
-            Sesiones_Agendadas=("Sesion Agendada?", lambda x:
-                                (x.apply(limpiar_valor_kpi) == "si").sum()))
+    resumen_proceso_completo = resumen_embudo(
+        df_filtrado, dimension_col_proceso, cubo)[
+            [dimension_col_proceso, PROSPECTADOS, EMBUDO_SESION]].rename(
+                columns={PROSPECTADOS: "Total_Prospectados",
+                         EMBUDO_SESION: "Sesiones_Agendadas"})
     resumen_proceso_completo.rename(
         columns={resumen_proceso_completo.columns[0]: dimension_col_proceso},
         inplace=True)
-    resumen_proceso_completo["Tasa Agendamiento (%)"] = (
-        (resumen_proceso_completo["Sesiones_Agendadas"] /
-         resumen_proceso_completo["Total_Prospectados"]) *
-        100).fillna(0).round(1)
+    resumen_proceso_completo["Tasa Agendamiento (%)"] = calcular_tasa(
+        resumen_proceso_completo["Sesiones_Agendadas"],
+        resumen_proceso_completo["Total_Prospectados"])
 
     if resumen_proceso_completo.empty:
         st.info(
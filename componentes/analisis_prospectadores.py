@@ -1,12 +1,15 @@
 import streamlit as st
-from utils.limpieza import limpiar_valor_kpi
+from datos.cubo_embudo import PROSPECTADOS, resumen_embudo
+from datos.kpis import agregar_tasas
+from utils.limpieza import EMBUDO_INVITE_ACEPTADA, EMBUDO_RESPUESTA, EMBUDO_SESION
 import pandas as pd
 import plotly.express as px
 
-def mostrar_analisis_por_prospectador(df):
+def mostrar_analisis_por_prospectador(df, cubo=None):
     """
     Muestra una tabla y gráficos de rendimiento agrupados por la columna '¿Quién Prospecto?'.
-    Es una adaptación directa del análisis por Avatar.
+    Es una adaptación directa del análisis por Avatar. `cubo` es el de
+    construir_cubo_embudo(df), si ya está calculado.
     """
     st.markdown("---")
     st.markdown("### 👤 Análisis de Rendimiento por Prospectador")
@@ -23,20 +26,22 @@ def mostrar_analisis_por_prospectador(df):
     
     # A diferencia del Avatar, no se necesita estandarización para '¿Quién Prospecto?'.
 
-    resumen_prospectador = df_analisis.groupby("¿Quién Prospecto?").agg(
-        Prospectados=("¿Quién Prospecto?", "count"),
-        Invites_Aceptadas=("¿Invite Aceptada?", lambda col: (col.apply(limpiar_valor_kpi) == "si").sum()),
-        Respuestas_1er_Msj=("Respuesta Primer Mensaje", lambda col: (col.apply(lambda x: limpiar_valor_kpi(x) not in ["no", "", "nan"])).sum()),
-        Sesiones_Agendadas=("Sesion Agendada?", lambda col: (col.apply(limpiar_valor_kpi) == "si").sum())
-    ).reset_index()
+    resumen_prospectador = resumen_embudo(df_analisis, "¿Quién Prospecto?", cubo)[
+        ["¿Quién Prospecto?", PROSPECTADOS, EMBUDO_INVITE_ACEPTADA, EMBUDO_RESPUESTA, EMBUDO_SESION]
+    ].rename(columns={
+        PROSPECTADOS: "Prospectados",
+        EMBUDO_INVITE_ACEPTADA: "Invites_Aceptadas",
+        EMBUDO_RESPUESTA: "Respuestas_1er_Msj",
+        EMBUDO_SESION: "Sesiones_Agendadas"
+    })
 
-    # Calcular Tasas Clave
-    resumen_prospectador["Tasa Aceptación (%)"] = (resumen_prospectador["Invites_Aceptadas"] / resumen_prospectador["Prospectados"] * 100).round(1).fillna(0)
-    resumen_prospectador["Tasa Respuesta (vs Acept.) (%)"] = (resumen_prospectador["Respuestas_1er_Msj"] / resumen_prospectador["Invites_Aceptadas"] * 100).round(1).fillna(0)
-    resumen_prospectador["Tasa Sesiones (vs Resp.) (%)"] = (resumen_prospectador["Sesiones_Agendadas"] / resumen_prospectador["Respuestas_1er_Msj"] * 100).round(1).fillna(0)
-    resumen_prospectador["Tasa Sesiones Global (vs Prosp.) (%)"] = (resumen_prospectador["Sesiones_Agendadas"] / resumen_prospectador["Prospectados"] * 100).round(1).fillna(0)
-
-    resumen_prospectador.replace([float('inf'), -float('inf')], 0, inplace=True)
+    # Calcular Tasas Clave (0 donde el denominador es 0)
+    resumen_prospectador = agregar_tasas(resumen_prospectador, {
+        "Tasa Aceptación (%)": ("Invites_Aceptadas", "Prospectados"),
+        "Tasa Respuesta (vs Acept.) (%)": ("Respuestas_1er_Msj", "Invites_Aceptadas"),
+        "Tasa Sesiones (vs Resp.) (%)": ("Sesiones_Agendadas", "Respuestas_1er_Msj"),
+        "Tasa Sesiones Global (vs Prosp.) (%)": ("Sesiones_Agendadas", "Prospectados"),
+    })
 
     if resumen_prospectador.empty:
         st.info("No hay datos de Prospectador para analizar con los filtros actuales.")
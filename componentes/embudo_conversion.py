@@ -1,6 +1,7 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from datos.kpis import calcular_tasa
 
 
 def mostrar_embudo(
@@ -55,15 +56,11 @@ def mostrar_embudo(
 
     # Calculamos porcentajes vs etapa ANTERIOR para el conjunto que se mostrará
     def calcular_porcentajes(df_embudo):
-        df_embudo['% vs Anterior'] = [
-            100.0, # La primera etapa es 100% de sí misma
-            (df_embudo['Cantidad'][1] / df_embudo['Cantidad'][0] * 100) if df_embudo['Cantidad'][0] > 0 else 0, # Aceptadas vs Inicio
-            (df_embudo['Cantidad'][2] / df_embudo['Cantidad'][1] * 100) if df_embudo['Cantidad'][1] > 0 else 0, # 1er Msj vs Aceptadas
-            (df_embudo['Cantidad'][3] / df_embudo['Cantidad'][2] * 100) if df_embudo['Cantidad'][2] > 0 else 0, # Respuestas vs 1er Msj
-            (df_embudo['Cantidad'][4] / df_embudo['Cantidad'][3] * 100) if df_embudo['Cantidad'][3] > 0 else 0, # Sesiones vs Respuestas
-        ]
-        # Asegurar que los porcentajes NaN o Inf sean 0 para la visualización
-        df_embudo['% vs Anterior'] = df_embudo['% vs Anterior'].replace([float('inf'), -float('inf')], 0).fillna(0)
+        # Cada etapa contra la anterior, de una vez; la primera es 100% de sí misma.
+        cantidades = df_embudo['Cantidad'].to_numpy()
+        df_embudo['% vs Anterior'] = [100.0, *calcular_tasa(cantidades[1:], cantidades[:-1], decimales=None)]
+        # Asegurar que los porcentajes NaN sean 0 para la visualización
+        df_embudo['% vs Anterior'] = df_embudo['% vs Anterior'].fillna(0)
 
         df_embudo['Texto'] = df_embudo.apply(lambda row: f"{row['Cantidad']} ({row['% vs Anterior']:.1f}%)", axis=1)
         return df_embudo
@@ -1,7 +1,7 @@
 # componentes/oportunidades_calientes.py
 import streamlit as st
 import pandas as pd
-from utils.limpieza import limpiar_valor_kpi
+from utils.limpieza import EMBUDO_OPORTUNIDAD
 
 
 def mostrar_oportunidades_calientes(df_prospectos):
@@ -25,12 +25,7 @@ def mostrar_oportunidades_calientes(df_prospectos):
         return
 
     try:
-        oportunidades = df_prospectos[
-            (df_prospectos["¿Invite Aceptada?"].apply(limpiar_valor_kpi) ==
-             "si") & (df_prospectos["Respuesta Primer Mensaje"].apply(
-                 lambda x: limpiar_valor_kpi(x) not in ["no", "", "nan"])) &
-            (df_prospectos["Sesion Agendada?"].apply(limpiar_valor_kpi)
-             == "no")].copy()
+        oportunidades = df_prospectos[df_prospectos[EMBUDO_OPORTUNIDAD]]
 
         if oportunidades.empty:
             st.info(
@@ -1,33 +1,23 @@
 import streamlit as st
 import pandas as pd
-from utils.limpieza import limpiar_valor_kpi  
+from datos.cubo_embudo import PROSPECTADOS, resumen_embudo
+from datos.kpis import calcular_tasa
+from utils.limpieza import EMBUDO_SESION, contar_embudo
 
 
-def mostrar_resumen_ejecutivo(df_kpis, limpiar_valor_kpi, base_kpis_counts,
-                              sesiones_filtered):
+def mostrar_resumen_ejecutivo(df_kpis, base_kpis_counts,
+                              sesiones_filtered, conteos=None, cubo=None):
     st.markdown("---")
     st.markdown("## 📝 Resumen Ejecutivo")
 
+    # Obtenemos los conteos para el conjunto filtrado (ya calculados si vienen en `conteos`)
+    if conteos is None:
+        conteos = contar_embudo(df_kpis)
     # total_filtered es la cantidad de filas después de todos los filtros de la barra lateral
-    total_filtered = len(df_kpis)
-
-    # Obtenemos los conteos para el conjunto filtrado
-    inv_acept_filtered = 0
-    if "¿Invite Aceptada?" in df_kpis.columns:
-        inv_acept_filtered = sum(
-            limpiar_valor_kpi(x) == "si" for x in df_kpis["¿Invite Aceptada?"])
-
-    primeros_mensajes_enviados_count_filtered = 0
-    if "Fecha Primer Mensaje" in df_kpis.columns:
-        primeros_mensajes_enviados_count_filtered = sum(
-            limpiar_valor_kpi(x) not in ["no", "", "nan"]
-            for x in df_kpis["Fecha Primer Mensaje"])
-
-    resp_primer_filtered = 0
-    if "Respuesta Primer Mensaje" in df_kpis.columns:
-        resp_primer_filtered = sum(
-            limpiar_valor_kpi(x) not in ["no", "", "nan"]
-            for x in df_kpis["Respuesta Primer Mensaje"])
+    total_filtered = conteos["total"]
+    inv_acept_filtered = conteos["inv_acept"]
+    primeros_mensajes_enviados_count_filtered = conteos["primeros_mensajes_enviados_count"]
+    resp_primer_filtered = conteos["resp_primer"]
 
     # Usamos el conteo de sesiones filtrado que se pasó como argumento
     sesiones = sesiones_filtered
@@ -66,14 +56,13 @@ def mostrar_resumen_ejecutivo(df_kpis, limpiar_valor_kpi, base_kpis_counts,
     if not df_kpis.empty and "Industria" in df_kpis.columns and "Sesion Agendada?" in df_kpis.columns:
   
         try:
-            resumen_industria = df_kpis.groupby("Industria").agg(
-                Total_Prospectados=("Industria", 'count'),
-                Sesiones_Agendadas=(
-                    "Sesion Agendada?", lambda x:
-                    (x.apply(limpiar_valor_kpi) == "si").sum())).reset_index()
-            resumen_industria["Tasa Agendamiento (%)"] = (
-                (resumen_industria["Sesiones_Agendadas"] /
-                 resumen_industria["Total_Prospectados"]) * 100).fillna(0)
+            resumen_industria = resumen_embudo(df_kpis, "Industria", cubo)[
+                ["Industria", PROSPECTADOS, EMBUDO_SESION]].rename(
+                    columns={PROSPECTADOS: "Total_Prospectados",
+                             EMBUDO_SESION: "Sesiones_Agendadas"})
+            resumen_industria["Tasa Agendamiento (%)"] = calcular_tasa(
+                resumen_industria["Sesiones_Agendadas"],
+                resumen_industria["Total_Prospectados"], decimales=None)
             top_industria_agenda = resumen_industria[
                 resumen_industria["Total_Prospectados"] >= 5].sort_values(
                     by="Tasa Agendamiento (%)", ascending=False).head(1)
@@ -1,7 +1,10 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-from utils.limpieza import limpiar_valor_kpi
+from datos.cubo_embudo import PROSPECTADOS, resumen_embudo
+from datos.kpis import calcular_tasa
+from datos.motor_analitico import agrupar
+from utils.limpieza import EMBUDO_SESION
 
 def mostrar_analisis_dimension_agendamiento_flexible(
     df_filtrado,
@@ -9,7 +12,8 @@ def mostrar_analisis_dimension_agendamiento_flexible(
     titulo_dimension,
     top_n_grafico=10,
     mostrar_tabla_completa=False,
-    min_prospectados_para_significancia=3 
+    min_prospectados_para_significancia=3,
+    cubo=None
 ):
     st.markdown("---")
     titulo_seccion = f"Análisis de {titulo_dimension}: Volumen Prospectado y Tasa de Agendamiento"
@@ -19,21 +23,18 @@ def mostrar_analisis_dimension_agendamiento_flexible(
         st.warning(f"La columna '{dimension_col}' no se encuentra en los datos para el análisis de {titulo_dimension.lower()}.")
         return
 
-    # Calcular prospectados y sesiones agendadas por dimensión
+    # Calcular prospectados y sesiones agendadas por dimensión (del cubo del embudo si viene)
     # Solo agrupar si la columna de sesión también existe
     if "Sesion Agendada?" in df_filtrado.columns:
-        resumen_dimension_completo = df_filtrado.groupby(dimension_col, as_index=False).agg(
-            Total_Prospectados=(dimension_col, 'count'),
-            Sesiones_Agendadas=("Sesion Agendada?", lambda x: (x.apply(limpiar_valor_kpi) == "si").sum())
+        resumen_dimension_completo = resumen_embudo(df_filtrado, dimension_col, cubo)[
+            [dimension_col, PROSPECTADOS, EMBUDO_SESION]
+        ].rename(columns={PROSPECTADOS: "Total_Prospectados", EMBUDO_SESION: "Sesiones_Agendadas"})
+        resumen_dimension_completo["Tasa Agendamiento (%)"] = calcular_tasa(
+            resumen_dimension_completo["Sesiones_Agendadas"], resumen_dimension_completo["Total_Prospectados"]
         )
-        resumen_dimension_completo["Tasa Agendamiento (%)"] = (
-            (resumen_dimension_completo["Sesiones_Agendadas"] / resumen_dimension_completo["Total_Prospectados"]) * 100
-        ).fillna(0).round(1)
     else: # Si no hay datos de sesión, solo podemos mostrar volumen
         st.warning(f"Columna 'Sesion Agendada?' no encontrada. Solo se mostrará el volumen prospectado para {titulo_dimension.lower()}.")
-        resumen_dimension_completo = df_filtrado.groupby(dimension_col, as_index=False).agg(
-            Total_Prospectados=(dimension_col, 'count')
-        )
+        resumen_dimension_completo = agrupar(df_filtrado, [dimension_col], nombre_conteo="Total_Prospectados")
         resumen_dimension_completo["Sesiones_Agendadas"] = 0 
         resumen_dimension_completo["Tasa Agendamiento (%)"] = 0.0 
 
@@ -0,0 +1,119 @@
+# Prospe/datos/acumulados.py
+import hashlib
+import numpy as np
+import pandas as pd
+from datos.fechas import limite_dia, valores_fecha
+from datos.motor_analitico import agrupar
+from datos.snapshot import guardar_snapshot, leer_snapshot
+from filtros.especificacion import aplicar_especificacion, compilar, valores
+
+# Un acumulado es un DataFrame con una fila por combinación de las columnas de
+# su grano (p. ej. semana x analista x región), las filas que suma cada una,
+# la suma de las columnas numéricas y la primera y última fecha de esas filas.
+# Se calculan una vez por recarga de datos y se guardan junto a los snapshots.
+FILAS_ACUMULADO = "_filas"
+DESDE_ACUMULADO, HASTA_ACUMULADO = "_desde", "_hasta"
+
+
+def construir_acumulados(df, granos, sumas=(), columna_fecha="Fecha"):
+    """
+    {grano: acumulado} para cada grano de `granos` ({grano: columnas}); las
+    columnas del grano que `df` no tenga se omiten. Las claves vacías se
+    conservan como un valor más, así los totales no pierden filas.
+    """
+    acumulados = {}
+    if df.empty or columna_fecha not in df.columns:
+        return acumulados
+    for grano, columnas in granos.items():
+        grupos = [c for c in columnas if c in df.columns]
+        acumulados[grano] = df.groupby(grupos, observed=True, dropna=False, as_index=False).agg(
+            **{FILAS_ACUMULADO: (columna_fecha, "size")},
+            **{c: (c, "sum") for c in sumas},
+            **{DESDE_ACUMULADO: (columna_fecha, "min"), HASTA_ACUMULADO: (columna_fecha, "max")})
+    return acumulados
+
+
+# --- Persistencia ---
+
+def _firma(df, granos, sumas, columna_fecha):
+    # Identifica los datos de los que salen los acumulados: si no cambian, el
+    # acumulado guardado en disco sigue valiendo.
+    columnas = list(dict.fromkeys(
+        [c for columnas in granos.values() for c in columnas if c in df.columns] + list(sumas) + [columna_fecha]))
+    hashes = pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+    firma = hashlib.sha1(hashes.tobytes())
+    firma.update(repr((sorted(granos.items()), list(sumas), columnas)).encode())
+    return firma.hexdigest()
+
+
+def obtener_acumulados(nombre, df, granos, sumas=(), columna_fecha="Fecha"):
+    """
+    construir_acumulados de `df`, guardados como snapshots
+    ("acumulado_<nombre>_<grano>") con la firma de los datos: mientras `df`
+    no cambie (p. ej. al arrancar el proceso sobre el mismo snapshot) se leen
+    de disco en vez de volver a agrupar las filas. Llamar una vez por recarga.
+    """
+    if df.empty or columna_fecha not in df.columns:
+        return {}
+    firma = _firma(df, granos, sumas, columna_fecha)
+    guardados = {grano: leer_snapshot(f"acumulado_{nombre}_{grano}") for grano in granos}
+    if all(a is not None and a.attrs.get("firma") == firma for a in guardados.values()):
+        return guardados
+
+    acumulados = construir_acumulados(df, granos, sumas, columna_fecha)
+    for grano, acumulado in acumulados.items():
+        acumulado.attrs["firma"] = firma
+        try:
+            guardar_snapshot(acumulado, f"acumulado_{nombre}_{grano}")
+        except Exception:
+            pass  # Sin disco escribible los acumulados se quedan en memoria.
+    return acumulados
+
+
+# --- Consultas ---
+
+def _filas_acumulado(acumulado, consulta, columna_fecha):
+    # Las filas del acumulado que cumplen la consulta compilada, o None si un
+    # rango de fechas corta alguna por la mitad (entonces hay que ir a las filas).
+    filtros = []
+    for predicado in consulta:
+        if predicado[0] == "valores":
+            filtros.append(valores(predicado[1], list(predicado[2]), predicado[3]))
+            continue
+        if predicado[1] != columna_fecha:
+            return None
+        inicio, fin = valores_fecha(acumulado[DESDE_ACUMULADO]), valores_fecha(acumulado[HASTA_ACUMULADO])
+        desde, hasta = limite_dia(predicado[2]), limite_dia(predicado[3], dias=1)
+        dentro, fuera = np.ones(len(acumulado), dtype=bool), np.zeros(len(acumulado), dtype=bool)
+        if desde is not None:
+            dentro &= inicio >= desde
+            fuera |= fin < desde
+        if hasta is not None:
+            dentro &= fin < hasta
+            fuera |= inicio >= hasta
+        if not (dentro | fuera).all():
+            return None
+        acumulado = acumulado[dentro]
+    return aplicar_especificacion(acumulado, filtros)
+
+
+def resumir_acumulados(acumulados, df, especificacion, grupos, sumas=(), nombre_conteo="n", columna_fecha="Fecha"):
+    """
+    agrupar(aplicar_especificacion(df, especificacion), grupos, sumas,
+    nombre_conteo) leído de `acumulados` (los de este mismo `df`): del
+    primero cuyas columnas cubren `grupos`, `sumas` y los filtros, si el
+    rango de fechas no parte ninguna de sus filas. Si ninguno sirve se
+    agrupan las filas de `df`.
+    """
+    grupos, sumas = list(grupos), list(sumas)
+    consulta = compilar(especificacion, df.columns)
+    for acumulado in acumulados.values():
+        columnas = set(acumulado.columns)
+        if not set(grupos + sumas) <= columnas or any(
+                p[0] == "valores" and p[1] not in columnas for p in consulta):
+            continue
+        filas = _filas_acumulado(acumulado, consulta, columna_fecha)
+        if filas is not None:
+            resumen = filas.groupby(grupos, observed=True, as_index=False)[[FILAS_ACUMULADO] + sumas].sum()
+            return resumen.rename(columns={FILAS_ACUMULADO: nombre_conteo})
+    return agrupar(aplicar_especificacion(df, especificacion), grupos, sumas, nombre_conteo)
@@ -1,18 +1,133 @@
 # Prospe/datos/carga_datos.py
+import logging
+import threading
+import time
 import pandas as pd
-import gspread
 import streamlit as st
-from collections import Counter
-from utils.limpieza import calcular_dias_respuesta
+from datos.compartido import vista_compartida
+from datos.conexion import obtener_cliente_gspread
+from datos.esquemas import FECHA, SI_NO, aplicar_esquema, columna, dataframe_desde_valores
+from datos.fuentes import cargar_fuentes, fuente
+from datos.libro import HOJA_KPIS_SDR, PRIMERA_HOJA, leer_libro_principal
+from datos.snapshot import guardar_snapshot, leer_snapshot
+from utils.limpieza import EQUIVALENCIAS_AVATAR, agregar_columnas_embudo, calcular_dias_respuesta
 
-def cargar_y_limpiar_datos():
+logger = logging.getLogger(__name__)
+
+# Pestañas del dataset maestro (libro principal) y el snapshot en disco de cada
+# una. Se guardan crudas porque varias páginas derivan de ellas vistas distintas
+# (Campañas y KPIs SDR vuelven a sincronizar sus filas); las vistas ya limpias
+# que valga la pena guardar se persisten aparte (obtener_vista con persistir=True).
+HOJA_MAESTRA_PRINCIPAL = "principal"
+HOJA_MAESTRA_KPIS_SDR = "kpis_sdr"
+SNAPSHOTS_DATOS_MAESTROS = {
+    HOJA_MAESTRA_PRINCIPAL: "master_database_crudo",
+    HOJA_MAESTRA_KPIS_SDR: "master_kpis_sdr_crudo",
+}
+# Pasado este tiempo, el siguiente acceso sigue sirviendo la versión actual
+# y lanza una recarga en segundo plano.
+TTL_DATOS_MAESTROS_SEGUNDOS = 300
+
+VISTA_DATOS_BASE = "base"
+# Identifica en los snapshots la carga del dataset maestro de la que salen.
+ATRIBUTO_ID_DATOS = "id_datos"
+
+COLUMNA_FECHA_INVITE = "Fecha de Invite"
+# Celdas que el dashboard trata como "No" en las columnas de texto.
+VACIOS_DATOS_BASE = ("Nan", "None", "Na", "<NA>", "#N/A", "N/A")
+
+# Esquema de la hoja principal para Dashboard y Mensajes.
+ESQUEMA_DATOS_BASE = (
+    columna(COLUMNA_FECHA_INVITE, FECHA, formato="%d/%m/%Y", requerida=True),
+    columna("Avatar", mayusculas="title", alias=EQUIVALENCIAS_AVATAR, categorica=True),
+    *(columna(c, SI_NO, vacios=VACIOS_DATOS_BASE) for c in (
+        "¿Invite Aceptada?", "Sesion Agendada?", "Respuesta Primer Mensaje", "Respuestas Subsecuentes")),
+    # Dimensiones de pocos valores distintos: category abarata isin y groupby.
+    *(columna(c, relleno="No", vacios=VACIOS_DATOS_BASE + ("No",), categorica=True) for c in (
+        "Fuente de la Lista", "Proceso", "Pais", "Industria", "¿Quién Prospecto?")),
+    *(columna(c, relleno="No", vacios=VACIOS_DATOS_BASE + ("No",)) for c in (
+        "Nombre", "Apellido", "Empresa", "Puesto")),
+    columna("Fecha Sesion", FECHA),
+)
+
+
+def leer_datos_crudos(releer=False):
     """
-    Función principal que carga y unifica datos de la hoja del equipo y de Evelyn.
-    Mantenemos el nombre original por compatibilidad con el dashboard.
+    Lee el libro principal (hoja del equipo, hoja de Evelyn si está activa y
+    'KPI´s SDR') sin usar st.*, para poder llamarse fuera de una página.
+
+    Devuelve (hojas, errores): {HOJA_MAESTRA_*: DataFrame} con los valores tal
+    cual vienen de Sheets, sin limpiar (sin HOJA_MAESTRA_PRINCIPAL si no se
+    pudo leer ninguna fuente), y {nombre de la hoja: mensaje} de las que
+    fallaron. Lanza la excepción si no se pueden obtener las credenciales.
+    Con releer=True no se aprovecha la lectura del libro en caché.
+    """
+    client = obtener_cliente_gspread()
+    libro = {}
+
+    def valores_libro(hoja):
+        # Una sola lectura por lotes del libro principal para 'principal' y 'KPI´s SDR'.
+        if not libro:
+            libro.update(leer_libro_principal(releer=releer))
+        return libro.get(hoja)
+
+    # 1. Hoja Principal (Equipo)
+    def cargar_hoja_principal():
+        raw_data = valores_libro(PRIMERA_HOJA)
+        if not raw_data:
+            return None
+        df_main = dataframe_desde_valores(raw_data)
+        df_main['Fuente_Analista'] = 'Equipo Principal'
+        return df_main
+
+    # 2. Hoja de Evelyn (DESACTIVADA: activa=False en el registro de fuentes)
+    def cargar_hoja_evelyn():
+        sheet_url_evelyn = "https://docs.google.com/spreadsheets/d/1eV-wLbzbVRa68Kb-H8UvIvN7VEo5B5ONCOaIQ66mT9Y/edit?gid=0#gid=0"
+        sheet_evelyn = client.open_by_url(sheet_url_evelyn).sheet1
+        raw_data_evelyn = sheet_evelyn.get_all_values()
+        if not raw_data_evelyn:
+            return None
+        df_evelyn = dataframe_desde_valores(raw_data_evelyn)
+        df_evelyn['Fuente_Analista'] = 'Evelyn'
+        if '¿Quién Prospecto?' not in df_evelyn.columns or df_evelyn['¿Quién Prospecto?'].isnull().all():
+             df_evelyn['¿Quién Prospecto?'] = 'Evelyn'
+        else:
+             df_evelyn['¿Quién Prospecto?'] = df_evelyn['¿Quién Prospecto?'].fillna('Evelyn')
+        return df_evelyn
+
+    # Todas las fuentes activas se leen en paralelo; añadir una no suma tiempo de espera.
+    fuentes_datos = [
+        fuente("principal", cargar_hoja_principal),
+        fuente("de Evelyn", cargar_hoja_evelyn, activa=False),
+    ]
+    resultados, errores = cargar_fuentes(fuentes_datos)
+    dataframes = [df for df in resultados.values() if df is not None]
+
+    hojas = {}
+    if dataframes:
+        hojas[HOJA_MAESTRA_PRINCIPAL] = pd.concat(dataframes, ignore_index=True, sort=False)
+
+    # 3. Hoja 'KPI´s SDR': ya llegó en la misma lectura por lotes que la principal.
+    try:
+        raw_data_sdr = valores_libro(HOJA_KPIS_SDR)
+        if raw_data_sdr:
+            hojas[HOJA_MAESTRA_KPIS_SDR] = dataframe_desde_valores(raw_data_sdr)
+    except Exception as e:
+        errores["'KPI´s SDR'"] = str(e) or type(e).__name__
+
+    return hojas, errores
+
+
+def cargar_datos_crudos():
+    """
+    leer_datos_crudos para una página: muestra los errores y detiene la
+    página si no hay credenciales o no se pudo leer ninguna fuente, y avisa
+    de las hojas que fallaron. Devuelve {HOJA_MAESTRA_*: DataFrame}. Es la
+    única lectura de Sheets del dataset maestro: las páginas derivan sus
+    vistas de aquí.
     """
     try:
-        creds_dict = st.secrets["gcp_service_account"]
-        client = gspread.service_account_from_dict(creds_dict)
+        hojas, errores = leer_datos_crudos()
     except KeyError:
         st.error("Error de Configuración (Secrets): Falta [gcp_service_account].")
         st.stop()
@@ -20,93 +135,249 @@ def cargar_y_limpiar_datos():
         st.error(f"Error al cargar las credenciales de Google Sheets: {e}")
         st.stop()
 
-    def make_unique(headers_list):
-        counts = Counter()
-        new_headers = []
-        for h in headers_list:
-            h_stripped = str(h).strip() if pd.notna(h) else "Columna_Vacia"
-            if not h_stripped: h_stripped = "Columna_Vacia"
-            counts[h_stripped] += 1
-            if counts[h_stripped] == 1:
-                new_headers.append(h_stripped)
-            else:
-                new_headers.append(f"{h_stripped}_{counts[h_stripped]-1}")
-        return new_headers
-
-    dataframes = []
-
-    # 1. Cargar Hoja Principal (Equipo)
-    try:
-        sheet_url = st.secrets.get("main_prostraction_sheet_url", "https://docs.google.com/spreadsheets/d/1_J_WLYf2cjiKp2JTxsFj1KYoGTzPA730Bw3YP4-q7Fs/edit?gid=0#gid=0")
-        sheet = client.open_by_url(sheet_url).sheet1
-        raw_data = sheet.get_all_values()
-        if raw_data:
-            headers = make_unique(raw_data[0])
-            df_main = pd.DataFrame(raw_data[1:], columns=headers)
-            df_main['Fuente_Analista'] = 'Equipo Principal'
-            dataframes.append(df_main)
-    except Exception as e:
-        st.warning(f"No se pudo cargar la hoja principal. Error: {e}")
-
-    # 2. Cargar Hoja de Evelyn (SECCIÓN COMENTADA)
-    # try:
-    #     sheet_url_evelyn = "https://docs.google.com/spreadsheets/d/1eV-wLbzbVRa68Kb-H8UvIvN7VEo5B5ONCOaIQ66mT9Y/edit?gid=0#gid=0"
-    #     sheet_evelyn = client.open_by_url(sheet_url_evelyn).sheet1
-    #     raw_data_evelyn = sheet_evelyn.get_all_values()
-    #     if raw_data_evelyn:
-    #         headers_evelyn = make_unique(raw_data_evelyn[0])
-    #         df_evelyn = pd.DataFrame(raw_data_evelyn[1:], columns=headers_evelyn)
-    #         df_evelyn['Fuente_Analista'] = 'Evelyn'
-    #         if '¿Quién Prospecto?' not in df_evelyn.columns or df_evelyn['¿Quién Prospecto?'].isnull().all():
-    #              df_evelyn['¿Quién Prospecto?'] = 'Evelyn'
-    #         else:
-    #              df_evelyn['¿Quién Prospecto?'].fillna('Evelyn', inplace=True)
-    #         dataframes.append(df_evelyn)
-    # except Exception as e:
-    #     st.warning(f"No se pudo cargar la hoja de Evelyn. Error: {e}")
-
-    if not dataframes:
+    for nombre_fuente, error in errores.items():
+        st.warning(f"No se pudo cargar la hoja {nombre_fuente}. Error: {error}")
+    if HOJA_MAESTRA_PRINCIPAL not in hojas:
         st.error("No se pudieron cargar datos de ninguna fuente. El dashboard no puede continuar.")
         st.stop()
-    
-    df_unificado = pd.concat(dataframes, ignore_index=True, sort=False)
+    return hojas
+
 
-    nombre_columna_fecha_invite = "Fecha de Invite"
-    if nombre_columna_fecha_invite not in df_unificado.columns:
-        st.error(f"¡ERROR CRÍTICO! La columna '{nombre_columna_fecha_invite}' es esencial y no se encontró.")
+def limpiar_datos_base(df_unificado):
+    """Limpieza de la hoja principal para Dashboard y Mensajes. No modifica df_unificado."""
+    if COLUMNA_FECHA_INVITE not in df_unificado.columns:
+        st.error(f"¡ERROR CRÍTICO! La columna '{COLUMNA_FECHA_INVITE}' es esencial y no se encontró.")
         st.stop()
 
-    df_base = df_unificado[df_unificado[nombre_columna_fecha_invite].astype(str).str.strip() != ""].copy()
+    df_base = aplicar_esquema(df_unificado, ESQUEMA_DATOS_BASE)
     if df_base.empty:
         st.warning("El DataFrame está vacío después de filtrar por fechas de invite válidas.")
         return pd.DataFrame()
+    return df_base
 
-    df_base[nombre_columna_fecha_invite] = pd.to_datetime(df_base[nombre_columna_fecha_invite], format='%d/%m/%Y', errors="coerce")
-    df_base.dropna(subset=[nombre_columna_fecha_invite], inplace=True)
 
-    if "Avatar" in df_base.columns:
-        df_base["Avatar"] = df_base["Avatar"].astype(str).str.strip().str.title()
-        df_base["Avatar"] = df_base["Avatar"].replace({
-            "Jonh Fenner": "John Bermúdez", "Jonh Bermúdez": "John Bermúdez",
-            "Jonh": "John Bermúdez", "John Fenner": "John Bermúdez"
-        })
+def cargar_y_limpiar_datos():
+    """
+    Función principal que carga y unifica datos de la hoja del equipo y de Evelyn.
+    Mantenemos el nombre original por compatibilidad con el dashboard.
+    """
+    return limpiar_datos_base(cargar_datos_crudos()[HOJA_MAESTRA_PRINCIPAL])
 
-    columnas_texto_a_limpiar = [
-        "¿Invite Aceptada?", "Sesion Agendada?", "Respuesta Primer Mensaje",
-        "Respuestas Subsecuentes", "Fuente de la Lista", "Proceso", "Pais",
-        "Industria", "¿Quién Prospecto?", "Nombre", "Apellido", "Empresa", "Puesto"
-    ]
-    common_empty_strings = ["", "Nan", "None", "Na", "<NA>", "#N/A", "N/A", "NO", "no"]
 
-    for col in columnas_texto_a_limpiar:
-        if col in df_base.columns:
-            df_base[col] = df_base[col].fillna("").astype(str).str.strip()
-            df_base.loc[df_base[col].isin(common_empty_strings) | (df_base[col].str.lower() == 'no'), col] = 'No'
+@st.cache_resource
+def _estado_datos_maestros():
+    # Estado compartido por todas las sesiones del proceso.
+    return {"hojas": None, "version": 0, "id_datos": None, "cargado_en": 0.0, "refrescando": False,
+            "vistas": {}, "lock": threading.Lock(), "lock_carga": threading.Lock(),
+            "locks_vistas": {}}
 
-    if "Fecha Sesion" in df_base.columns and not pd.api.types.is_datetime64_any_dtype(df_base["Fecha Sesion"]):
-        df_base["Fecha Sesion"] = pd.to_datetime(df_base["Fecha Sesion"], errors='coerce')
 
-    return df_base
+def _guardar_con_id(df, nombre_snapshot, id_datos):
+    copia = df.copy(deep=False)
+    copia.attrs = {**df.attrs, ATRIBUTO_ID_DATOS: id_datos}
+    try:
+        guardar_snapshot(copia, nombre_snapshot)
+    except Exception:
+        pass  # Sin disco escribible seguimos sirviendo desde memoria.
+
+
+def _mismas_hojas(hojas, otras):
+    return otras is not None and hojas.keys() == otras.keys() and all(
+        hojas[nombre].equals(otras[nombre]) for nombre in hojas)
+
+
+def _publicar_datos_maestros(estado, hojas):
+    with estado["lock"]:
+        actuales = estado["hojas"]
+    if _mismas_hojas(hojas, actuales):
+        # Sin cambios en Sheets: se conserva la versión, y con ella las vistas
+        # ya construidas y los snapshots de las vistas persistidas.
+        with estado["lock"]:
+            if estado["hojas"] is actuales:
+                estado["cargado_en"] = time.monotonic()
+                return
+    id_datos = str(time.time_ns())
+    for nombre, df in hojas.items():
+        _guardar_con_id(df, SNAPSHOTS_DATOS_MAESTROS[nombre], id_datos)
+    with estado["lock"]:
+        estado["hojas"] = hojas
+        estado["version"] += 1
+        estado["id_datos"] = id_datos
+        estado["cargado_en"] = time.monotonic()
+        estado["vistas"] = {}
+
+
+def _refrescar_en_segundo_plano(estado):
+    # Sin contexto de script no hay página en la que mostrar nada: los fallos
+    # van al log y se siguen sirviendo los datos actuales. Se relee el libro
+    # para no publicar la lectura en caché de las páginas.
+    publicado = False
+    try:
+        hojas, errores = leer_datos_crudos(releer=True)
+        for nombre_fuente, error in errores.items():
+            logger.warning("Recarga del dataset maestro: no se pudo cargar la hoja %s: %s", nombre_fuente, error)
+        df_principal = hojas.get(HOJA_MAESTRA_PRINCIPAL)
+        if df_principal is not None and not df_principal.empty:
+            _publicar_datos_maestros(estado, hojas)
+            publicado = True
+        else:
+            logger.error("Recarga del dataset maestro sin datos de la hoja principal; se mantiene la versión actual.")
+    except Exception:
+        logger.exception("Falló la recarga del dataset maestro en segundo plano; se mantiene la versión actual.")
+    finally:
+        with estado["lock"]:
+            estado["refrescando"] = False
+            if not publicado:
+                # Se reintenta tras otro TTL en vez de en cada rerun.
+                estado["cargado_en"] = time.monotonic()
+
+
+def _lanzar_refresco(estado):
+    # Llamar con estado["lock"] tomado.
+    if estado["refrescando"]:
+        return
+    estado["refrescando"] = True
+    threading.Thread(target=_refrescar_en_segundo_plano, args=(estado,),
+                     name="refresco_datos_maestros", daemon=True).start()
+
+
+def _leer_snapshots_maestros():
+    hojas = {}
+    for nombre, nombre_snapshot in SNAPSHOTS_DATOS_MAESTROS.items():
+        df_snapshot = leer_snapshot(nombre_snapshot)
+        if df_snapshot is not None:
+            hojas[nombre] = df_snapshot
+    df_principal = hojas.get(HOJA_MAESTRA_PRINCIPAL)
+    return hojas if df_principal is not None and not df_principal.empty else None
+
+
+def obtener_datos_maestros():
+    """
+    Devuelve (hojas, version): el dataset maestro del libro principal, cargado
+    una vez por recarga para todas las páginas y sesiones. En el primer uso del
+    proceso sirve el snapshot en disco de inmediato y recarga desde Sheets en
+    segundo plano; después, cada TTL_DATOS_MAESTROS_SEGUNDOS se recarga igual,
+    sin bloquear. Si no hay snapshot, carga de forma síncrona.
+    Los DataFrames son compartidos: no modificarlos in situ.
+    """
+    estado = _estado_datos_maestros()
+    with estado["lock"]:
+        if estado["hojas"] is not None:
+            if time.monotonic() - estado["cargado_en"] > TTL_DATOS_MAESTROS_SEGUNDOS:
+                _lanzar_refresco(estado)
+            return estado["hojas"], estado["version"]
+
+        hojas_snapshot = _leer_snapshots_maestros()
+        if hojas_snapshot is not None:
+            estado["hojas"] = hojas_snapshot
+            estado["version"] += 1
+            estado["id_datos"] = hojas_snapshot[HOJA_MAESTRA_PRINCIPAL].attrs.get(ATRIBUTO_ID_DATOS)
+            estado["cargado_en"] = time.monotonic()
+            _lanzar_refresco(estado)
+            return estado["hojas"], estado["version"]
+
+    # Sin snapshot: una sola sesión carga desde Sheets, el resto espera su resultado.
+    with estado["lock_carga"]:
+        if estado["hojas"] is not None:
+            return estado["hojas"], estado["version"]
+        hojas = cargar_datos_crudos()
+        df_principal = hojas.get(HOJA_MAESTRA_PRINCIPAL)
+        if df_principal is None or df_principal.empty:
+            return {}, estado["version"]
+        _publicar_datos_maestros(estado, hojas)
+        return hojas, estado["version"]
+
+
+def _leer_vista_persistida(nombre, id_datos):
+    # La vista guardada en disco, si salió de la misma carga del dataset maestro.
+    if id_datos is None:
+        return None
+    vista = leer_snapshot(f"vista_{nombre}")
+    if vista is None or vista.attrs.get(ATRIBUTO_ID_DATOS) != id_datos:
+        return None
+    vista.attrs.pop(ATRIBUTO_ID_DATOS)
+    return vista
+
+
+def datos_maestros_en_memoria():
+    """
+    True si el dataset maestro ya está cargado en el proceso: obtener_vista
+    no tendrá que leer Sheets (ni mostrar errores con st.*) para servirlo.
+    """
+    estado = _estado_datos_maestros()
+    with estado["lock"]:
+        return estado["hojas"] is not None
+
+
+def obtener_vista(nombre, construir, persistir=False):
+    """
+    Devuelve (vista, version). `construir(hojas)` deriva la vista de una página
+    a partir del dataset maestro; se ejecuta una sola vez por versión y el
+    resultado se comparte entre sesiones. Cada llamada recibe una
+    vista_compartida: los mismos datos, sin copiarlos, que la página puede
+    modificar sin afectar a las demás sesiones.
+
+    Con persistir=True (solo para vistas DataFrame) la vista también se guarda
+    como snapshot ("vista_<nombre>"): al arrancar el proceso sobre los mismos
+    snapshots del dataset maestro se lee de disco en vez de construirla.
+    """
+    hojas, version = obtener_datos_maestros()
+    estado = _estado_datos_maestros()
+
+    def guardada_vigente():
+        guardada = estado["vistas"].get(nombre)
+        return guardada[1] if guardada is not None and guardada[0] == version else None
+
+    # La vista ya construida se sirve sin esperar a ninguna construcción en curso.
+    with estado["lock"]:
+        vista = guardada_vigente()
+        lock_vista = estado["locks_vistas"].setdefault(nombre, threading.Lock())
+    if vista is not None:
+        return vista_compartida(vista), version
+
+    # Cada vista se construye bajo su propio lock: vistas distintas se construyen
+    # en paralelo y solo esperan las sesiones que piden la misma.
+    with lock_vista:
+        with estado["lock"]:
+            vista = guardada_vigente()
+            id_datos = estado["id_datos"] if estado["version"] == version else None
+        if vista is not None:
+            return vista_compartida(vista), version
+        vista = _leer_vista_persistida(nombre, id_datos) if persistir else None
+        construida = vista is None
+        if construida:
+            vista = construir(hojas)
+        with estado["lock"]:
+            vigente = estado["version"] == version
+            if vigente:
+                estado["vistas"][nombre] = (version, vista)
+        if persistir and construida and vigente and id_datos is not None and isinstance(vista, pd.DataFrame):
+            _guardar_con_id(vista, f"vista_{nombre}", id_datos)
+        return vista_compartida(vista), version
+
+
+def valores_hoja_maestra(hojas, nombre):
+    """La pestaña como lista de filas (encabezados primero), el formato de get_all_values. None si no existe."""
+    df = hojas.get(nombre)
+    if df is None:
+        return None
+    return [list(df.columns)] + df.astype(str).values.tolist()
+
+
+def construir_datos_base(hojas):
+    """La hoja principal del dataset maestro, limpia. Para usar dentro de un `construir` de obtener_vista."""
+    df_principal = hojas.get(HOJA_MAESTRA_PRINCIPAL)
+    if df_principal is None or df_principal.empty:
+        return pd.DataFrame()
+    return limpiar_datos_base(df_principal)
+
+
+def obtener_datos_base():
+    """
+    Devuelve (df_base, version): la hoja principal limpia para Dashboard y
+    Mensajes, derivada del dataset maestro una vez por versión.
+    """
+    return obtener_vista(VISTA_DATOS_BASE, construir_datos_base)
 
 
 def cargar_y_procesar_datos(df): 
@@ -115,4 +386,5 @@ def cargar_y_procesar_datos(df):
         df_procesado = calcular_dias_respuesta(df_procesado)
     except Exception as e:
         st.warning(f"Error al ejecutar calcular_dias_respuesta: {e}")
-    return df_procesado
+    # Una vez por versión del dataset: los componentes suman estas columnas en cada rerun.
+    return agregar_columnas_embudo(df_procesado)
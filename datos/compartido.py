@@ -0,0 +1,20 @@
+# Prospe/datos/compartido.py
+import pandas as pd
+
+# Con Copy-on-Write, filtrar o seleccionar columnas de un DataFrame no copia
+# datos, y escribir en el resultado copia solo lo que se modifica, sin tocar
+# el original. Así los DataFrames compartidos entre sesiones se entregan a
+# cada página sin copias defensivas.
+pd.set_option("mode.copy_on_write", True)
+
+
+def vista_compartida(df):
+    """
+    Un DataFrame nuevo que apunta a los mismos datos que `df`, sin copiarlos.
+    La página puede añadir columnas o modificarlo in situ: con Copy-on-Write
+    esos cambios nunca llegan al DataFrame compartido. Lo que no es un
+    DataFrame (p. ej. None) se devuelve tal cual.
+    """
+    if not isinstance(df, pd.DataFrame):
+        return df
+    return df.copy(deep=False)
@@ -0,0 +1,24 @@
+# Prospe/datos/conexion.py
+import gspread
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# Conexiones keep-alive por host. Varias páginas y sesiones leen hojas a la vez
+# y el pool por defecto de requests (10) se queda corto.
+TAMANO_POOL_CONEXIONES = 32
+
+
+@st.cache_resource
+def obtener_cliente_gspread():
+    """
+    Cliente de gspread único para todo el proceso. Se autentica una sola vez
+    con [gcp_service_account]; la sesión autorizada de google-auth renueva el
+    token cuando expira, así que las recargas reutilizan la misma conexión TLS.
+    Lanza KeyError si faltan los secrets (no se cachea: el siguiente intento reintenta).
+    """
+    creds_dict = st.secrets["gcp_service_account"]
+    client = gspread.service_account_from_dict(dict(creds_dict))
+    adaptador = HTTPAdapter(pool_connections=TAMANO_POOL_CONEXIONES,
+                            pool_maxsize=TAMANO_POOL_CONEXIONES)
+    client.http_client.session.mount("https://", adaptador)
+    return client
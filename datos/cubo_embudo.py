@@ -0,0 +1,86 @@
+# Prospe/datos/cubo_embudo.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+from datos.motor_analitico import agrupar
+from utils.limpieza import COLUMNAS_EMBUDO, contar_embudo
+
+# Dimensiones por las que el dashboard desglosa el embudo.
+DIMENSIONES_CUBO = ("Industria", "Pais", "Puesto", "Proceso", "¿Quién Prospecto?", "Avatar")
+# Columna del cubo con las filas (prospectados) de cada valor.
+PROSPECTADOS = "_prospectados"
+# Las marcas del embudo de una fila empaquetadas en un número: 2**5 combinaciones posibles.
+_COMBINACIONES = 1 << len(COLUMNAS_EMBUDO)
+# _MARCAS[k, j] vale 1 si la combinación k tiene la marca COLUMNAS_EMBUDO[j].
+_MARCAS = (np.arange(_COMBINACIONES)[:, None] >> np.arange(len(COLUMNAS_EMBUDO))) & 1
+
+
+def _codigos(serie):
+    # (códigos, valores) con los valores en el orden en que groupby ordena sus claves; -1 = vacío.
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(dtype=np.int64), serie.cat.categories
+    codigos, valores = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int64, copy=False), valores
+
+
+def _claves(serie, valores, presentes):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(presentes, dtype=serie.dtype)
+    return pd.Series(np.asarray(valores, dtype=object)[presentes], dtype=object).astype(serie.dtype)
+
+
+def construir_cubo_embudo(df, dimensiones=DIMENSIONES_CUBO):
+    """
+    El embudo de `df` desglosado por cada una de `dimensiones`: {dimensión:
+    DataFrame} con una fila por valor presente, sus prospectados
+    (PROSPECTADOS) y la suma de cada columna de COLUMNAS_EMBUDO; lo mismo que
+    agrupar(df, [dimensión], COLUMNAS_EMBUDO, PROSPECTADOS). Las marcas del
+    embudo de cada fila se empaquetan en un número, así cada dimensión se
+    cuenta con un solo bincount de (valor, combinación de marcas) en vez de
+    un groupby por medida. `df` debe traer las columnas de agregar_columnas_embudo.
+    """
+    combinacion = np.zeros(len(df), dtype=np.int64)
+    for bit, columna in enumerate(COLUMNAS_EMBUDO):
+        combinacion |= df[columna].to_numpy(dtype=bool).astype(np.int64) << bit
+
+    cubo = {}
+    for dimension in dimensiones:
+        if dimension not in df.columns:
+            continue
+        serie = df[dimension]
+        codigos, valores = _codigos(serie)
+        con_valor = codigos >= 0
+        por_combinacion = np.bincount(
+            codigos[con_valor] * _COMBINACIONES + combinacion[con_valor],
+            minlength=len(valores) * _COMBINACIONES).reshape(len(valores), _COMBINACIONES)
+        presentes = np.flatnonzero(por_combinacion.any(axis=1))
+        por_combinacion = por_combinacion[presentes]
+        resumen = pd.DataFrame({dimension: _claves(serie, valores, presentes),
+                                PROSPECTADOS: por_combinacion.sum(axis=1)})
+        resumen[COLUMNAS_EMBUDO] = por_combinacion @ _MARCAS
+        cubo[dimension] = resumen
+    return cubo
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _conteos_por_version(vista, version, _df):
+    return contar_embudo(_df)
+
+
+def obtener_conteos_embudo(df, vista, version):
+    """
+    contar_embudo de `df`, la vista `vista` del dataset maestro en su
+    `version`: se cuenta una vez por versión y lo comparten todas las sesiones.
+    """
+    return dict(_conteos_por_version(vista, version, df))
+
+
+def resumen_embudo(df, dimension, cubo=None):
+    """
+    El desglose del embudo de `df` por `dimension`, con el formato de
+    construir_cubo_embudo: leído de `cubo` (el de este mismo `df`) si lo
+    trae, si no calculado en el momento.
+    """
+    if cubo is not None and dimension in cubo:
+        return cubo[dimension].copy()
+    return agrupar(df, [dimension], COLUMNAS_EMBUDO, PROSPECTADOS)
@@ -0,0 +1,178 @@
+# Prospe/datos/esquemas.py
+from collections import Counter
+import numpy as np
+import pandas as pd
+from datos.fechas import parsear_fechas
+from datos.kpis import parsear_valores_kpi
+
+# Tipos de columna de un esquema.
+TEXTO = "texto"
+SI_NO = "si_no"
+FECHA = "fecha"
+ENTERO = "entero"
+
+ENCABEZADO_VACIO = "Columna_Vacia"
+
+
+def columna(nombre, tipo=TEXTO, formato=None, seriales=False, afirmativos=(), convertir=None, relleno=None,
+            vacios=(), mayusculas=None, alias=None, categorica=False, requerida=False, origen=None):
+    """
+    Describe una columna de una hoja para aplicar_esquema.
+
+    - tipo: TEXTO, SI_NO (texto de respuesta en el que "no" y los vacíos
+      se unifican en `relleno`), FECHA o ENTERO (número escrito a mano en
+      una hoja de KPIs; ver datos/kpis.parsear_valores_kpi).
+    - formato: formato strptime de una FECHA (None = lo infiere pandas), o una
+      tupla de formatos que se prueban en orden (datos/fechas.parsear_fechas).
+    - seriales: con una tupla de formatos, leer los textos solo de dígitos
+      como números de serie de fecha de Sheets.
+    - afirmativos: para un ENTERO, textos que valen 1 (datos/kpis.parsear_valores_kpi).
+    - convertir: función por celda para FECHA o ENTERO cuando un formato no basta.
+    - relleno: valor de las celdas vacías y de la columna si falta en la hoja.
+      Si es None y la columna falta, no se crea (ENTERO rellena con 0).
+    - vacios: textos que cuentan como celda vacía, sin distinguir mayúsculas.
+    - mayusculas: "title", "upper" o "lower" para normalizar el texto.
+    - alias: {valor: valor canónico} que se aplica después de normalizar.
+    - categorica: guardar la columna como category (el alias se aplica
+      entonces sobre las categorías, no fila a fila).
+    - requerida: descartar las filas en las que la FECHA no se pudo leer.
+    - origen: nombre de la columna en la hoja, si no coincide con `nombre`.
+    """
+    if tipo == ENTERO and relleno is None:
+        relleno = 0
+    vacios = {str(v).strip().lower() for v in vacios} | {""}
+    if tipo == SI_NO:
+        vacios.add("no")
+        if relleno is None:
+            relleno = "No"
+    return {"nombre": nombre, "tipo": tipo, "formato": formato, "seriales": seriales,
+            "afirmativos": afirmativos, "convertir": convertir, "relleno": relleno, "vacios": vacios, "mayusculas": mayusculas,
+            "alias": alias, "categorica": categorica, "requerida": requerida, "origen": origen or nombre}
+
+
+def encabezados_unicos(encabezados):
+    """Encabezados sin espacios y sin repetidos ('Col', 'Col_1', ...); los vacíos pasan a 'Columna_Vacia'."""
+    contador = Counter()
+    resultado = []
+    for h in encabezados:
+        h_limpio = str(h).strip() if pd.notna(h) else ""
+        if not h_limpio:
+            h_limpio = ENCABEZADO_VACIO
+        contador[h_limpio] += 1
+        resultado.append(h_limpio if contador[h_limpio] == 1 else f"{h_limpio}_{contador[h_limpio] - 1}")
+    return resultado
+
+
+def dataframe_desde_valores(valores, esquema=None):
+    """
+    DataFrame a partir de los valores de una hoja (encabezados en la primera
+    fila, como get_all_values). Con `esquema` las columnas salen ya tipadas.
+    """
+    if not valores:
+        return pd.DataFrame()
+    df = pd.DataFrame(valores[1:], columns=encabezados_unicos(valores[0]))
+    return aplicar_esquema(df, esquema) if esquema else df
+
+
+def columnas_faltantes(df, esquema):
+    """Columnas del esquema que no están en la hoja, para avisar antes de aplicar_esquema."""
+    return [c["nombre"] for c in esquema if c["origen"] not in df.columns]
+
+
+def _texto(serie, col):
+    texto = serie.fillna("").astype(str).str.strip()
+    vacio = texto.str.lower().isin(col["vacios"])
+    if col["mayusculas"]:
+        texto = getattr(texto.str, col["mayusculas"])()
+    if col["relleno"] is not None:
+        texto = texto.mask(vacio, col["relleno"])
+    return texto
+
+
+def _fecha(serie, col):
+    if col["convertir"] is not None:
+        return pd.to_datetime(serie.map(col["convertir"]), errors="coerce")
+    if isinstance(col["formato"], tuple):
+        return parsear_fechas(serie, col["formato"], col["seriales"])
+    texto = serie.fillna("").astype(str).str.strip()
+    return pd.to_datetime(texto.mask(texto == "", None), format=col["formato"], errors="coerce")
+
+
+def _entero(serie, col):
+    if col["convertir"] is not None:
+        return serie.map(col["convertir"]).astype(int)
+    return parsear_valores_kpi(serie, col["afirmativos"]).fillna(col["relleno"]).astype(int)
+
+
+_CONVERSORES = {TEXTO: _texto, SI_NO: _texto, FECHA: _fecha, ENTERO: _entero}
+
+
+def remapear_categorias(serie, alias):
+    """
+    Aplica `alias` a una columna category trabajando solo sobre sus categorías:
+    varios alias pueden ir a parar a la misma categoría, y las filas solo se
+    recodifican con una operación de numpy.
+    """
+    categorias = serie.cat.categories
+    nuevas = [alias.get(c, c) for c in categorias]
+    if nuevas == list(categorias):
+        return serie
+    unicas = pd.Index(nuevas).unique()
+    if len(unicas) == len(nuevas):
+        return serie.cat.rename_categories(nuevas)
+    destino = unicas.get_indexer(nuevas)
+    codigos = serie.cat.codes.to_numpy()
+    codigos = np.where(codigos >= 0, destino[codigos], -1)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=unicas),
+                     index=serie.index, name=serie.name)
+
+
+def _a_categoria(serie, col):
+    serie = serie.astype("category")
+    return remapear_categorias(serie, col["alias"]) if col["alias"] else serie
+
+
+def categorizar(df, columnas):
+    """
+    Convierte a category las columnas de `columnas` que estén en `df`. Para la
+    hoja ya completa: los deltas de la sincronización incremental traen
+    categorías distintas y al concatenarlos volverían a ser texto.
+    """
+    df = df.copy(deep=False)
+    for nombre in columnas:
+        if nombre in df.columns:
+            df[nombre] = df[nombre].astype("category")
+    return df
+
+
+def aplicar_esquema(df, esquema):
+    """
+    Devuelve `df` con las columnas del esquema convertidas a su tipo, columna
+    a columna y con operaciones vectorizadas. Las columnas que no están en el
+    esquema se conservan tal cual. Todo es fila a fila, así que también vale
+    para los deltas de la sincronización incremental (datos/sincronizacion.py),
+    salvo las columnas categóricas: ver categorizar.
+    """
+    df = df.copy(deep=False)
+    requeridas, categoricas = [], []
+    for col in esquema:
+        nombre = col["nombre"]
+        if col["origen"] not in df.columns:
+            if col["relleno"] is not None:
+                df[nombre] = col["relleno"]
+                if col["categorica"]:
+                    categoricas.append(col)
+            continue
+        df[nombre] = _CONVERSORES[col["tipo"]](df[col["origen"]], col)
+        if col["categorica"]:
+            categoricas.append(col)
+        elif col["alias"]:
+            df[nombre] = df[nombre].replace(col["alias"])
+        if col["requerida"]:
+            requeridas.append(nombre)
+    if requeridas:
+        df = df.dropna(subset=requeridas)
+    # Después de descartar filas, para que no queden categorías sin uso.
+    for col in categoricas:
+        df[col["nombre"]] = _a_categoria(df[col["nombre"]], col)
+    return df
@@ -0,0 +1,154 @@
+# Prospe/datos/fechas.py
+import datetime
+import numpy as np
+import pandas as pd
+
+# Formatos de las fechas escritas a mano en las hojas, en el orden en que se prueban.
+FORMATOS_FECHA_COMUNES = (
+    "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%d",
+    "%m/%d/%Y %H:%M:%S", "%m/%d/%Y",
+)
+
+# Día 0 de los números de serie de fecha de Google Sheets / Excel.
+ORIGEN_SERIAL = pd.Timestamp("1899-12-30")
+# Un número de serie mayor no cabe en un Timedelta y se trata como texto.
+MAX_DIAS_SERIAL = pd.Timedelta.max / pd.Timedelta(days=1)
+
+# Clave de df.attrs con la que ordenar_por_fecha marca la columna por la que
+# quedó ordenado el DataFrame. Los filtros por máscara y los cortes conservan
+# el orden (y pandas copia attrs), así que las vistas filtradas la heredan.
+ORDENADO_POR_FECHA = "ordenado_por_fecha"
+
+
+def _inferir_fecha(texto):
+    try:
+        fecha = pd.to_datetime(texto, errors="coerce")
+    except (ValueError, TypeError):
+        return pd.NaT
+    if fecha is not pd.NaT and fecha.tzinfo is not None:
+        fecha = fecha.tz_convert(None)
+    return fecha
+
+
+def _parsear_textos(textos, formatos, seriales):
+    # `textos`: Index de textos distintos y no vacíos. Cada paso trabaja solo con los que siguen sin fecha.
+    fechas = np.full(len(textos), np.datetime64("NaT"), dtype="datetime64[ns]")
+    pendientes = np.ones(len(textos), dtype=bool)
+
+    if seriales:
+        posiciones = np.flatnonzero(textos.str.isdigit())
+        dias = pd.to_numeric(textos[posiciones], errors="coerce").to_numpy(dtype=float)
+        validos = dias <= MAX_DIAS_SERIAL
+        posiciones = posiciones[validos]
+        fechas[posiciones] = (ORIGEN_SERIAL + pd.to_timedelta(dias[validos], unit="D")).to_numpy()
+        pendientes[posiciones] = False
+
+    for formato in formatos:
+        posiciones = np.flatnonzero(pendientes)
+        if not len(posiciones):
+            break
+        parseadas = pd.to_datetime(textos[posiciones], format=formato, errors="coerce")
+        leidas = parseadas.notna()
+        fechas[posiciones[leidas]] = parseadas[leidas].to_numpy()
+        pendientes[posiciones[leidas]] = False
+
+    # Lo que no encaja en ningún formato suele ser poco y variado: pandas lo interpreta texto a texto.
+    for posicion in np.flatnonzero(pendientes):
+        fechas[posicion] = _inferir_fecha(textos[posicion]).to_datetime64()
+    return fechas
+
+
+def parsear_fechas(serie, formatos=FORMATOS_FECHA_COMUNES, seriales=False):
+    """
+    Convierte a datetime64 una columna de fechas escritas a mano. Celda a
+    celda el resultado es: vacío -> NaT; un datetime/date se conserva; con
+    `seriales`, un texto solo de dígitos es un número de serie de Sheets;
+    si no, el primer formato de `formatos` que encaje exactamente; y si
+    ninguno encaja, lo que pandas infiera de esa celda (o NaT).
+
+    Cada texto distinto se convierte una sola vez: los formatos se prueban
+    con to_datetime sobre los textos aún sin fecha y los números de serie
+    se suman en una sola operación.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return pd.to_datetime(serie)
+    valores = serie.to_numpy(dtype=object)
+    fechas = np.full(len(valores), np.datetime64("NaT"), dtype="datetime64[ns]")
+    con_valor = ~pd.isna(valores)
+
+    if pd.api.types.infer_dtype(valores, skipna=True) not in ("string", "empty"):
+        es_fecha = np.array([isinstance(v, (datetime.datetime, datetime.date)) for v in valores], dtype=bool)
+        if es_fecha.any():
+            fechas[es_fecha] = pd.to_datetime(list(valores[es_fecha])).to_numpy()
+            con_valor &= ~es_fecha
+
+    posiciones = np.flatnonzero(con_valor)
+    textos = pd.Series(valores[posiciones], dtype=object).astype(str).str.strip()
+    no_vacios = (textos != "").to_numpy()
+    posiciones, textos = posiciones[no_vacios], textos[no_vacios]
+    if len(posiciones):
+        codigos, unicos = pd.factorize(textos)
+        fechas[posiciones] = _parsear_textos(pd.Index(unicos), formatos, seriales)[codigos]
+    return pd.Series(fechas, index=serie.index, name=serie.name)
+
+
+def valores_fecha(serie):
+    """
+    Los valores de la serie de fechas `serie` como datetime64[ns] sin zona
+    horaria (la hora local de la hoja), como se comparan los días.
+    """
+    if serie.dt.tz is not None:
+        serie = serie.dt.tz_localize(None)
+    return serie.to_numpy(dtype="datetime64[ns]")
+
+
+def limite_dia(fecha, dias=0):
+    """
+    El inicio del día de `fecha` más `dias` como datetime64[ns], para
+    compararlo con valores_fecha; None si `fecha` es None (sin límite).
+    """
+    return None if fecha is None else np.datetime64(pd.Timestamp(fecha).normalize() + pd.Timedelta(days=dias), "ns")
+
+
+def ordenar_por_fecha(df, columna):
+    """
+    `df` ordenado por `columna` (estable, sin fecha al final) y marcado con
+    ORDENADO_POR_FECHA para que filtrar_rango_fechas corte sin recorrer la
+    columna. Los filtros por máscara conservan el orden, así que basta con
+    ordenar una vez al construir la vista; lo que reordene las filas después
+    no debe usarse con filtrar_rango_fechas sin volver a ordenar.
+    """
+    if columna not in df.columns or not pd.api.types.is_datetime64_any_dtype(df[columna]):
+        return df
+    ordenado = df.sort_values(columna, kind="stable", na_position="last", ignore_index=True)
+    ordenado.attrs[ORDENADO_POR_FECHA] = columna
+    return ordenado
+
+
+def filtrar_rango_fechas(df, columna, fecha_ini=None, fecha_fin=None):
+    """
+    Filas de `df` con `columna` (datetime64) entre los días fecha_ini y
+    fecha_fin, ambos incluidos; un extremo en None deja ese lado abierto y
+    las filas sin fecha nunca entran. Si `df` viene de ordenar_por_fecha por
+    esta columna (la marca ORDENADO_POR_FECHA) los límites se buscan con
+    searchsorted y el resultado es un corte, sin recorrer la columna; si no,
+    se compara sobre datetime64 sin pasar por objetos date.
+    """
+    serie = df[columna]
+    desde, hasta = limite_dia(fecha_ini), limite_dia(fecha_fin, dias=1)
+    if df.attrs.get(ORDENADO_POR_FECHA) == columna and serie.dt.tz is None:
+        valores = serie.to_numpy(dtype="datetime64[ns]")
+        # NaT va al final y searchsorted lo trata como mayor que cualquier fecha.
+        inicio = 0 if desde is None else np.searchsorted(valores, desde, side="left")
+        fin = np.searchsorted(valores, np.datetime64("NaT", "ns") if hasta is None else hasta, side="left")
+        return df.iloc[inicio:max(inicio, fin)]
+
+    valores = valores_fecha(serie)
+
+    mascara = ~np.isnat(valores)
+    if desde is not None:
+        mascara &= valores >= desde
+    if hasta is not None:
+        mascara &= valores < hasta
+    return df[mascara]
@@ -0,0 +1,58 @@
+# Prospe/datos/fuentes.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+TIMEOUT_FUENTE_SEGUNDOS = 45
+MAX_HILOS_FUENTES = 8
+
+
+def fuente(nombre, cargar, timeout=TIMEOUT_FUENTE_SEGUNDOS, activa=True):
+    """
+    Define una fuente para cargar_fuentes. `cargar` es una función sin
+    argumentos que devuelve el resultado de la fuente o lanza una excepción.
+    Una fuente con activa=False queda registrada pero no se carga.
+    """
+    return {"nombre": nombre, "cargar": cargar, "timeout": timeout, "activa": activa}
+
+
+def _ejecutar_fuente(cargar, ctx):
+    # Con el contexto del script los st.warning/st.error de la fuente llegan a la página.
+    if ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+    return cargar()
+
+
+def cargar_fuentes(fuentes):
+    """
+    Carga en paralelo todas las fuentes activas, de modo que la latencia total
+    es la de la fuente más lenta y no la suma de todas.
+
+    Devuelve (resultados, errores): dos diccionarios por nombre de fuente, en
+    el orden en que se registraron. Una fuente que falla o supera su timeout
+    aparece solo en `errores` (con el mensaje) y no afecta a las demás.
+    """
+    activas = [f for f in fuentes if f["activa"]]
+    resultados, errores = {}, {}
+    if not activas:
+        return resultados, errores
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    executor = ThreadPoolExecutor(max_workers=min(MAX_HILOS_FUENTES, len(activas)),
+                                  thread_name_prefix="fuente")
+    try:
+        inicio = time.monotonic()
+        futuros = [(f, executor.submit(_ejecutar_fuente, f["cargar"], ctx)) for f in activas]
+        for f, futuro in futuros:
+            restante = max(0.0, inicio + f["timeout"] - time.monotonic())
+            try:
+                resultados[f["nombre"]] = futuro.result(timeout=restante)
+            except FuturesTimeoutError:
+                errores[f["nombre"]] = f"Tiempo de espera agotado ({f['timeout']} s)."
+            except Exception as e:
+                errores[f["nombre"]] = str(e) or type(e).__name__
+    finally:
+        # Una fuente colgada no debe bloquear la página: su hilo termina por su cuenta.
+        executor.shutdown(wait=False, cancel_futures=True)
+    return resultados, errores
@@ -0,0 +1,82 @@
+# Prospe/datos/kpis.py
+import numpy as np
+import pandas as pd
+
+# Textos que cuentan como una sesión en "Sesiones agendadas" cuando la celda no es un número.
+AFIRMATIVOS_SESION = ("vc", "si", "sí", "yes", "true")
+
+
+def _parsear_textos(textos, afirmativos):
+    # `textos`: Series de textos distintos ya normalizados.
+    numeros = pd.to_numeric(textos, errors="coerce")
+    pendientes = numeros.isna().to_numpy()
+    # Copia propia: con Copy-on-Write to_numpy puede devolver un array de solo lectura.
+    valores = numeros.to_numpy(dtype=float, na_value=np.nan, copy=True)
+    if not pendientes.any():
+        return valores
+
+    resto = textos[pendientes]
+    if afirmativos:
+        valores[pendientes] = np.where(resto.isin(afirmativos), 1.0, 0.0)
+    else:
+        antes_guion = resto.str.split("-", n=1).str[0].str.strip()
+        valores[pendientes] = pd.to_numeric(antes_guion, errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    return valores
+
+
+def parsear_valores_kpi(serie, afirmativos=()):
+    """
+    Convierte una columna de KPIs escritos a mano en números (float), con
+    operaciones sobre toda la columna:
+    - una celda numérica vale su número; vacía o no numérica, 0;
+    - con `afirmativos`, un texto de esa lista vale 1 (p. ej. 'sí' en
+      "Sesiones agendadas");
+    - sin ellos, de un texto como '3 - Realizadas' se toma el número de
+      antes del primer guion.
+    Sin distinguir mayúsculas ni espacios alrededor. Una hoja semanal repite
+    pocos valores distintos: cada uno se convierte una sola vez.
+    """
+    codigos, unicos = pd.factorize(serie.astype(str), use_na_sentinel=False)
+    textos = pd.Series(unicos, dtype=object).str.strip().str.lower()
+    valores = _parsear_textos(textos, afirmativos)[codigos]
+    return pd.Series(valores, index=serie.index, name=serie.name)
+
+
+# --- Tasas de conversión ---
+
+# Tasas del embudo de las hojas de KPIs: (numerador, denominador).
+TASAS_EMBUDO_KPIS = {
+    "mensajes_invites": ("Mensajes Enviados", "Invites enviadas"),
+    "respuestas_mensajes": ("Respuestas", "Mensajes Enviados"),
+    "sesiones_respuestas": ("Sesiones agendadas", "Respuestas"),
+    "sesiones_invites": ("Sesiones agendadas", "Invites enviadas"),
+}
+
+
+def calcular_tasa(numerador, denominador, decimales=1):
+    """
+    numerador / denominador en porcentaje, redondeado a `decimales` (None no
+    redondea); 0.0 donde el denominador es 0. Acepta escalares (devuelve un
+    float) o columnas enteras (devuelve un array), sin recorrer fila a fila.
+    """
+    numerador = np.asarray(numerador, dtype=float)
+    denominador = np.asarray(denominador, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tasa = np.where(denominador == 0, 0.0, numerador / denominador * 100)
+    if decimales is not None:
+        tasa = np.round(tasa, decimales)
+    return float(tasa) if tasa.ndim == 0 else tasa
+
+
+def agregar_tasas(df, tasas, decimales=1):
+    """
+    Añade a `df` una columna por cada tasa de `tasas` ({nombre: (numerador,
+    denominador)}, nombres de columnas de `df`) con calcular_tasa. Si falta
+    alguna de las dos columnas, la tasa vale 0.0. Devuelve `df`.
+    """
+    for nombre, (numerador, denominador) in tasas.items():
+        if numerador in df.columns and denominador in df.columns:
+            df[nombre] = calcular_tasa(df[numerador], df[denominador], decimales)
+        else:
+            df[nombre] = 0.0
+    return df
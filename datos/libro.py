@@ -0,0 +1,58 @@
+# Prospe/datos/libro.py
+import streamlit as st
+from gspread.utils import absolute_range_name, fill_gaps
+from datos.conexion import obtener_cliente_gspread
+
+URL_LIBRO_PRINCIPAL_DEFAULT = "https://docs.google.com/spreadsheets/d/1_J_WLYf2cjiKp2JTxsFj1KYoGTzPA730Bw3YP4-q7Fs/edit?gid=0#gid=0"
+
+# Un entero es la posición de la pestaña (0 = workbook.sheet1); un texto, su título.
+PRIMERA_HOJA = 0
+HOJA_KPIS_SDR = "KPI´s SDR"
+
+# Todas las pestañas del libro principal que usan las páginas:
+# sheet1 (Dashboard, Mensajes, Campañas) y 'KPI´s SDR' (KPIs SDR).
+HOJAS_LIBRO_PRINCIPAL = (PRIMERA_HOJA, HOJA_KPIS_SDR)
+
+# Corto a propósito: solo agrupa las lecturas que varias páginas hacen casi a la vez.
+TTL_LIBRO_SEGUNDOS = 60
+
+
+def url_libro_principal():
+    return st.secrets.get("main_prostraction_sheet_url", URL_LIBRO_PRINCIPAL_DEFAULT)
+
+
+@st.cache_data(ttl=TTL_LIBRO_SEGUNDOS, show_spinner=False)
+def leer_hojas_libro(sheet_url, hojas):
+    """
+    Lee varias pestañas de un libro con una sola llamada values_batch_get.
+    Devuelve {hoja: valores}, con los valores rellenados igual que get_all_values.
+    Las pestañas que no existen no aparecen en el resultado, para que una
+    pestaña borrada no impida leer las demás.
+    """
+    workbook = obtener_cliente_gspread().open_by_url(sheet_url)
+    titulos_libro = [s["properties"]["title"] for s in workbook.fetch_sheet_metadata()["sheets"]]
+
+    encontradas, titulos = [], []
+    for hoja in hojas:
+        if isinstance(hoja, int):
+            if hoja < len(titulos_libro):
+                encontradas.append(hoja); titulos.append(titulos_libro[hoja])
+        elif hoja in titulos_libro:
+            encontradas.append(hoja); titulos.append(hoja)
+    if not titulos:
+        return {}
+
+    respuesta = workbook.values_batch_get([absolute_range_name(t) for t in titulos])
+    rangos = respuesta.get("valueRanges", [])
+    return {hoja: fill_gaps(rango.get("values", [])) for hoja, rango in zip(encontradas, rangos)}
+
+
+def leer_libro_principal(releer=False):
+    """
+    Todas las pestañas de HOJAS_LIBRO_PRINCIPAL, compartidas por todas las
+    páginas que las consumen. Con releer=True se descarta la lectura en caché
+    (de hasta TTL_LIBRO_SEGUNDOS) y se vuelve a leer de Sheets.
+    """
+    if releer:
+        leer_hojas_libro.clear()
+    return leer_hojas_libro(url_libro_principal(), HOJAS_LIBRO_PRINCIPAL)
@@ -0,0 +1,184 @@
+# Prospe/datos/motor_analitico.py
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from datos.fechas import limite_dia, valores_fecha
+
+try:
+    import duckdb
+except ImportError:
+    # DuckDB es opcional: sin él todo se calcula con pandas.
+    duckdb = None
+
+# Valores del secret `motor_analitico`. "pandas" es el cálculo de siempre;
+# "duckdb" ejecuta filtros y agregaciones como SQL, en paralelo, dentro del proceso.
+MOTORES_ANALITICOS = ("pandas", "duckdb")
+MOTOR_ANALITICO_DEFAULT = "pandas"
+# Posición de cada fila en la tabla registrada, para recortar el DataFrame con iloc.
+_COLUMNA_FILA = "__fila__"
+# Con estos errores la consulta se repite con pandas: columnas object con
+# tipos mezclados que Arrow no convierte o comparaciones que DuckDB rechaza.
+_ERRORES_SQL = (pa.ArrowException, ValueError, TypeError) + ((duckdb.Error,) if duckdb is not None else ())
+
+
+def motor_configurado():
+    motor = str(st.secrets.get("motor_analitico", MOTOR_ANALITICO_DEFAULT)).strip().lower()
+    return motor if motor in MOTORES_ANALITICOS else MOTOR_ANALITICO_DEFAULT
+
+
+def usar_duckdb():
+    """True si el secret `motor_analitico` pide "duckdb" y está instalado; si no, se usa pandas."""
+    return duckdb is not None and motor_configurado() == "duckdb"
+
+
+@st.cache_resource(show_spinner=False)
+def _base_duckdb():
+    # Una base en memoria por proceso. Cada consulta abre su propio cursor (otra
+    # conexión a la misma base), así las sesiones no se pisan las tablas registradas.
+    base = duckdb.connect(":memory:")
+    base.execute(f"SET threads TO {os.cpu_count() or 1}")
+    return base
+
+
+def _identificador(columna):
+    return '"' + str(columna).replace('"', '""') + '"'
+
+
+def _escalar(valor):
+    # DuckDB no enlaza escalares de numpy como parámetros.
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+def _consultar(tabla, sql, parametros=()):
+    # `tabla` (Arrow) se registra como "datos" solo para este cursor; DuckDB
+    # la lee sin copiarla. Devuelve el resultado también como tabla Arrow.
+    cursor = _base_duckdb().cursor()
+    try:
+        cursor.register("datos", tabla)
+        return cursor.execute(sql, [_escalar(p) for p in parametros]).fetch_arrow_table()
+    finally:
+        cursor.close()
+
+
+# --- Filtros ---
+
+def _condicion_valores(serie, seleccion, normalizar):
+    # Los valores distintos de la columna que pasan el filtro, decididos como en
+    # pandas (isin, o el texto sin espacios ni mayúsculas): el WHERE compara con
+    # ellos y no depende de cómo convierta tipos DuckDB.
+    columna = _identificador(serie.name)
+    buscados = set(seleccion)
+    crudos, con_vacios = [], False
+    for valor in pd.unique(serie):
+        clave = str(valor).strip().lower() if normalizar else valor
+        if pd.isna(valor):
+            con_vacios = con_vacios or (normalizar and clave in buscados)
+        elif clave in buscados:
+            crudos.append(valor)
+    condiciones = [f"{columna} IN ({', '.join('?' * len(crudos))})"] if crudos else []
+    if con_vacios:
+        condiciones.append(f"{columna} IS NULL")
+    return "(" + (" OR ".join(condiciones) or "FALSE") + ")", crudos
+
+
+def posiciones_consulta(df, consulta):
+    """
+    Posiciones, en orden, de las filas de `df` que cumplen la `consulta`
+    compilada (filtros.especificacion.compilar), resuelta con un solo WHERE
+    en DuckDB. Da las mismas filas que aplicar los predicados con pandas.
+    None si el motor no es duckdb o la consulta no se pudo ejecutar como SQL.
+    """
+    if not usar_duckdb():
+        return None
+    columnas, condiciones, parametros = {_COLUMNA_FILA: pa.array(np.arange(len(df)))}, [], []
+    try:
+        for predicado in consulta:
+            tipo, nombre = predicado[0], predicado[1]
+            serie = df[nombre]
+            if tipo == "fechas":
+                if not pd.api.types.is_datetime64_any_dtype(serie):
+                    continue
+                columnas[nombre] = pa.array(valores_fecha(serie), from_pandas=True)
+                for limite, operador in ((limite_dia(predicado[2]), ">="), (limite_dia(predicado[3], dias=1), "<")):
+                    if limite is not None:
+                        condiciones.append(f"{_identificador(nombre)} {operador} ?")
+                        parametros.append(pd.Timestamp(limite).to_pydatetime())
+                condiciones.append(f"{_identificador(nombre)} IS NOT NULL")
+            else:
+                condicion, crudos = _condicion_valores(serie, predicado[2], predicado[3])
+                columnas[nombre] = pa.Array.from_pandas(serie)
+                condiciones.append(condicion)
+                parametros.extend(crudos)
+        sql = (f"SELECT {_COLUMNA_FILA} FROM datos WHERE {' AND '.join(condiciones) or 'TRUE'} "
+               f"ORDER BY {_COLUMNA_FILA}")
+        resultado = _consultar(pa.table(columnas), sql, parametros)
+    except _ERRORES_SQL:
+        return None
+    return resultado.column(_COLUMNA_FILA).to_numpy()
+
+
+# --- Agregaciones ---
+
+def _agrupar_pandas(df, grupos, sumas, nombre_conteo):
+    agrupado = df.groupby(grupos, observed=True)
+    resultado = agrupado.size().to_frame(nombre_conteo)
+    for columna in sumas:
+        resultado[columna] = agrupado[columna].sum()
+    return resultado.reset_index()
+
+
+def _tipo_suma(dtype, totales):
+    # El dtype que deja sum() de groupby: booleanos en int64 y enteros pequeños
+    # en el suyo mientras los totales quepan (si no, en int64).
+    if pd.api.types.is_bool_dtype(dtype):
+        return np.dtype(np.int64)
+    if pd.api.types.is_integer_dtype(dtype) and len(totales):
+        # Los enteros con nulos (Int64...) se miden por su dtype de numpy.
+        limites = np.iinfo(getattr(dtype, "numpy_dtype", dtype))
+        if totales.min() < limites.min or totales.max() > limites.max:
+            return np.dtype(np.int64)
+    return dtype
+
+
+def _agrupar_sql(df, grupos, sumas, nombre_conteo):
+    claves = ", ".join(map(_identificador, grupos))
+    agregados = [f"COUNT(*) AS {_identificador(nombre_conteo)}"]
+    for columna in sumas:
+        tipo = "DOUBLE" if pd.api.types.is_float_dtype(df[columna]) else "BIGINT"
+        agregados.append(f"CAST(SUM(CAST({_identificador(columna)} AS {tipo})) AS {tipo}) AS {_identificador(columna)}")
+    no_vacias = " AND ".join(f"{_identificador(c)} IS NOT NULL" for c in grupos)
+    tabla = pa.Table.from_pandas(df[list(dict.fromkeys(grupos + sumas))], preserve_index=False)
+    resultado = _consultar(
+        tabla, f"SELECT {claves}, {', '.join(agregados)} FROM datos WHERE {no_vacias} GROUP BY {claves}"
+    ).to_pandas()
+
+    # Mismos tipos y orden que groupby: claves con el dtype de `df` y ordenadas
+    # por ellas, y las sumas con el dtype que les daría pandas.
+    for columna in grupos:
+        resultado[columna] = resultado[columna].astype(df[columna].dtype)
+        if df[columna].dtype == object:
+            # groupby deduce el tipo de las claves object (p. ej. solo enteros: int64).
+            resultado[columna] = resultado[columna].infer_objects()
+    for columna in sumas:
+        totales = resultado[columna].fillna(0)
+        resultado[columna] = totales.astype(_tipo_suma(df[columna].dtype, totales))
+    return resultado.sort_values(grupos, kind="stable", ignore_index=True)
+
+
+def agrupar(df, grupos, sumas=(), nombre_conteo="n"):
+    """
+    Una fila por combinación de `grupos` presente en `df` (sin las que tienen
+    alguna clave vacía), con las filas de cada una en `nombre_conteo` y la
+    suma de cada columna de `sumas`, ordenado por `grupos`. Es
+    df.groupby(grupos, observed=True) con size() y sum(); con el motor duckdb
+    se calcula como SQL y el resultado es el mismo DataFrame.
+    """
+    grupos, sumas = list(grupos), list(sumas)
+    if usar_duckdb() and not df.empty:
+        try:
+            return _agrupar_sql(df, grupos, sumas, nombre_conteo)
+        except _ERRORES_SQL:
+            pass
+    return _agrupar_pandas(df, grupos, sumas, nombre_conteo)
@@ -0,0 +1,256 @@
+# Prospe/datos/motor_kpis.py
+import threading
+import time
+import gspread
+import pandas as pd
+import streamlit as st
+from datos.acumulados import obtener_acumulados, resumir_acumulados
+from datos.carga_datos import HOJA_MAESTRA_KPIS_SDR, datos_maestros_en_memoria, obtener_vista, valores_hoja_maestra
+from datos.compartido import vista_compartida
+from datos.conexion import obtener_cliente_gspread
+from datos.esquemas import ENTERO, FECHA, aplicar_esquema, columna, columnas_faltantes, encabezados_unicos
+from datos.fuentes import cargar_fuentes, fuente
+from datos.kpis import AFIRMATIVOS_SESION
+from datos.sincronizacion import encabezados_sincronizados, sincronizar_hoja
+
+# Columnas de KPIs de las hojas semanales, en el orden del embudo.
+COLUMNAS_KPI = ("Invites enviadas", "Mensajes Enviados", "Respuestas", "Sesiones agendadas")
+# Las hojas de KPIs se releen como mucho cada TTL (las del libro principal siguen su propio TTL).
+TTL_KPIS_SEGUNDOS = 300
+
+# Granos de los acumulados de cada carga (datos/acumulados.py): las sumas de
+# COLUMNAS_KPI por periodo, analista y región (las columnas que tenga la hoja).
+GRANOS_KPIS = {
+    "semanal": ("Año", "NumSemana", "Analista", "Región"),
+    "mensual": ("Año", "MesNum", "AñoMes", "Analista", "Región"),
+}
+
+
+def fuente_kpis(titulo, url=None, secret_url=None, pestana=None, hoja_maestra=None, columnas=None,
+                relleno_periodo="", analista=None, avisar_faltantes=True):
+    """
+    Define una hoja de KPIs semanales para el motor.
+
+    - url / secret_url: la hoja se abre con la URL del secret `secret_url` o,
+      si no está, con `url`.
+    - pestana: nombre de la pestaña; None = la primera (sheet1).
+    - hoja_maestra: en vez de una URL, la pestaña del dataset maestro
+      (datos/carga_datos.HOJA_MAESTRA_*) de la que se deriva.
+    - columnas: {columna del motor: encabezado en la hoja} para las que se
+      llaman distinto en esa hoja.
+    - relleno_periodo: valor de "Mes" y "Semana" vacíos.
+    - analista: si la hoja es de una sola persona, se fuerza en "Analista".
+    - avisar_faltantes: avisar en la página de las columnas KPI que faltan
+      (ver avisos_kpis).
+    """
+    columnas = columnas or {}
+    esquema = (
+        columna("Fecha", FECHA, formato='%d/%m/%Y', requerida=True, origen=columnas.get("Fecha")),
+        *(columna(c, ENTERO, afirmativos=AFIRMATIVOS_SESION if c == "Sesiones agendadas" else (),
+                  origen=columnas.get(c)) for c in COLUMNAS_KPI),
+        *(columna(c, relleno=relleno_periodo, origen=columnas.get(c)) for c in ("Mes", "Semana")),
+        *(columna(c, relleno="N/D", origen=columnas.get(c)) for c in ("Analista", "Región")),
+    )
+    return {"titulo": titulo, "url": url, "secret_url": secret_url, "pestana": pestana,
+            "hoja_maestra": hoja_maestra, "esquema": esquema, "analista": analista,
+            "avisar_faltantes": avisar_faltantes}
+
+
+FUENTES_KPIS = {
+    "semanales": fuente_kpis(
+        "KPIs Semanales", secret_url="kpis_sheet_url",
+        url="https://docs.google.com/spreadsheets/d/1vaJ2lPK7hbWsuikjmycPePKRrFXiOrlwXMXOdoXRY60/edit?gid=0#gid=0"),
+    "sdr": fuente_kpis("KPI´s SDR", hoja_maestra=HOJA_MAESTRA_KPIS_SDR),
+    "karla": fuente_kpis("Kpis Karla", secret_url="karla_sheet_url", pestana="Kpis", relleno_periodo="N/D",
+                         analista="Karla Hernandez", avisar_faltantes=False),
+}
+
+
+# --- Limpieza ---
+
+def avisos_kpis(encabezados, config):
+    """
+    Los avisos para la página de una hoja de KPIs con esos `encabezados`:
+    columnas KPI que faltan (si `config` avisa de ellas) y falta de Fecha.
+    Se devuelven como texto porque la carga puede hacerse en segundo plano,
+    sin página en la que mostrarlos (ver obtener_kpis).
+    """
+    if not encabezados:
+        return []
+    faltantes = columnas_faltantes(pd.DataFrame(columns=encabezados_unicos(encabezados)), config["esquema"])
+    avisos = []
+    if config["avisar_faltantes"]:
+        avisos += [f"Columna KPI '{nombre}' no encontrada ({config['titulo']}). Se creará con ceros."
+                   for nombre in faltantes if nombre in COLUMNAS_KPI]
+    if "Fecha" in faltantes:
+        avisos.append(f"Columna 'Fecha' no encontrada ({config['titulo']}). No se podrán aplicar filtros de fecha.")
+    return avisos
+
+
+def preparar_filas_kpis(df, config):
+    """
+    Limpia filas crudas de una hoja de KPIs según su `config` (fuente_kpis)
+    y añade Año, NumSemana, MesNum y AñoMes. Solo usa operaciones fila a
+    fila: la sincronización la aplica únicamente a las filas nuevas o
+    modificadas. Las columnas que falten se avisan aparte (avisos_kpis).
+    """
+    df.columns = encabezados_unicos(df.columns)
+    df = aplicar_esquema(df, config["esquema"])
+
+    if "Fecha" in df.columns and not df.empty:
+        df['Año'] = df['Fecha'].dt.year
+        df['NumSemana'] = df['Fecha'].dt.isocalendar().week.astype(int)
+        df['MesNum'] = df['Fecha'].dt.month
+        df['AñoMes'] = df['Fecha'].dt.strftime('%Y-%m')
+    else:
+        for col_time in ['Año', 'NumSemana', 'MesNum']: df[col_time] = pd.Series(dtype='int')
+        df['AñoMes'] = pd.Series(dtype='str')
+
+    if config["analista"]:
+        df["Analista"] = config["analista"]
+    return df
+
+
+# --- Acumulados ---
+
+def resumir_kpis(kpis, especificacion, grupos):
+    """
+    Las sumas de COLUMNAS_KPI de las filas de kpis["datos"] que cumplen
+    `especificacion`, por `grupos`: lo mismo que
+    aplicar_especificacion(...).groupby(grupos, as_index=False)[...].sum(),
+    leído de los acumulados de la carga cuando los filtros lo permiten
+    (datos/acumulados.resumir_acumulados).
+    """
+    resumen = resumir_acumulados(kpis["acumulados"], kpis["datos"], especificacion, grupos, COLUMNAS_KPI)
+    return resumen[list(grupos) + list(COLUMNAS_KPI)]
+
+
+# --- Carga ---
+
+def _kpis_con_acumulados(nombre, clave, df):
+    return {"datos": df, "acumulados": obtener_acumulados(f"kpis_{nombre}", df, GRANOS_KPIS, COLUMNAS_KPI),
+            "avisos": avisos_kpis(encabezados_sincronizados(clave), FUENTES_KPIS[nombre])}
+
+
+def _leer_hoja_kpis(nombre):
+    config = FUENTES_KPIS[nombre]
+    url = st.secrets.get(config["secret_url"], config["url"]) if config["secret_url"] else config["url"]
+    if not url:
+        raise KeyError(config["secret_url"])
+    libro = obtener_cliente_gspread().open_by_url(url)
+    hoja = libro.sheet1 if config["pestana"] is None else libro.worksheet(config["pestana"])
+    clave = f"kpis_{nombre}::{url}"
+    df, n_filas = sincronizar_hoja(clave, hoja, lambda filas: preparar_filas_kpis(filas, config))
+    return _kpis_con_acumulados(nombre, clave, df.reset_index(drop=True) if n_filas else pd.DataFrame())
+
+
+# Compartido por todas las sesiones: la hoja se lee y se acumula una vez por TTL.
+@st.cache_resource(ttl=TTL_KPIS_SEGUNDOS, show_spinner=False)
+def _kpis_hoja(nombre):
+    return _leer_hoja_kpis(nombre)
+
+
+def _kpis_maestros(nombre):
+    config = FUENTES_KPIS[nombre]
+
+    def construir(hojas):
+        # None si la pestaña no existe en el libro.
+        valores_hoja = valores_hoja_maestra(hojas, config["hoja_maestra"])
+        if valores_hoja is None:
+            return None
+        clave = f"kpis_{nombre}::maestro"
+        df, n_filas = sincronizar_hoja(clave, None, lambda filas: preparar_filas_kpis(filas, config),
+                                       valores=valores_hoja)
+        return _kpis_con_acumulados(nombre, clave, df.reset_index(drop=True) if n_filas else pd.DataFrame())
+
+    # Derivado del dataset maestro una vez por versión (datos/carga_datos.obtener_vista).
+    kpis, _ = obtener_vista(f"kpis_{nombre}", construir)
+    return kpis
+
+
+def cargar_kpis(nombre):
+    """
+    Los KPIs de la fuente `nombre` de FUENTES_KPIS: {"datos": DataFrame
+    limpio, "acumulados": sus acumulados por GRANOS_KPIS, "avisos": los de
+    avisos_kpis para la página}, cargados y acumulados
+    una sola vez para todas las sesiones. None si la pestaña del dataset
+    maestro no existe. Lanza la excepción de la lectura si falla.
+    """
+    config = FUENTES_KPIS[nombre]
+    kpis = _kpis_maestros(nombre) if config["hoja_maestra"] else _kpis_hoja(nombre)
+    if kpis is None:
+        return None
+    return {"datos": vista_compartida(kpis["datos"]),
+            "acumulados": {grano: vista_compartida(df) for grano, df in kpis["acumulados"].items()},
+            "avisos": list(kpis["avisos"])}
+
+
+@st.cache_resource
+def _estado_precarga():
+    return {"precargando": False, "precargado_en": None, "lock": threading.Lock()}
+
+
+def _precargar(nombres, estado):
+    try:
+        # Sin contexto de script no se muestra nada: los errores se repiten al
+        # cargar la fuente en su página (no se guardan en caché) y los avisos
+        # van con los datos (cargar_kpis).
+        cargar_fuentes([fuente(n, lambda n=n: cargar_kpis(n)) for n in nombres])
+    finally:
+        with estado["lock"]:
+            estado["precargando"] = False
+            estado["precargado_en"] = time.monotonic()
+
+
+def precargar_kpis(nombres):
+    """
+    Carga en segundo plano, en paralelo, las fuentes `nombres` de
+    FUENTES_KPIS, para que las otras páginas de KPIs abran con los datos ya
+    en caché. Como mucho una precarga a la vez y una por TTL.
+
+    Las fuentes del dataset maestro solo se precargan si ya está en memoria:
+    si no, cargarlo pasaría por cargar_datos_crudos, cuyos st.error/st.stop
+    no hacen nada fuera de una página. Las carga su propia página.
+    """
+    if not datos_maestros_en_memoria():
+        nombres = [n for n in nombres if not FUENTES_KPIS[n]["hoja_maestra"]]
+    if not nombres:
+        return
+    estado = _estado_precarga()
+    with estado["lock"]:
+        if estado["precargando"] or (estado["precargado_en"] is not None and
+                                     time.monotonic() - estado["precargado_en"] < TTL_KPIS_SEGUNDOS):
+            return
+        estado["precargando"] = True
+    threading.Thread(target=_precargar, args=(list(nombres), estado),
+                     name="precarga_kpis", daemon=True).start()
+
+
+def obtener_kpis(nombre):
+    """
+    cargar_kpis para la página de la fuente `nombre`: muestra sus avisos,
+    muestra el error y detiene la página si la hoja no se pudo leer, y
+    precarga el resto de fuentes de KPIs en segundo plano.
+    """
+    titulo = FUENTES_KPIS[nombre]["titulo"]
+    precargar_kpis([n for n in FUENTES_KPIS if n != nombre])
+    try:
+        kpis = cargar_kpis(nombre)
+    except KeyError as e:
+        st.error(f"Error de Configuración (Secrets): falta {e} en los 'Secrets' de Streamlit ({titulo}).")
+        st.stop()
+    except gspread.exceptions.SpreadsheetNotFound:
+        st.error(f"Error: No se encontró la hoja de {titulo}.")
+        st.stop()
+    except Exception as e:
+        st.error(f"Error al leer la hoja de {titulo}: {e}")
+        st.stop()
+
+    if kpis is None:
+        st.error(f"Error: No se encontró la hoja de cálculo '{titulo}' en el Google Sheet.")
+        st.stop()
+    for aviso in kpis["avisos"]:
+        st.warning(aviso)
+    if kpis["datos"].empty:
+        st.error(f"No se pudieron obtener datos suficientes de la hoja '{titulo}'.")
+    return kpis
@@ -0,0 +1,193 @@
+# Prospe/datos/sincronizacion.py
+import threading
+import pandas as pd
+import streamlit as st
+from datos.compartido import vista_compartida
+
+# Filas finales que se vuelven a leer en cada sincronización para detectar
+# ediciones recientes además de las filas nuevas.
+VENTANA_COLA = 200
+# Cada cuántas sincronizaciones se hace una lectura completa, para recoger
+# ediciones en filas antiguas que quedan fuera de la ventana.
+RESINCRONIZAR_CADA = 12
+
+# La fila 1 de la hoja son los encabezados; la primera fila de datos es la 2.
+PRIMERA_FILA_DATOS = 2
+
+
+@st.cache_resource
+def _estados_sincronizacion():
+    # Un estado por hoja, compartido por todas las sesiones del proceso.
+    return {"estados": {}, "lock": threading.Lock()}
+
+
+def _obtener_estado(clave):
+    registro = _estados_sincronizacion()
+    with registro["lock"]:
+        if clave not in registro["estados"]:
+            registro["estados"][clave] = {
+                "encabezados": None, "hashes": [], "df_limpio": None,
+                "sincronizaciones": 0, "lock": threading.Lock(),
+            }
+        return registro["estados"][clave]
+
+
+def _rellenar_filas(filas, ancho):
+    # La API omite las celdas vacías al final de cada fila; get_all_values las rellena.
+    return [list(f) + [""] * (ancho - len(f)) for f in filas]
+
+
+def _hash_fila(fila):
+    return hash(tuple(fila))
+
+
+def _limpiar_bloque(filas, numeros_fila, encabezados, limpiar):
+    # El índice es el número de fila en la hoja: así se pueden reemplazar
+    # filas limpias concretas aunque la limpieza descarte algunas.
+    df_crudo = pd.DataFrame(filas, columns=encabezados, index=numeros_fila)
+    return limpiar(df_crudo)
+
+
+def _sincronizacion_completa(estado, hoja, limpiar, valores=None):
+    raw_data = valores if valores is not None else hoja.get_all_values()
+    encabezados = raw_data[0] if raw_data else []
+    filas = raw_data[1:] if raw_data else []
+    numeros_fila = list(range(PRIMERA_FILA_DATOS, PRIMERA_FILA_DATOS + len(filas)))
+    estado["encabezados"] = encabezados
+    estado["hashes"] = [_hash_fila(f) for f in filas]
+    estado["df_limpio"] = _limpiar_bloque(filas, numeros_fila, encabezados, limpiar) if filas else None
+
+
+def _sincronizacion_incremental(estado, hoja, limpiar, ventana_cola):
+    """
+    Lee los encabezados y la cola de la hoja en una sola llamada batch_get.
+    Devuelve False si detecta un cambio estructural (encabezados distintos,
+    filas borradas o desplazadas) y hace falta una lectura completa.
+    """
+    encabezados = estado["encabezados"]
+    ancho = len(encabezados)
+    hashes = estado["hashes"]
+    n_previas = len(hashes)
+    inicio = max(0, n_previas - ventana_cola)
+    fila_inicio = PRIMERA_FILA_DATOS + inicio
+
+    rango_encabezados, rango_cola = hoja.batch_get(["1:1", f"{fila_inicio}:{max(hoja.row_count, fila_inicio)}"])
+    encabezados_hoja = rango_encabezados[0] if rango_encabezados else []
+    if _rellenar_filas([encabezados_hoja], ancho)[0] != encabezados:
+        return False
+    if any(len(f) > ancho for f in rango_cola):
+        return False
+
+    filas_cola = _rellenar_filas(rango_cola, ancho)
+    n_actuales = inicio + len(filas_cola)
+    if n_actuales < n_previas:
+        return False
+    # Si la primera fila de la ventana ya no coincide, lo más probable es que
+    # se hayan insertado o borrado filas por encima: se relee todo.
+    if filas_cola and inicio < n_previas and _hash_fila(filas_cola[0]) != hashes[inicio]:
+        return False
+
+    _aplicar_cambios(estado, filas_cola, inicio, limpiar)
+    return True
+
+
+def _sincronizacion_con_valores(estado, valores, limpiar):
+    """
+    Variante para cuando la hoja completa ya llegó en una lectura por lotes
+    del libro (datos/libro.py): no hay llamada a la API, solo se compara cada
+    fila con su hash y se limpian las distintas. Devuelve False si cambiaron
+    los encabezados.
+    """
+    if not valores or valores[0] != estado["encabezados"]:
+        return False
+    _aplicar_cambios(estado, valores[1:], 0, limpiar)
+    return True
+
+
+def _aplicar_cambios(estado, filas, inicio, limpiar):
+    # `filas` son las filas de datos de la hoja a partir del índice `inicio`, hasta el final.
+    encabezados = estado["encabezados"]
+    hashes = estado["hashes"]
+    n_previas = len(hashes)
+    n_actuales = inicio + len(filas)
+
+    cambiadas = []
+    for desplazamiento, fila in enumerate(filas):
+        i = inicio + desplazamiento
+        h = _hash_fila(fila)
+        if i >= n_previas or h != hashes[i]:
+            cambiadas.append(i)
+            if i >= n_previas:
+                hashes.append(h)
+            else:
+                hashes[i] = h
+    eliminadas = [PRIMERA_FILA_DATOS + i for i in range(n_actuales, n_previas)]
+    del hashes[n_actuales:]
+    if not cambiadas and not eliminadas:
+        return
+    if n_actuales == 0:
+        # Igual que una lectura completa de una hoja sin filas de datos.
+        estado["df_limpio"] = None
+        return
+
+    numeros_fila = [PRIMERA_FILA_DATOS + i for i in cambiadas]
+    df_delta = None
+    if cambiadas:
+        filas_delta = [filas[i - inicio] for i in cambiadas]
+        df_delta = _limpiar_bloque(filas_delta, numeros_fila, encabezados, limpiar)
+
+    df_previo = estado["df_limpio"]
+    if df_previo is None:
+        estado["df_limpio"] = df_delta
+        return
+    df_conservado = df_previo[~df_previo.index.isin(numeros_fila + eliminadas)]
+    partes = [p for p in (df_conservado, df_delta) if p is not None and not p.empty]
+    if not partes:
+        estado["df_limpio"] = df_conservado
+    elif len(partes) == 1:
+        estado["df_limpio"] = partes[0]
+    else:
+        estado["df_limpio"] = pd.concat(partes, sort=False).sort_index(kind="stable")
+
+
+def sincronizar_hoja(clave, hoja, limpiar, ventana_cola=VENTANA_COLA,
+                     resincronizar_cada=RESINCRONIZAR_CADA, valores=None):
+    """
+    Sincroniza una hoja de Google Sheets contra la copia limpia guardada en
+    memoria, trayendo solo las filas nuevas o modificadas de la cola.
+
+    `limpiar` recibe un DataFrame crudo (columnas = encabezados de la hoja,
+    índice = número de fila) y devuelve las filas limpias conservando ese
+    índice. Debe trabajar fila por fila, porque solo se aplica al delta.
+
+    Si se pasan `valores` (la hoja completa ya leída, como get_all_values)
+    no se llama a la API: se comparan todas las filas y `hoja` puede ser None.
+
+    Devuelve (df_limpio, n_filas_datos). df_limpio es None si la hoja no
+    tiene filas de datos. El DataFrame devuelto es una vista_compartida: se
+    puede modificar sin alterar la copia limpia guardada.
+    """
+    estado = _obtener_estado(clave)
+    with estado["lock"]:
+        estado["sincronizaciones"] += 1
+        requiere_completa = estado["encabezados"] is None or not estado["hashes"]
+        try:
+            if valores is not None:
+                # Con la hoja completa la comparación ya cubre todas las filas: no hace falta resincronizar periódicamente.
+                if requiere_completa or not _sincronizacion_con_valores(estado, valores, limpiar):
+                    _sincronizacion_completa(estado, hoja, limpiar, valores)
+            elif (requiere_completa or estado["sincronizaciones"] % resincronizar_cada == 0
+                  or not _sincronizacion_incremental(estado, hoja, limpiar, ventana_cola)):
+                _sincronizacion_completa(estado, hoja, limpiar)
+        except BaseException:
+            # Un fallo a medias deja hashes y filas limpias desalineados.
+            estado["encabezados"], estado["hashes"], estado["df_limpio"] = None, [], None
+            raise
+        return vista_compartida(estado["df_limpio"]), len(estado["hashes"])
+
+
+def encabezados_sincronizados(clave):
+    """Los encabezados de la última sincronización de `clave` ([] si aún no hay ninguna)."""
+    estado = _obtener_estado(clave)
+    with estado["lock"]:
+        return list(estado["encabezados"] or [])
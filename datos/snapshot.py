@@ -0,0 +1,40 @@
+# Prospe/datos/snapshot.py
+import os
+import threading
+import pandas as pd
+
+# Los snapshots viven junto al proyecto, fuera del control de versiones (.gitignore).
+DIRECTORIO_SNAPSHOTS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".snapshots")
+
+
+def ruta_snapshot(nombre):
+    return os.path.join(DIRECTORIO_SNAPSHOTS, f"{nombre}.parquet")
+
+
+def guardar_snapshot(df, nombre):
+    """
+    Escribe el DataFrame en Parquet de forma atómica: primero a un archivo
+    temporal y luego os.replace, para que un lector nunca vea un archivo a medias.
+    """
+    os.makedirs(DIRECTORIO_SNAPSHOTS, exist_ok=True)
+    ruta = ruta_snapshot(nombre)
+    ruta_tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_parquet(ruta_tmp, engine="pyarrow")
+        os.replace(ruta_tmp, ruta)
+    finally:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+    return ruta
+
+
+def leer_snapshot(nombre):
+    """Devuelve el DataFrame guardado o None si no existe o no se puede leer."""
+    ruta = ruta_snapshot(nombre)
+    if not os.path.isfile(ruta):
+        return None
+    try:
+        return pd.read_parquet(ruta, engine="pyarrow")
+    except Exception:
+        return None
@@ -1,51 +1,58 @@
-import pandas as pd
+from filtros.especificacion import aplicar_especificacion, bitmap_consulta, compilar, fechas, valores
+from filtros.indice_filtros import (DIMENSIONES_INDICE, DIMENSIONES_SI_NO_INDICE, COLUMNA_FECHA_INDICE,
+                                   construir_indice_filtros, contar_valores, mascara_filas)
 
-def aplicar_filtros(
-    df,
+def especificacion_dashboard(
     filtro_fuente_lista, filtro_proceso, filtro_pais, filtro_industria, filtro_avatar,
     filtro_prospectador, filtro_invite_aceptada_simple, filtro_sesion_agendada,
     fecha_ini, fecha_fin
 ):
-    df_filtrado = df.copy()
-
-    if "¿Quién Prospecto?" in df_filtrado.columns:
-        df_filtrado["¿Quién Prospecto?"] = df_filtrado["¿Quién Prospecto?"].replace("", pd.NA)
-
-    if filtro_fuente_lista and "– Todos –" not in filtro_fuente_lista:
-        df_filtrado = df_filtrado[df_filtrado["Fuente de la Lista"].isin(filtro_fuente_lista)]
-
-    if filtro_proceso and "– Todos –" not in filtro_proceso:
-        df_filtrado = df_filtrado[df_filtrado["Proceso"].isin(filtro_proceso)]
-
-    if filtro_pais and "– Todos –" not in filtro_pais:
-        df_filtrado = df_filtrado[df_filtrado["Pais"].isin(filtro_pais)]
-
-    if filtro_industria and "– Todos –" not in filtro_industria:
-        df_filtrado = df_filtrado[df_filtrado["Industria"].isin(filtro_industria)]
-
-    if filtro_avatar and "– Todos –" not in filtro_avatar:
-        df_filtrado = df_filtrado[df_filtrado["Avatar"].isin(filtro_avatar)]
-
-    if filtro_invite_aceptada_simple != "– Todos –":
-        df_filtrado = df_filtrado[
-            df_filtrado["¿Invite Aceptada?"]
-            .apply(lambda x: str(x).strip().lower() == filtro_invite_aceptada_simple.strip().lower())
-        ]
-
-    if fecha_ini and fecha_fin:
-        df_filtrado = df_filtrado[
-            (df_filtrado["Fecha de Invite"].dt.date >= fecha_ini) &
-            (df_filtrado["Fecha de Invite"].dt.date <= fecha_fin)
-        ]
-
-    if filtro_sesion_agendada != "– Todos –":
-        df_filtrado = df_filtrado[
-            df_filtrado["Sesion Agendada?"]
-            .apply(lambda x: str(x).strip().lower() == filtro_sesion_agendada.strip().lower())
-        ]
-
-    if filtro_prospectador and "– Todos –" not in filtro_prospectador:
-        df_filtrado = df_filtrado[df_filtrado["¿Quién Prospecto?"].isin(filtro_prospectador)]
-
-    return df_filtrado
+    # Los filtros de mostrar_filtros_sidebar como especificación (filtros.especificacion).
+    # El rango de fechas solo se aplica con los dos extremos elegidos.
+    selecciones = (filtro_fuente_lista, filtro_proceso, filtro_pais, filtro_industria, filtro_avatar,
+                   filtro_prospectador)
+    return [
+        *(valores(columna, seleccion) for columna, seleccion in zip(DIMENSIONES_INDICE, selecciones)),
+        *(valores(columna, seleccion, normalizar=True) for columna, seleccion in zip(
+            DIMENSIONES_SI_NO_INDICE, (filtro_invite_aceptada_simple, filtro_sesion_agendada))),
+        fechas(COLUMNA_FECHA_INDICE, fecha_ini, fecha_fin) if fecha_ini and fecha_fin else None,
+    ]
+
+def bitmap_filtros(indice, *filtros):
+    # Cada filtro es un OR de bitmaps dentro de su columna y los filtros se
+    # combinan con AND. Devuelve None si no hay ningún filtro activo; los de
+    # columnas que el DataFrame no tiene no filtran.
+    bitmap, _ = bitmap_consulta(indice, compilar(especificacion_dashboard(*filtros)))
+    return bitmap
+
+def conteos_facetas(indice, *filtros):
+    # Por columna de la barra lateral, filas por valor bajo los demás filtros
+    # activos (sin el de la propia columna): lo que dejaría elegir ese valor.
+    conteos = {}
+    for posicion, columna in enumerate(DIMENSIONES_INDICE + DIMENSIONES_SI_NO_INDICE):
+        otros = list(filtros)
+        otros[posicion] = None
+        conteos[columna] = contar_valores(indice, columna, bitmap_filtros(indice, *otros))
+    return conteos
+
+def filas_con_bitmap(df, indice, bitmap):
+    # El DataFrame se corta una sola vez. Sin filtros no hay copia de datos:
+    # con Copy-on-Write los cambios no llegan a `df`.
+    if bitmap is None:
+        return df.copy(deep=False)
+    return df[mascara_filas(indice, bitmap)]
 
+def aplicar_filtros(
+    df,
+    filtro_fuente_lista, filtro_proceso, filtro_pais, filtro_industria, filtro_avatar,
+    filtro_prospectador, filtro_invite_aceptada_simple, filtro_sesion_agendada,
+    fecha_ini, fecha_fin, indice=None
+):
+    # `indice` es el de construir_indice_filtros(df), normalmente el de
+    # obtener_indice_filtros; sin él se construye para esta llamada.
+    if indice is None or indice["filas"] != len(df):
+        indice = construir_indice_filtros(df)
+    return aplicar_especificacion(df, especificacion_dashboard(
+        filtro_fuente_lista, filtro_proceso, filtro_pais, filtro_industria, filtro_avatar,
+        filtro_prospectador, filtro_invite_aceptada_simple, filtro_sesion_agendada,
+        fecha_ini, fecha_fin), indice)
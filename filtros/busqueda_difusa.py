@@ -0,0 +1,166 @@
+# Prospe/filtros/busqueda_difusa.py
+import threading
+from array import array
+import numpy as np
+import pandas as pd
+import streamlit as st
+from filtros.indice_busqueda import PATRON_TERMINO, normalizar_texto
+
+# Con qué se compara una búsqueda aproximada: la empresa y la persona (nombre y apellido juntos).
+CAMPOS_DIFUSOS = {"empresa": ("Empresa",), "persona": ("Nombre", "Apellido")}
+# Palabras de la forma jurídica o de relleno que no distinguen una empresa de otra
+# ("Grupo Bimbo SA de CV" se compara como "grupo bimbo").
+PALABRAS_IGNORADAS = frozenset({
+    "s", "a", "c", "v", "sa", "de", "cv", "sab", "sapi", "rl", "srl", "sas", "sl",
+    "ltda", "inc", "llc", "ltd", "corp", "co", "gmbh", "plc",
+})
+# Puntuación mínima (entre 0 y 1) para que un texto cuente como parecido.
+SIMILITUD_MINIMA = 0.3
+# Cuántos prospectos devuelve como máximo una búsqueda aproximada.
+TOP_K_DIFUSO = 50
+# El catálogo guarda los textos de versiones anteriores; cuando los que ya no
+# aparecen superan a los vigentes (y a este mínimo) se empieza uno nuevo.
+MIN_TEXTOS_COMPACTAR = 5000
+
+
+def _catalogo_vacio():
+    # Textos distintos -> id, trigramas por texto y, por trigrama, los ids de los textos que lo contienen.
+    return {"ids": {}, "tamanos": array("i"), "postings": {}}
+
+
+@st.cache_resource
+def _estado_difuso():
+    # Un catálogo por proceso, compartido entre sesiones y versiones del dataset.
+    return {"catalogo": _catalogo_vacio(), "lock": threading.Lock()}
+
+
+def _trigramas(texto):
+    # Trigramas de cada palabra con dos espacios delante y uno detrás, como pg_trgm.
+    trigramas = set()
+    for palabra in PATRON_TERMINO.findall(texto):
+        if palabra in PALABRAS_IGNORADAS:
+            continue
+        relleno = f"  {palabra} "
+        trigramas.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return trigramas
+
+
+def _id_texto(catalogo, texto):
+    id_texto = catalogo["ids"].get(texto)
+    if id_texto is None:
+        id_texto = len(catalogo["tamanos"])
+        catalogo["ids"][texto] = id_texto
+        trigramas = _trigramas(texto)
+        catalogo["tamanos"].append(len(trigramas))
+        for trigrama in trigramas:
+            catalogo["postings"].setdefault(trigrama, array("i")).append(id_texto)
+    return id_texto
+
+
+def _textos_campo(df, columnas):
+    presentes = [c for c in columnas if c in df.columns]
+    if not presentes:
+        return None
+    textos = normalizar_texto(df[presentes[0]])
+    for columna in presentes[1:]:
+        textos = textos + " " + normalizar_texto(df[columna])
+    return textos
+
+
+def construir_indice_difuso(df):
+    """
+    Índice de trigramas de `df` para buscar_similares. Los trigramas viven en
+    un catálogo de textos distintos compartido entre versiones del dataset:
+    al refrescar los datos solo se trigramizan los textos nuevos, y lo propio
+    de esta versión es, por campo, qué filas tiene cada texto.
+    """
+    factorizados = {}
+    for campo, columnas in CAMPOS_DIFUSOS.items():
+        textos = _textos_campo(df, columnas)
+        if textos is not None:
+            factorizados[campo] = pd.factorize(textos)
+
+    estado = _estado_difuso()
+    with estado["lock"]:
+        vigentes = sum(len(unicos) for _, unicos in factorizados.values())
+        if len(estado["catalogo"]["tamanos"]) > max(2 * vigentes, MIN_TEXTOS_COMPACTAR):
+            # Los índices de versiones anteriores conservan su catálogo.
+            estado["catalogo"] = _catalogo_vacio()
+        catalogo = estado["catalogo"]
+        campos = {}
+        for campo, (codigos, unicos) in factorizados.items():
+            ids = np.array([_id_texto(catalogo, texto) for texto in unicos], dtype=np.int64)[codigos]
+            orden = np.argsort(ids, kind="stable")
+            limites = np.searchsorted(ids[orden], np.arange(len(catalogo["tamanos"]) + 1))
+            campos[campo] = {"orden": orden, "limites": limites}
+    return {"filas": len(df), "etiquetas": df.index, "catalogo": catalogo, "campos": campos}
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _indice_por_version(vista, version, _df):
+    return construir_indice_difuso(_df)
+
+
+def obtener_indice_difuso(df, vista, version):
+    """El índice de trigramas de `df`, la vista `vista` del dataset maestro en su `version`, compartido entre sesiones."""
+    return _indice_por_version(vista, version, df)
+
+
+def _candidatos(catalogo, consulta):
+    # (ids de texto, puntuación) de los textos que comparten algún trigrama con la consulta.
+    with _estado_difuso()["lock"]:
+        listas = [np.array(catalogo["postings"][t], dtype=np.int64) for t in consulta if t in catalogo["postings"]]
+        if not listas:
+            return np.array([], dtype=np.int64), np.array([], dtype=float)
+        ids, compartidos = np.unique(np.concatenate(listas), return_counts=True)
+        tamanos = np.frombuffer(catalogo["tamanos"], dtype=np.int32)[ids]
+    # Media entre cuánto de la consulta aparece en el texto y el parecido de ambos
+    # (Jaccard): "bimbo" puntúa alto contra "grupo bimbo", y más aún contra "bimbo".
+    cobertura = compartidos / len(consulta)
+    jaccard = compartidos / (len(consulta) + tamanos - compartidos)
+    return ids, (cobertura + jaccard) / 2
+
+
+def _consulta(texto):
+    return _trigramas(normalizar_texto(pd.Series([texto])).iloc[0])
+
+
+def admite_busqueda_difusa(texto):
+    """False si `texto` solo tiene PALABRAS_IGNORADAS (p. ej. "sa de cv"): no hay nada con qué comparar."""
+    return bool(_consulta(texto))
+
+
+def buscar_similares(df, indice, texto, k=TOP_K_DIFUSO, minimo=SIMILITUD_MINIMA):
+    """
+    Hasta `k` filas de `df` cuya empresa o persona se parece a `texto`,
+    ordenadas de más a menos parecida. Tolera errores de escritura, acentos
+    y formas jurídicas. Solo se puntúan los textos que comparten trigramas
+    con la búsqueda. `df` puede ser cualquier subconjunto (mismas etiquetas
+    de índice) del DataFrame indexado. Sin nada que comparar (ver
+    admite_busqueda_difusa) no devuelve ninguna fila.
+    """
+    consulta = _consulta(texto)
+    if not consulta:
+        return df.iloc[0:0]
+    ids, puntos = _candidatos(indice["catalogo"], consulta)
+
+    filas, puntos_filas = [], []
+    for campo in indice["campos"].values():
+        limites = campo["limites"]
+        # Los textos que añadieron versiones posteriores no tienen filas en esta.
+        validos = (puntos >= minimo) & (ids < len(limites) - 1)
+        desde, hasta = limites[ids[validos]], limites[ids[validos] + 1]
+        cuantas = hasta - desde
+        posiciones = np.repeat(desde - np.cumsum(cuantas) + cuantas, cuantas) + np.arange(cuantas.sum())
+        filas.append(campo["orden"][posiciones])
+        puntos_filas.append(np.repeat(puntos[validos], cuantas))
+    if not filas:
+        return df.iloc[0:0]
+    puntuacion = pd.Series(np.concatenate(puntos_filas), index=np.concatenate(filas)).groupby(level=0).max()
+
+    etiquetas = indice["etiquetas"]
+    en_df = np.zeros(indice["filas"], dtype=bool)
+    en_df[np.arange(indice["filas"]) if df.index.equals(etiquetas) else etiquetas.get_indexer(df.index)] = True
+    puntuacion = puntuacion[en_df[puntuacion.index.to_numpy()]]
+    mejores = puntuacion.sort_values(ascending=False, kind="stable").index[:k]
+    return df.loc[etiquetas[mejores]]
@@ -0,0 +1,75 @@
+# Prospe/filtros/cache_filtros.py
+import threading
+from collections import OrderedDict
+import streamlit as st
+from filtros.aplicar_filtros import bitmap_filtros, especificacion_dashboard, filas_con_bitmap
+from filtros.especificacion import compilar
+
+# Combinaciones de filtros que se recuerdan, entre todas las sesiones. Cada
+# entrada guarda solo el bitmap de filas (una fila = un bit) y los agregados.
+MAX_ENTRADAS_CACHE_FILTROS = 64
+
+
+@st.cache_resource
+def _cache_filtros():
+    # LRU compartido por todas las sesiones del proceso.
+    return {"entradas": OrderedDict(), "aciertos": 0, "fallos": 0, "lock": threading.Lock()}
+
+
+def clave_filtros(filtro_fuente_lista, filtro_proceso, filtro_pais, filtro_industria, filtro_avatar,
+                  filtro_prospectador, filtro_invite_aceptada_simple, filtro_sesion_agendada,
+                  fecha_ini, fecha_fin):
+    """
+    Forma canónica de los filtros de mostrar_filtros_sidebar: dos selecciones
+    que filtran lo mismo (mismo conjunto en otro orden, "– Todos –" o vacío,
+    fechas incompletas) dan la misma clave. Es su especificación compilada.
+    """
+    return compilar(especificacion_dashboard(
+        filtro_fuente_lista, filtro_proceso, filtro_pais, filtro_industria, filtro_avatar,
+        filtro_prospectador, filtro_invite_aceptada_simple, filtro_sesion_agendada,
+        fecha_ini, fecha_fin))
+
+
+def filtrar_con_cache(df, indice, vista, version, filtros, agregar):
+    """
+    aplicar_filtros con memoria: devuelve (df_filtrado, agregados).
+
+    `filtros` son los diez valores de filtro de mostrar_filtros_sidebar, en el
+    orden de aplicar_filtros; `indice` el de obtener_indice_filtros(df, vista,
+    version). `agregar(df_filtrado)` calcula los agregados que se guardan con
+    el resultado (p. ej. utils.limpieza.contar_embudo). Volver a una
+    combinación ya vista solo reconstruye el DataFrame a partir del bitmap.
+    """
+    cache = _cache_filtros()
+    clave = (vista, version, clave_filtros(*filtros))
+    with cache["lock"]:
+        entrada = cache["entradas"].get(clave)
+        if entrada is not None:
+            cache["entradas"].move_to_end(clave)
+            cache["aciertos"] += 1
+        else:
+            cache["fallos"] += 1
+    if entrada is not None:
+        bitmap, agregados = entrada
+        return filas_con_bitmap(df, indice, bitmap), dict(agregados)
+
+    bitmap = bitmap_filtros(indice, *filtros)
+    df_filtrado = filas_con_bitmap(df, indice, bitmap)
+    agregados = agregar(df_filtrado)
+    with cache["lock"]:
+        entradas = cache["entradas"]
+        # Las combinaciones de versiones anteriores de la vista ya no se van a pedir.
+        for vieja in [c for c in entradas if c[0] == vista and c[1] != version]:
+            del entradas[vieja]
+        entradas[clave] = (bitmap, agregados)
+        while len(entradas) > MAX_ENTRADAS_CACHE_FILTROS:
+            entradas.popitem(last=False)
+    return df_filtrado, dict(agregados)
+
+
+def estadisticas_cache_filtros():
+    """Aciertos, fallos y entradas actuales de la caché de filtros."""
+    cache = _cache_filtros()
+    with cache["lock"]:
+        return {"aciertos": cache["aciertos"], "fallos": cache["fallos"],
+                "entradas": len(cache["entradas"])}
@@ -0,0 +1,136 @@
+# Prospe/filtros/especificacion.py
+import pandas as pd
+from datos.fechas import filtrar_rango_fechas
+from datos.motor_analitico import posiciones_consulta
+from filtros.indice_filtros import COLUMNA_FECHA_INDICE, bitmap_rango_fechas, bitmap_valores, mascara_filas
+
+# Opciones de los selectores que significan "sin filtro".
+MARCADORES_TODOS = ("– Todos –", "– Todas –")
+
+
+# --- Predicados ---
+# Una especificación es una lista de predicados (dicts); None o un predicado
+# sin selección no filtran, así cada página la arma directamente con lo que
+# devuelven sus widgets.
+
+def valores(columna, seleccion, normalizar=False):
+    """
+    `columna` toma uno de los valores de `seleccion` (lista o un solo valor).
+    Con `normalizar` se compara el texto sin espacios alrededor ni mayúsculas,
+    como en las columnas sí/no. Vacía o con "– Todos –"/"– Todas –" no filtra.
+    """
+    return {"tipo": "valores", "columna": columna, "seleccion": seleccion, "normalizar": normalizar}
+
+
+def fechas(columna, desde=None, hasta=None):
+    """`columna` (datetime64) entre los días `desde` y `hasta`, ambos incluidos; None deja ese lado abierto."""
+    return {"tipo": "fechas", "columna": columna, "desde": desde, "hasta": hasta}
+
+
+# --- Compilación ---
+
+def _seleccion(predicado):
+    seleccion = predicado["seleccion"]
+    if seleccion is None or isinstance(seleccion, str) or not pd.api.types.is_list_like(seleccion):
+        seleccion = [] if seleccion is None or seleccion == "" else [seleccion]
+    if not seleccion or any(m in seleccion for m in MARCADORES_TODOS):
+        return None
+    if predicado["normalizar"]:
+        seleccion = [str(v).strip().lower() for v in seleccion]
+    return tuple(sorted(set(seleccion), key=str))
+
+
+def compilar(especificacion, columnas=None):
+    """
+    Forma canónica y ejecutable de una especificación: una tupla de
+    predicados activos, sin los que no filtran (ni, si se dan `columnas`, los
+    de columnas que no existen). Dos especificaciones que filtran lo mismo
+    (mismo conjunto en otro orden, "– Todos –" o vacío) compilan igual, así
+    que el resultado sirve de clave de caché.
+    """
+    consulta = []
+    for predicado in especificacion:
+        if predicado is None or (columnas is not None and predicado["columna"] not in columnas):
+            continue
+        if predicado["tipo"] == "valores":
+            seleccion = _seleccion(predicado)
+            if seleccion is not None:
+                consulta.append(("valores", predicado["columna"], seleccion, predicado["normalizar"]))
+        elif predicado["desde"] is not None or predicado["hasta"] is not None:
+            consulta.append(("fechas", predicado["columna"], predicado["desde"], predicado["hasta"]))
+    return tuple(sorted(set(consulta), key=repr))
+
+
+# --- Ejecución ---
+
+def _indexado(indice, predicado):
+    tipo, columna = predicado[0], predicado[1]
+    if tipo == "fechas":
+        return columna == COLUMNA_FECHA_INDICE and indice["fechas"] is not None
+    return columna in indice["bitmaps"] and predicado[3] == (columna in indice["normalizadas"])
+
+
+def bitmap_consulta(indice, consulta):
+    """
+    (bitmap, restantes): el AND de los predicados de `consulta` que resuelve
+    el índice (None si ninguno) y los que quedan para filtrar sobre el DataFrame.
+    """
+    bitmap, restantes = None, []
+    for predicado in consulta:
+        if not _indexado(indice, predicado):
+            restantes.append(predicado)
+            continue
+        if predicado[0] == "fechas":
+            parcial = bitmap_rango_fechas(indice, predicado[2], predicado[3])
+        else:
+            parcial = bitmap_valores(indice, predicado[1], predicado[2])
+        bitmap = parcial if bitmap is None else bitmap & parcial
+    return bitmap, restantes
+
+
+def _selectividad(df, predicado):
+    # Fracción estimada de filas que pasan, sin recorrer la columna. Los rangos
+    # de fechas van primero: sobre una vista ordenada por fecha son un corte.
+    if predicado[0] == "fechas":
+        return 0.0
+    serie = df[predicado[1]]
+    if isinstance(serie.dtype, pd.CategoricalDtype) and not predicado[3]:
+        return len(predicado[2]) / max(len(serie.cat.categories), 1)
+    return 1.0
+
+
+def _aplicar_predicado(df, predicado):
+    tipo, columna = predicado[0], predicado[1]
+    if tipo == "fechas":
+        if not pd.api.types.is_datetime64_any_dtype(df[columna]):
+            return df
+        return filtrar_rango_fechas(df, columna, predicado[2], predicado[3])
+    serie = df[columna]
+    if predicado[3]:
+        serie = serie.astype(str).str.strip().str.lower()
+    return df[serie.isin(predicado[2])]
+
+
+def aplicar_especificacion(df, especificacion, indice=None):
+    """
+    Filas de `df` que cumplen todos los predicados de `especificacion`. Con
+    `indice` (el de obtener_indice_filtros para este mismo `df`) lo que el
+    índice cubre se resuelve con bitmaps y el DataFrame se corta una vez; el
+    resto se aplica del predicado más selectivo al menos, cada uno sobre las
+    filas que dejó el anterior, o con el motor duckdb en un solo WHERE. Sin
+    filtros activos no hay copia de datos.
+    """
+    consulta = compilar(especificacion, df.columns)
+    if indice is not None and indice["filas"] == len(df):
+        bitmap, consulta = bitmap_consulta(indice, consulta)
+        if bitmap is not None:
+            df = df[mascara_filas(indice, bitmap)]
+    df = df.copy(deep=False)
+    posiciones = posiciones_consulta(df, consulta) if consulta and not df.empty else None
+    if posiciones is not None:
+        return df.iloc[posiciones]
+    for predicado in sorted(consulta, key=lambda p: _selectividad(df, p)):
+        if df.empty:
+            break
+        df = _aplicar_predicado(df, predicado)
+    return df
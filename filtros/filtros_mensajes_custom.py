@@ -1,40 +1,22 @@
+from filtros.especificacion import aplicar_especificacion, fechas, valores
+
 def aplicar_filtros_mensajes(
     df,
     fuente_lista, proceso, pais, industria, avatar,
     prospectador, sesion_agendada, fecha_ini, fecha_fin,
-    columna_fecha="Fecha Primer Mensaje"
+    columna_fecha="Fecha Primer Mensaje", invite_aceptada=None, indice=None
 ):
-    df_filtrado = df.copy()
-
-    if fuente_lista and "– Todos –" not in fuente_lista:
-        df_filtrado = df_filtrado[df_filtrado["Fuente de la Lista"].isin(fuente_lista)]
-
-    if proceso and "– Todos –" not in proceso:
-        df_filtrado = df_filtrado[df_filtrado["Proceso"].isin(proceso)]
-
-    if pais and "– Todos –" not in pais:
-        df_filtrado = df_filtrado[df_filtrado["Pais"].isin(pais)]
-
-    if industria and "– Todos –" not in industria:
-        df_filtrado = df_filtrado[df_filtrado["Industria"].isin(industria)]
-
-    if avatar and "– Todos –" not in avatar:
-        df_filtrado = df_filtrado[df_filtrado["Avatar"].isin(avatar)]
-
-    if prospectador and "– Todos –" not in prospectador:
-        df_filtrado = df_filtrado[df_filtrado["¿Quién Prospecto?"].isin(prospectador)]
-
-    if sesion_agendada != "– Todos –":
-        df_filtrado = df_filtrado[
-            df_filtrado["Sesion Agendada?"]
-            .apply(lambda x: str(x).strip().lower() == sesion_agendada.strip().lower())
-        ]
-
-    if fecha_ini and fecha_fin and columna_fecha in df_filtrado.columns:
-        if pd.api.types.is_datetime64_any_dtype(df_filtrado[columna_fecha]):
-            df_filtrado = df_filtrado[
-                (df_filtrado[columna_fecha].dt.date >= fecha_ini) &
-                (df_filtrado[columna_fecha].dt.date <= fecha_fin)
-            ]
-
-    return df_filtrado
+    # Filtros de la página de Mensajes como especificación (filtros.especificacion).
+    # `indice` es el de obtener_indice_filtros para este mismo `df`: con él las
+    # columnas indexadas se resuelven con bitmaps.
+    return aplicar_especificacion(df, [
+        valores("¿Invite Aceptada?", invite_aceptada, normalizar=True),
+        valores("Fuente de la Lista", fuente_lista),
+        valores("Proceso", proceso),
+        valores("Pais", pais),
+        valores("Industria", industria),
+        valores("Avatar", avatar),
+        valores("¿Quién Prospecto?", prospectador),
+        valores("Sesion Agendada?", sesion_agendada, normalizar=True),
+        fechas(columna_fecha, fecha_ini, fecha_fin) if fecha_ini and fecha_fin else None,
+    ], indice)
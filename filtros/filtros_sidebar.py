@@ -1,6 +1,8 @@
 import streamlit as st
 import datetime
 import pandas as pd
+from filtros.aplicar_filtros import conteos_facetas
+from filtros.indice_filtros import construir_indice_filtros, opciones_dimension
 
 
 # Función para resetear el estado de los filtros a sus valores por defecto
@@ -15,19 +17,30 @@ def reset_filters_state():
     st.session_state["filtro_invite_aceptada_simple"] = "– Todos –"
     st.session_state["filtro_sesion_agendada"] = "– Todos –"
     st.session_state["busqueda"] = ""
+    st.session_state["busqueda_difusa"] = False
     st.session_state["fecha_ini"] = None
     st.session_state["fecha_fin"] = None
     st.toast("Filtros reiniciados ✅")
 
 
+# Muestra cada opción con sus filas bajo los demás filtros: "México (1,234)".
+def formato_con_conteo(conteos):
+    if not conteos:
+        return str
+    return lambda valor: f"{valor} ({conteos[valor]:,})" if valor in conteos else str(valor)
+
+
 # Función genérica para crear selectores múltiples (Multiselect) - Usa st.multiselect
-def crear_multiselect(df, columna, etiqueta, key):
-    """Creates a multiselect widget for a given column, managing state with key."""
+def crear_multiselect(df, columna, etiqueta, key, opciones=None, conteos=None):
+    """Creates a multiselect widget for a given column, managing state with key.
+    `opciones` (ya ordenadas) evita recalcularlas desde `df`; `conteos` se muestra junto a cada opción."""
     if key not in st.session_state:
         st.session_state[key] = ["– Todos –"]
 
     options = ["– Todos –"]
-    if columna in df.columns and not df[columna].empty:
+    if opciones is not None:
+        options = ["– Todos –"] + list(opciones)
+    elif columna in df.columns and not df[columna].empty:
         valores_data = sorted(df[columna].dropna().astype(str).unique())
         options = ["– Todos –"] + valores_data
 
@@ -38,18 +51,21 @@ def crear_multiselect(df, columna, etiqueta, key):
         st.session_state[key] = ["– Todos –"]
 
     selected_value = st.multiselect(  # Usar st.multiselect
-        etiqueta, options, key=key)
+        etiqueta, options, key=key, format_func=formato_con_conteo(conteos))
     return st.session_state[key]
 
 
 # Función genérica para crear selectores simples (Selectbox) - Usa st.selectbox
-def crear_selectbox(df, columna, etiqueta, key):
-    """Creates a selectbox widget for a given column, normalizing options and managing state with key."""
+def crear_selectbox(df, columna, etiqueta, key, opciones=None, conteos=None):
+    """Creates a selectbox widget for a given column, normalizing options and managing state with key.
+    `opciones` (ya normalizadas y ordenadas) evita recalcularlas desde `df`; `conteos` se muestra junto a cada opción."""
     if key not in st.session_state:
         st.session_state[key] = "– Todos –"
 
     options = ["– Todos –"]
-    if columna in df.columns and not df[columna].empty:
+    if opciones is not None:
+        options = ["– Todos –"] + list(opciones)
+    elif columna in df.columns and not df[columna].empty:
         valores_unicos_normalizados = df[columna].dropna().astype(
             str).str.strip().str.title().unique()
         valores_ordenados_para_filtro = sorted(
@@ -65,14 +81,15 @@ def crear_selectbox(df, columna, etiqueta, key):
     index_valor = options.index(widget_value) if widget_value in options else 0
 
     return st.selectbox(  # Usar st.selectbox
-        etiqueta, options, index=index_valor, key=key)
+        etiqueta, options, index=index_valor, key=key, format_func=formato_con_conteo(conteos))
 
 
 # --- FUNCIÓN PRINCIPAL PARA MOSTRAR FILTROS ---
 
 
-def mostrar_filtros_sidebar(df):
-    """Displays all filter widgets in the sidebar using columns for horizontal grouping."""
+def mostrar_filtros_sidebar(df, indice=None):
+    """Displays all filter widgets in the sidebar using columns for horizontal grouping.
+    `indice` es el de obtener_indice_filtros(df, ...): de él salen las opciones y sus conteos."""
     st.sidebar.header("🎯 Filtros de Búsqueda")
 
     # Inicializar estado si no existe (esto ya estaba, lo mantenemos)
@@ -98,45 +115,69 @@ def mostrar_filtros_sidebar(df):
     if "fecha_fin" not in st.session_state:
         st.session_state["fecha_fin"] = None
 
+    if indice is None or indice["filas"] != len(df):
+        indice = construir_indice_filtros(df)
+    # Conteos de cada opción bajo los filtros elegidos en la sesión.
+    conteos = conteos_facetas(
+        indice,
+        *(st.session_state[k] for k in (
+            "filtro_fuente_lista", "filtro_proceso", "filtro_pais", "filtro_industria", "filtro_avatar",
+            "filtro_prospectador", "filtro_invite_aceptada_simple", "filtro_sesion_agendada",
+            "fecha_ini", "fecha_fin")))
+    # Las de sí/no se muestran en formato título ("Si", "No"); el índice las guarda en minúsculas.
+    conteos_si_no = {}
+    for columna in ("¿Invite Aceptada?", "Sesion Agendada?"):
+        conteos_si_no[columna] = {}
+        for valor, n in conteos[columna].items():
+            conteos_si_no[columna][valor.title()] = conteos_si_no[columna].get(valor.title(), 0) + n
+
+    def multiselect(columna, etiqueta, key):
+        return crear_multiselect(df, columna, etiqueta, key,
+                                 opciones_dimension(indice, columna), conteos.get(columna))
+
+    def selectbox(columna, etiqueta, key):
+        return crear_selectbox(df, columna, etiqueta, key,
+                               sorted(conteos_si_no[columna]), conteos_si_no[columna])
+
     st.sidebar.subheader("Filtros de Origen")
     # Agrupar filtros de origen en columnas (sin botones individuales de reset)
     # Dividimos los 6 filtros en 3 filas de 2 columnas cada una
     col1_1, col1_2 = st.sidebar.columns(2)
     with col1_1:
-        filtro_fuente_lista = crear_multiselect(df, "Fuente de la Lista",
-                                                "Fuente de la Lista",
-                                                "filtro_fuente_lista")
+        filtro_fuente_lista = multiselect("Fuente de la Lista",
+                                          "Fuente de la Lista",
+                                          "filtro_fuente_lista")
     with col1_2:
-        filtro_proceso = crear_multiselect(df, "Proceso", "Proceso",
-                                           "filtro_proceso")
+        filtro_proceso = multiselect("Proceso", "Proceso",
+                                     "filtro_proceso")
 
     col2_1, col2_2 = st.sidebar.columns(2)
     with col2_1:
-        filtro_pais = crear_multiselect(df, "Pais", "País", "filtro_pais")
+        filtro_pais = multiselect("Pais", "País", "filtro_pais")
     with col2_2:
-        filtro_industria = crear_multiselect(df, "Industria", "Industria",
-                                             "filtro_industria")
+        filtro_industria = multiselect("Industria", "Industria",
+                                       "filtro_industria")
 
     col3_1, col3_2 = st.sidebar.columns(2)
     with col3_1:
-        filtro_avatar = crear_multiselect(df, "Avatar", "Avatar",
-                                          "filtro_avatar")
+        filtro_avatar = multiselect("Avatar", "Avatar",
+                                    "filtro_avatar")
     with col3_2:
-        filtro_prospectador = crear_multiselect(df, "¿Quién Prospecto?",
-                                                "¿Quién Prospectó?",
-                                                "filtro_prospectador")
+        filtro_prospectador = multiselect("¿Quién Prospecto?",
+                                          "¿Quién Prospectó?",
+                                          "filtro_prospectador")
 
     st.sidebar.subheader("Filtros de Interacción")
     # Agrupar filtros de interacción en columnas (2 columnas)
     col_invite, col_sesion = st.sidebar.columns(2)
     with col_invite:
-        filtro_invite_aceptada_simple = crear_selectbox(
-            df, "¿Invite Aceptada?", "¿Invite Aceptada?",
+        filtro_invite_aceptada_simple = selectbox(
+            "¿Invite Aceptada?", "¿Invite Aceptada?",
             "filtro_invite_aceptada_simple")
     with col_sesion:
-        filtro_sesion_agendada = crear_selectbox(df, "Sesion Agendada?",
-                                                 "¿Sesión Agendada?",
-                                                 "filtro_sesion_agendada")
+        filtro_sesion_agendada = selectbox("Sesion Agendada?",
+                                           "¿Sesión Agendada?",
+                                           "filtro_sesion_agendada")
 
     st.sidebar.subheader("Filtro de Fechas")
     # Agrupar filtros de fecha en columnas (2 columnas)
@@ -175,6 +216,11 @@ def mostrar_filtros_sidebar(df):
         value=st.session_state.get("busqueda", ""),
         placeholder="Ingrese término y presione Enter",
         key="busqueda")
+    st.sidebar.checkbox(
+        "Búsqueda aproximada (tolera errores de escritura)",
+        value=st.session_state.get("busqueda_difusa", False),
+        key="busqueda_difusa",
+        help="Ordena por parecido con la empresa o la persona y muestra los más cercanos.")
 
     # El botón principal "Limpiar Todos los Filtros" para resetear todo se mantiene
     st.sidebar.button("🧹 Limpiar Todos los Filtros",
@@ -191,6 +237,7 @@ def mostrar_filtros_sidebar(df):
             st.session_state.get("filtro_sesion_agendada", "– Todos –"),
             st.session_state.get("fecha_ini", None),
             st.session_state.get("fecha_fin",
-                                 None), st.session_state.get("busqueda", ""))
+                                 None), st.session_state.get("busqueda", ""),
+            st.session_state.get("busqueda_difusa", False))
 
 
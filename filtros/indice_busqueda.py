@@ -0,0 +1,106 @@
+# Prospe/filtros/indice_busqueda.py
+import re
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Columnas en las que buscan el cuadro de búsqueda del dashboard y el de Mensajes.
+COLUMNAS_BUSQUEDA = ("Nombre", "Apellido", "Empresa", "Puesto")
+# Un término es una palabra: letras, dígitos y guion bajo seguidos.
+PATRON_TERMINO = re.compile(r"\w+")
+# Marcas diacríticas que deja NFKD separadas de su letra ("é" -> "e" + "´").
+_PATRON_ACENTOS = "[\u0300-\u036f]"
+# Mayor que cualquier texto que empiece por el prefijo: cierra su rango en el vocabulario ordenado.
+_FIN_PREFIJO = "\U0010ffff"
+
+
+def normalizar_texto(serie):
+    """Minúsculas y sin acentos ("José" -> "jose"), sobre toda la columna."""
+    return (serie.astype("string").fillna("")
+            .str.normalize("NFKD").str.replace(_PATRON_ACENTOS, "", regex=True)
+            .str.casefold())
+
+
+def terminos_busqueda(texto):
+    """Los términos de una búsqueda, normalizados como el índice."""
+    if not texto:
+        return []
+    return PATRON_TERMINO.findall(normalizar_texto(pd.Series([texto])).iloc[0])
+
+
+def construir_indice_busqueda(df, columnas=COLUMNAS_BUSQUEDA):
+    """
+    Índice de palabras de `df` para filtrar_busqueda: el vocabulario
+    normalizado y ordenado de `columnas` y, por palabra, las filas en las que
+    aparece. Las palabras que empiezan por un prefijo son un rango contiguo
+    del vocabulario, así que cada término se resuelve con dos searchsorted.
+    Cada texto distinto se normaliza y se parte en palabras una sola vez.
+    """
+    filas = len(df)
+    pares = []
+    for columna in columnas:
+        if columna not in df.columns:
+            continue
+        codigos, unicos = pd.factorize(df[columna])
+        palabras = normalizar_texto(pd.Series(unicos, dtype=object)).str.findall(PATRON_TERMINO).explode().dropna()
+        por_texto = pd.DataFrame({"texto": palabras.index.to_numpy(dtype=np.int64), "palabra": palabras.to_numpy(dtype=object)})
+        por_fila = pd.DataFrame({"fila": np.arange(filas), "texto": codigos})
+        pares.append(por_fila.merge(por_texto, on="texto")[["fila", "palabra"]])
+
+    if pares:
+        pares = pd.concat(pares, ignore_index=True).drop_duplicates()
+        codigos, vocabulario = pd.factorize(pares["palabra"], sort=True)
+        orden = np.lexsort((pares["fila"].to_numpy(), codigos))
+        filas_palabra = pares["fila"].to_numpy()[orden]
+        limites = np.searchsorted(codigos[orden], np.arange(len(vocabulario) + 1))
+        vocabulario = np.asarray(vocabulario, dtype=str)
+    else:
+        vocabulario = np.array([], dtype=str)
+        filas_palabra = np.array([], dtype=np.int64)
+        limites = np.zeros(1, dtype=np.int64)
+    return {"filas": filas, "etiquetas": df.index, "vocabulario": vocabulario,
+            "limites": limites, "filas_palabra": filas_palabra}
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _indice_por_version(vista, version, _df):
+    return construir_indice_busqueda(_df)
+
+
+def obtener_indice_busqueda(df, vista, version):
+    """El índice de búsqueda de `df`, la vista `vista` del dataset maestro en su `version`, compartido entre sesiones."""
+    return _indice_por_version(vista, version, df)
+
+
+def filas_busqueda(indice, texto):
+    """
+    Máscara (una posición por fila indexada) de las filas con una palabra que
+    empieza por cada término de `texto`: varios términos se combinan con AND.
+    None si `texto` no tiene términos.
+    """
+    terminos = terminos_busqueda(texto)
+    if not terminos:
+        return None
+    vocabulario, limites = indice["vocabulario"], indice["limites"]
+    mascara = np.ones(indice["filas"], dtype=bool)
+    for termino in set(terminos):
+        desde, hasta = np.searchsorted(vocabulario, [termino, termino + _FIN_PREFIJO], side="left")
+        coincide = np.zeros(indice["filas"], dtype=bool)
+        coincide[indice["filas_palabra"][limites[desde]:limites[hasta]]] = True
+        mascara &= coincide
+    return mascara
+
+
+def filtrar_busqueda(df, indice, texto):
+    """
+    Las filas de `df` que coinciden con la búsqueda `texto`. `df` puede ser
+    cualquier subconjunto (con las mismas etiquetas de índice) del DataFrame
+    indexado, p. ej. el resultado de los filtros de la barra lateral.
+    """
+    mascara = filas_busqueda(indice, texto)
+    if mascara is None:
+        return df
+    etiquetas = indice["etiquetas"]
+    if df.index.equals(etiquetas):
+        return df[mascara]
+    return df[mascara[etiquetas.get_indexer(df.index)]]
@@ -0,0 +1,114 @@
+# Prospe/filtros/indice_filtros.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Columnas de la barra lateral del dashboard con un bitmap por valor.
+DIMENSIONES_INDICE = ("Fuente de la Lista", "Proceso", "Pais", "Industria", "Avatar", "¿Quién Prospecto?")
+# Las de sí/no se indexan por su texto normalizado (strip + minúsculas), que es como las compara el filtro.
+DIMENSIONES_SI_NO_INDICE = ("¿Invite Aceptada?", "Sesion Agendada?")
+COLUMNA_FECHA_INDICE = "Fecha de Invite"
+
+
+def _bitmaps_por_valor(codigos, valores, filas):
+    # Un bitmap empaquetado (np.packbits, un bit por fila) por valor; los códigos -1 (vacíos) no entran.
+    orden = np.argsort(codigos, kind="stable")
+    limites = np.searchsorted(codigos[orden], np.arange(len(valores) + 1))
+    bitmaps = {}
+    for k, valor in enumerate(valores):
+        bits = np.zeros(filas, dtype=bool)
+        bits[orden[limites[k]:limites[k + 1]]] = True
+        clave = str(valor)
+        bitmap = np.packbits(bits)
+        bitmaps[clave] = bitmaps[clave] | bitmap if clave in bitmaps else bitmap
+    return bitmaps
+
+
+def construir_indice_filtros(df, dimensiones=DIMENSIONES_INDICE):
+    """
+    Índice invertido de `df` para aplicar_filtros: por cada columna de
+    `dimensiones` (las de la barra lateral), un bitmap de filas por valor, y
+    las fechas de invite ordenadas (con la posición de cada una) para buscar
+    rangos con searchsorted. Vale mientras `df` no cambie: se construye una
+    vez por versión del dataset (obtener_indice_filtros).
+    """
+    filas = len(df)
+    bitmaps = {}
+    normalizadas = set()
+    for columna in dimensiones:
+        if columna in df.columns:
+            codigos, valores = pd.factorize(df[columna])
+            bitmaps[columna] = _bitmaps_por_valor(codigos, valores, filas)
+    for columna in DIMENSIONES_SI_NO_INDICE:
+        if columna in df.columns:
+            claves = df[columna].astype(str).str.strip().str.lower()
+            codigos, valores = pd.factorize(claves)
+            bitmaps[columna] = _bitmaps_por_valor(codigos, valores, filas)
+            normalizadas.add(columna)
+
+    fechas = None
+    if COLUMNA_FECHA_INDICE in df.columns and pd.api.types.is_datetime64_any_dtype(df[COLUMNA_FECHA_INDICE]):
+        valores_fecha = df[COLUMNA_FECHA_INDICE].to_numpy(dtype="datetime64[ns]")
+        orden = np.argsort(valores_fecha, kind="stable")  # NaT queda al final
+        fechas = {"orden": orden, "ordenadas": valores_fecha[orden]}
+    return {"filas": filas, "bitmaps": bitmaps, "normalizadas": normalizadas, "fechas": fechas}
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _indice_por_version(vista, version, dimensiones, _df):
+    return construir_indice_filtros(_df, dimensiones)
+
+
+def obtener_indice_filtros(df, vista, version, dimensiones=DIMENSIONES_INDICE):
+    """El índice de `df`, la vista `vista` del dataset maestro en su `version`, compartido entre sesiones."""
+    return _indice_por_version(vista, version, tuple(dimensiones), df)
+
+
+def opciones_dimension(indice, columna):
+    """Los valores distintos (como texto, sin vacíos) de `columna`, ordenados: las opciones de su filtro."""
+    return sorted(indice["bitmaps"].get(columna, {}))
+
+
+def contar_valores(indice, columna, bitmap=None):
+    """
+    Filas por valor de `columna` dentro de `bitmap` (todas si es None): los
+    conteos de una búsqueda por facetas, sin agrupar el DataFrame.
+    """
+    bitmaps = indice["bitmaps"].get(columna, {})
+    if bitmap is None:
+        return {valor: int(np.bitwise_count(b).sum()) for valor, b in bitmaps.items()}
+    return {valor: int(np.bitwise_count(b & bitmap).sum()) for valor, b in bitmaps.items()}
+
+
+def bitmap_valores(indice, columna, valores):
+    """OR de los bitmaps de `valores` en `columna` (valores sin filas no suman nada)."""
+    bitmaps = indice["bitmaps"].get(columna, {})
+    resultado = np.zeros((indice["filas"] + 7) // 8, dtype=np.uint8)
+    for valor in valores:
+        bitmap = bitmaps.get(str(valor))
+        if bitmap is not None:
+            resultado |= bitmap
+    return resultado
+
+
+def bitmap_rango_fechas(indice, fecha_ini, fecha_fin):
+    """
+    Bitmap de las filas con fecha de invite (día) entre fecha_ini y fecha_fin,
+    ambos incluidos; un extremo en None deja ese lado abierto (sin fecha nunca entra).
+    """
+    bits = np.zeros(indice["filas"], dtype=bool)
+    fechas = indice["fechas"]
+    if fechas is not None:
+        ordenadas = fechas["ordenadas"]
+        inicio = 0 if fecha_ini is None else np.searchsorted(
+            ordenadas, np.datetime64(pd.Timestamp(fecha_ini).normalize(), "ns"), side="left")
+        # NaT va al final y searchsorted lo trata como mayor que cualquier fecha.
+        fin = np.searchsorted(ordenadas, np.datetime64("NaT", "ns") if fecha_fin is None else np.datetime64(
+            pd.Timestamp(fecha_fin).normalize() + pd.Timedelta(days=1), "ns"), side="left")
+        bits[fechas["orden"][inicio:fin]] = True
+    return np.packbits(bits)
+
+
+def mascara_filas(indice, bitmap):
+    """Bitmap empaquetado -> máscara booleana por fila, para materializar el resultado."""
+    return np.unpackbits(bitmap, count=indice["filas"]).astype(bool)
@@ -12,47 +12,17 @@ project_root = os.path.abspath(
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from datos.carga_datos import cargar_y_limpiar_datos
-from filtros.aplicar_filtros import aplicar_filtros
+from datos.carga_datos import construir_datos_base, obtener_vista
+from datos.fechas import ordenar_por_fecha
+from filtros.filtros_mensajes_custom import aplicar_filtros_mensajes
+from filtros.indice_busqueda import filtrar_busqueda, obtener_indice_busqueda
+from filtros.indice_filtros import obtener_indice_filtros, opciones_dimension
 # --- LÍNEA MODIFICADA ---
 from mensajes.mensajes import plantillas_john, plantillas_karen, plantillas_john_mejorado, plantillas_larissa
 from mensajes.mensajes_streamlit import clasificar_por_proceso
-from utils.limpieza import limpiar_valor_kpi, estandarizar_avatar, limpiar_nombre_completo
+from utils.limpieza import limpiar_nombre_completo
 
 
-# --- FUNCIÓN DE FILTRADO PERSONALIZADA PARA MENSAJES ---
-def aplicar_filtros_mensajes(
-    df,
-    fuente_lista, proceso, pais, industria, avatar,
-    prospectador, sesion_agendada, fecha_ini, fecha_fin,
-    columna_fecha="Fecha Primer Mensaje"
-):
-    df_filtrado = df.copy()
-
-    if fuente_lista and "– Todos –" not in fuente_lista:
-        df_filtrado = df_filtrado[df_filtrado["Fuente de la Lista"].isin(fuente_lista)]
-    if proceso and "– Todos –" not in proceso:
-        df_filtrado = df_filtrado[df_filtrado["Proceso"].isin(proceso)]
-    if pais and "– Todos –" not in pais:
-        df_filtrado = df_filtrado[df_filtrado["Pais"].isin(pais)]
-    if industria and "– Todos –" not in industria:
-        df_filtrado = df_filtrado[df_filtrado["Industria"].isin(industria)]
-    if avatar and "– Todos –" not in avatar:
-        df_filtrado = df_filtrado[df_filtrado["Avatar"].isin(avatar)]
-    if prospectador and "– Todos –" not in prospectador:
-        df_filtrado = df_filtrado[df_filtrado["¿Quién Prospecto?"].isin(prospectador)]
-    if sesion_agendada and sesion_agendada != "– Todos –":
-        df_filtrado = df_filtrado[
-            df_filtrado["Sesion Agendada?"].apply(lambda x: str(x).strip().lower() == str(sesion_agendada).strip().lower())
-        ]
-    if fecha_ini and fecha_fin and columna_fecha in df_filtrado.columns:
-        if pd.api.types.is_datetime64_any_dtype(df_filtrado[columna_fecha]):
-            df_filtrado = df_filtrado[
-                (df_filtrado[columna_fecha].dt.date >= fecha_ini) &
-                (df_filtrado[columna_fecha].dt.date <= fecha_fin)
-            ]
-    return df_filtrado
-
 def reset_mensaje_filtros_state():
     st.session_state.mensaje_filtros = {
         "invite_aceptada": "si", "fuente_lista": ["– Todos –"], "proceso": ["– Todos –"],
@@ -66,18 +36,19 @@ def reset_mensaje_filtros_state():
 st.title("💌 Generador de Mensajes Personalizados")
 st.markdown("Filtra prospectos que aceptaron tu invitación y genera mensajes personalizados.")
 
-@st.cache_data
-def get_base_data():
-    df_base = cargar_y_limpiar_datos()
+# Se prepara una vez por versión del dataset maestro, se comparte entre sesiones
+# y se guarda en disco para no volver a limpiar la hoja al reiniciar.
+def build_mensajes_view(hojas):
+    df_base = construir_datos_base(hojas)
     col_fecha_ppal = "Fecha Primer Mensaje"
     if col_fecha_ppal in df_base.columns and not pd.api.types.is_datetime64_any_dtype(df_base[col_fecha_ppal]):
         df_base[col_fecha_ppal] = pd.to_datetime(df_base[col_fecha_ppal], format='%d/%m/%Y', errors='coerce')
     if "Fecha de Invite" in df_base.columns and not pd.api.types.is_datetime64_any_dtype(df_base["Fecha de Invite"]):
         df_base["Fecha de Invite"] = pd.to_datetime(df_base["Fecha de Invite"], errors='coerce')
-    if "Avatar" in df_base.columns: df_base["Avatar"] = df_base["Avatar"].apply(estandarizar_avatar)
-    return df_base
+    # Ordenada por la fecha que filtra la página: el rango de fechas se resuelve con un corte.
+    return ordenar_por_fecha(df_base, col_fecha_ppal)
 
-df = get_base_data()
+df, version_datos_base = obtener_vista("mensajes", build_mensajes_view, persistir=True)
 
 if df is None or df.empty:
     st.warning("No se pudieron cargar datos o el DataFrame base está vacío.")
@@ -91,26 +62,26 @@ st.write("**1. Invite Aceptada:** (Filtro obligatorio: 'Si')")
 st.session_state.mensaje_filtros["invite_aceptada"] = "si"
 
 st.write("**2. Filtros Adicionales (Opcional):**")
+# Opciones de cada filtro: salen del índice de la versión actual, no se recalculan en cada rerun.
+indice_mensajes = obtener_indice_filtros(df, "mensajes", version_datos_base)
 with st.expander("Ver/Ocultar Filtros Adicionales"):
     # ... (toda la lógica de filtros permanece igual)
     col1_filtros, col2_filtros = st.columns(2)
     with col1_filtros:
-        opciones_fuente = ["– Todos –"] + (sorted(df["Fuente de la Lista"].dropna().astype(str).unique().tolist()) if "Fuente de la Lista" in df.columns and not df["Fuente de la Lista"].empty else [])
+        opciones_fuente = ["– Todos –"] + opciones_dimension(indice_mensajes, "Fuente de la Lista")
         st.session_state.mensaje_filtros["fuente_lista"] = st.multiselect("Fuente de la Lista", opciones_fuente, default=st.session_state.mensaje_filtros.get("fuente_lista", ["– Todos –"]), key="ms_fuente_lista_msg_page_v3")
         
-        opciones_proceso_col_original = df["Proceso"].dropna().astype(str).unique().tolist() if "Proceso" in df.columns and not df["Proceso"].empty else []
-        opciones_proceso_ui_original = ["– Todos –"] + sorted(opciones_proceso_col_original)
+        opciones_proceso_ui_original = ["– Todos –"] + opciones_dimension(indice_mensajes, "Proceso")
         st.session_state.mensaje_filtros["proceso"] = st.multiselect("Proceso (Filtro de Datos)", opciones_proceso_ui_original, default=st.session_state.mensaje_filtros.get("proceso", ["– Todos –"]), key="ms_proceso_col_original_msg_page_v3")
         
-        avatares_unicos_filt = ["– Todos –"]
-        if "Avatar" in df.columns and not df["Avatar"].empty: avatares_unicos_filt.extend(sorted(df["Avatar"].dropna().astype(str).unique().tolist()))
+        avatares_unicos_filt = ["– Todos –"] + opciones_dimension(indice_mensajes, "Avatar")
         st.session_state.mensaje_filtros["avatar"] = st.multiselect("Avatar", avatares_unicos_filt, default=st.session_state.mensaje_filtros.get("avatar", ["– Todos –"]), key="ms_avatar_msg_page_v3")
     with col2_filtros:
-        opciones_pais = ["– Todos –"] + (sorted(df["Pais"].dropna().astype(str).unique().tolist()) if "Pais" in df.columns and not df["Pais"].empty else [])
+        opciones_pais = ["– Todos –"] + opciones_dimension(indice_mensajes, "Pais")
         st.session_state.mensaje_filtros["pais"] = st.multiselect("País", opciones_pais, default=st.session_state.mensaje_filtros.get("pais", ["– Todos –"]), key="ms_pais_msg_page_v3")
-        opciones_industria = ["– Todos –"] + (sorted(df["Industria"].dropna().astype(str).unique().tolist()) if "Industria" in df.columns and not df["Industria"].empty else [])
+        opciones_industria = ["– Todos –"] + opciones_dimension(indice_mensajes, "Industria")
         st.session_state.mensaje_filtros["industria"] = st.multiselect("Industria", opciones_industria, default=st.session_state.mensaje_filtros.get("industria", ["– Todos –"]), key="ms_industria_msg_page_v3")
-        opciones_prospectador = ["– Todos –"] + (sorted(df["¿Quién Prospecto?"].dropna().astype(str).unique().tolist()) if "¿Quién Prospecto?" in df.columns and not df["¿Quién Prospecto?"].empty else [])
+        opciones_prospectador = ["– Todos –"] + opciones_dimension(indice_mensajes, "¿Quién Prospecto?")
         st.session_state.mensaje_filtros["prospectador"] = st.multiselect("¿Quién Prospectó?", opciones_prospectador, default=st.session_state.mensaje_filtros.get("prospectador", ["– Todos –"]), key="ms_prospectador_msg_page_v3")
 
     with st.container():
@@ -148,22 +119,19 @@ with col_btn2:
 if st.session_state.mostrar_tabla_mensajes:
     st.markdown("---")
     
-    df_mensajes_filtrado_temp = df.copy()
-    if "¿Invite Aceptada?" in df_mensajes_filtrado_temp.columns:
-        df_mensajes_filtrado_temp = df_mensajes_filtrado_temp[df_mensajes_filtrado_temp["¿Invite Aceptada?"].apply(limpiar_valor_kpi).astype(str).str.lower() == str(st.session_state.mensaje_filtros["invite_aceptada"]).lower()]
-    else:
+    if "¿Invite Aceptada?" not in df.columns:
         st.warning("Columna '¿Invite Aceptada?' no encontrada.")
         df_mensajes_filtrado_temp = pd.DataFrame()
-
-    if not df_mensajes_filtrado_temp.empty:
+    else:
         filtro_sesion_para_aplicar = st.session_state.mensaje_filtros.get("sesion_agendada", "– Todos –")
         if isinstance(filtro_sesion_para_aplicar, str):
             if filtro_sesion_para_aplicar.strip().lower() == "si": filtro_sesion_para_aplicar = "Si"
             elif filtro_sesion_para_aplicar.strip().lower() == "no": filtro_sesion_para_aplicar = "No"
             if filtro_sesion_para_aplicar not in ["Si", "No", "– Todos –"]: filtro_sesion_para_aplicar = "– Todos –"
         
+        # Invite aceptada y el resto de filtros en una sola especificación, resuelta sobre el índice de la vista.
         df_mensajes_filtrado_temp = aplicar_filtros_mensajes(
-            df_mensajes_filtrado_temp, 
+            df, 
             st.session_state.mensaje_filtros.get("fuente_lista", ["– Todos –"]), 
             st.session_state.mensaje_filtros.get("proceso", ["– Todos –"]),
             st.session_state.mensaje_filtros.get("pais", ["– Todos –"]), 
@@ -173,23 +141,17 @@ if st.session_state.mostrar_tabla_mensajes:
             filtro_sesion_para_aplicar, 
             st.session_state.mensaje_filtros.get("fecha_ini", None), 
             st.session_state.mensaje_filtros.get("fecha_fin", None), 
-            "Fecha Primer Mensaje"
+            "Fecha Primer Mensaje",
+            invite_aceptada=str(st.session_state.mensaje_filtros["invite_aceptada"]).lower(),
+            indice=indice_mensajes
         )
-        busqueda_term_final = st.session_state.mensaje_filtros.get("busqueda", "").lower().strip()
+        busqueda_term_final = st.session_state.mensaje_filtros.get("busqueda", "")
         if busqueda_term_final and not df_mensajes_filtrado_temp.empty:
-            mask_busqueda = pd.Series([False] * len(df_mensajes_filtrado_temp), index=df_mensajes_filtrado_temp.index)
-            columnas_para_busqueda_texto = ["Empresa", "Puesto"]
-            for col_busc in columnas_para_busqueda_texto:
-                if col_busc in df_mensajes_filtrado_temp.columns: mask_busqueda |= df_mensajes_filtrado_temp[col_busc].astype(str).str.lower().str.contains(busqueda_term_final, na=False)
-            nombre_col_df, apellido_col_df = "Nombre", "Apellido"
-            if nombre_col_df in df_mensajes_filtrado_temp.columns and apellido_col_df in df_mensajes_filtrado_temp.columns:
-                nombre_completo_busq = (df_mensajes_filtrado_temp[nombre_col_df].fillna('') + ' ' + df_mensajes_filtrado_temp[apellido_col_df].fillna('')).str.lower()
-                mask_busqueda |= nombre_completo_busq.str.contains(busqueda_term_final, na=False)
-            elif nombre_col_df in df_mensajes_filtrado_temp.columns: mask_busqueda |= df_mensajes_filtrado_temp[nombre_col_df].astype(str).str.lower().str.contains(busqueda_term_final, na=False)
-            elif apellido_col_df in df_mensajes_filtrado_temp.columns: mask_busqueda |= df_mensajes_filtrado_temp[apellido_col_df].astype(str).str.lower().str.contains(busqueda_term_final, na=False)
-            df_mensajes_filtrado_temp = df_mensajes_filtrado_temp[mask_busqueda]
+            # El mismo índice de búsqueda que el dashboard, construido sobre la vista de esta página.
+            df_mensajes_filtrado_temp = filtrar_busqueda(
+                df_mensajes_filtrado_temp, obtener_indice_busqueda(df, "mensajes", version_datos_base), busqueda_term_final)
 
-    df_mensajes_final_display = df_mensajes_filtrado_temp.copy()
+    df_mensajes_final_display = df_mensajes_filtrado_temp
 
     if df_mensajes_final_display.empty:
         st.warning("No se encontraron prospectos que cumplan todos los criterios de búsqueda y filtros.")
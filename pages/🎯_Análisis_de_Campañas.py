@@ -1,14 +1,29 @@
 # pages/📢_Campañas.py
 import streamlit as st
 import pandas as pd
-import gspread
-import datetime
 import plotly.express as px
 import plotly.graph_objects as go 
-from collections import Counter
+import os
+import sys
 
 # --- Configuración de Página ---
 st.set_page_config(page_title="Análisis de Campañas", layout="wide")
+
+project_root = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos.carga_datos import HOJA_MAESTRA_PRINCIPAL, obtener_vista, valores_hoja_maestra
+from datos.conexion import obtener_cliente_gspread
+from datos.esquemas import FECHA, SI_NO, aplicar_esquema, columna, encabezados_unicos
+from datos.fechas import FORMATOS_FECHA_COMUNES, ordenar_por_fecha
+from filtros.especificacion import aplicar_especificacion, fechas, valores
+from datos.sincronizacion import sincronizar_hoja
+from filtros.filtros_sidebar import formato_con_conteo
+from filtros.indice_filtros import bitmap_valores, contar_valores, obtener_indice_filtros, opciones_dimension
+from utils.limpieza import EQUIVALENCIAS_AVATAR
+
 st.title("📢 Análisis de Campañas")
 st.markdown(
     "Análisis del potencial de campañas, prospección manual y prospección por email. "
@@ -16,8 +31,6 @@ st.markdown(
 )
 
 # --- Constantes y Claves de Estado de Sesión ---
-SHEET_URL_SECRET_KEY = "main_prostraction_sheet_url"
-DEFAULT_SHEET_URL = "https://docs.google.com/spreadsheets/d/1_J_WLYf2cjiKp2JTxsFj1KYoGTzPA730Bw3YP4-q7Fs/edit?gid=0#gid=0"
 NO_CAMPAIGN_VALUES = ["Sin Campaña Asignada", "N/D", ""]
 
 # Columnas
@@ -46,119 +59,77 @@ ALL_CAMPAIGNS_STRING = "– Todas –"
 ALL_PROSPECTORS_STRING = "– Todos –"
 ALL_AVATARS_STRING = "– Todos –"
 
+# Columnas de los filtros de la barra lateral, indexadas una vez por versión del dataset.
+DIMENSIONES_CAMPANAS = (COL_CAMPAIGN, COL_QUIEN_PROSPECTO, COL_AVATAR)
+
 # --- Funciones Auxiliares ---
-def clean_text_value(val, default="N/D"):
-    if pd.isna(val) or str(val).strip() == "": return default
-    return str(val).strip()
-
-def clean_yes_no_value(val, true_val="si", false_val="no", default_val="no"):
-    if pd.isna(val): return default_val
-    cleaned = str(val).strip().lower()
-    if cleaned == true_val.lower(): return true_val
-    elif cleaned == false_val.lower(): return false_val
-    elif cleaned in ["", "nan", "na", "<na>"]: return default_val
-    return cleaned
-
-def parse_date_robustly(date_val):
-    if pd.isna(date_val) or str(date_val).strip() == "": return pd.NaT
-    if isinstance(date_val, (datetime.datetime, datetime.date)): return pd.to_datetime(date_val)
-    date_str = str(date_val).strip()
-    if date_str.isdigit():
-        try: return pd.to_datetime('1899-12-30') + pd.to_timedelta(float(date_str), 'D')
-        except ValueError: pass
-    common_formats = [
-        "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
-        "%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y",
-    ]
-    for fmt in common_formats:
-        try: return pd.to_datetime(date_str, format=fmt)
-        except (ValueError, TypeError): continue
-    return pd.to_datetime(date_str, errors='coerce')
-
-def make_unique_column_names(headers_list):
-    counts = Counter(); new_headers = []
-    for h in headers_list:
-        h_stripped = str(h).strip() if pd.notna(h) else "Columna_Vacia"
-        if not h_stripped: h_stripped = "Columna_Vacia"
-        counts[h_stripped] += 1
-        if counts[h_stripped] == 1: new_headers.append(h_stripped)
-        else: new_headers.append(f"{h_stripped}_{counts[h_stripped]-1}")
-    return new_headers
+# Vacíos de las columnas sí/no; cualquier otra respuesta se conserva en minúsculas.
+VACIOS_SI_NO_CAMPANAS = ("nan", "na", "<na>")
+
+ESQUEMA_CAMPANAS = (
+    *(columna(col, FECHA, formato=FORMATOS_FECHA_COMUNES, seriales=True, relleno=pd.NaT) for col in (
+        COL_FECHA_INVITE, COL_FECHA_SESION_MANUAL, COL_FECHA_SESION_EMAIL)),
+    *(columna(col, SI_NO, relleno="no", vacios=VACIOS_SI_NO_CAMPANAS, mayusculas="lower") for col in (
+        COL_INVITE_ACEPTADA, COL_RESPUESTA_1ER_MSJ, COL_SESION_AGENDADA_MANUAL,
+        COL_CONTACTADOS_EMAIL, COL_RESPUESTA_EMAIL, COL_SESION_AGENDADA_EMAIL)),
+    columna(COL_QUIEN_PROSPECTO, relleno="N/D_Interno"),
+    columna(COL_AVATAR, relleno="N/D_Interno", mayusculas="title", alias=EQUIVALENCIAS_AVATAR),
+)
+
+def prepare_campaign_rows(df):
+    """
+    Limpia las filas crudas de la hoja de prospección. Solo usa operaciones fila a fila
+    porque la sincronización incremental la aplica únicamente a las filas nuevas o modificadas.
+    Si falta la columna de campaña devuelve el DataFrame sin tocar para que el cargador lo reporte.
+    """
+    df.columns = encabezados_unicos(df.columns)
+    if COL_CAMPAIGN not in df.columns:
+        return df
+
+    df = aplicar_esquema(df, (columna(COL_CAMPAIGN, relleno=""),))
+    df = df[~df[COL_CAMPAIGN].isin(NO_CAMPAIGN_VALUES)]
+    df = aplicar_esquema(df, ESQUEMA_CAMPANAS)
+
+    # Equivale a copiar la fecha de invite: si toda la columna es nula el resultado ya es NaT.
+    df["FechaFiltroManual"] = df[COL_FECHA_INVITE]
+    
+    return df
+
+def build_campaign_view(hojas):
+    # Vista de Campañas sobre el dataset maestro: entre versiones solo se limpian las filas que cambiaron.
+    raw_data = valores_hoja_maestra(hojas, HOJA_MAESTRA_PRINCIPAL)
+    if not raw_data:
+        return None
+    df, n_filas = sincronizar_hoja("campanas::maestro", None, prepare_campaign_rows, valores=raw_data)
+    if not n_filas:
+        return None
+    # Ordenada por fecha de invite: apply_manual_date_filter corta el rango con searchsorted.
+    return ordenar_por_fecha(df.reset_index(drop=True), "FechaFiltroManual")
 
-@st.cache_data(ttl=600)
 def load_and_prepare_campaign_data():
+    # Devuelve (df, version); la versión identifica el índice de filtros de la vista.
     try:
-        creds_dict = st.secrets["gcp_service_account"]
-        client = gspread.service_account_from_dict(creds_dict)
-    except KeyError:
-        st.error("Error de Configuración (Secrets): Falta [gcp_service_account]. Revisa los secrets de Streamlit.")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Error al cargar credenciales de Google Sheets: {e}")
-        return pd.DataFrame()
-    try:
-        sheet_url = st.secrets.get(SHEET_URL_SECRET_KEY, DEFAULT_SHEET_URL)
-        workbook = client.open_by_url(sheet_url)
-        sheet = workbook.sheet1
-        raw_data = sheet.get_all_values()
-        if not raw_data or len(raw_data) < 1:
-            st.warning("La hoja de Google Sheets está vacía o no se pudo leer.")
-            return pd.DataFrame()
-        headers = make_unique_column_names(raw_data[0])
-        df = pd.DataFrame(raw_data[1:], columns=headers)
-    except gspread.exceptions.SpreadsheetNotFound:
-        st.error(f"Error: Hoja no encontrada en la URL definida en secrets ('{SHEET_URL_SECRET_KEY}') o en la URL por defecto.")
-        return pd.DataFrame()
+        df, version = obtener_vista("campanas", build_campaign_view)
     except Exception as e:
         st.error(f"Error al leer la hoja de cálculo: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), None
+    if df is None:
+        st.warning("La hoja de Google Sheets está vacía o no se pudo leer.")
+        return pd.DataFrame(), None
 
     if COL_CAMPAIGN not in df.columns:
         st.error(f"La columna '{COL_CAMPAIGN}' es esencial y no fue encontrada. El análisis de campañas no puede continuar.")
-        return pd.DataFrame()
+        return pd.DataFrame(), None
 
-    df[COL_CAMPAIGN] = df[COL_CAMPAIGN].apply(lambda x: clean_text_value(x, default=""))
-    df = df[~df[COL_CAMPAIGN].isin(NO_CAMPAIGN_VALUES)].copy()
     if df.empty:
         st.warning("No se encontraron prospectos con campañas asignadas válidas después de la limpieza inicial.")
-        return pd.DataFrame()
-
-    date_cols_manual_processing = [COL_FECHA_INVITE, COL_FECHA_SESION_MANUAL]
-    for col in date_cols_manual_processing:
-        if col in df.columns: df[col] = df[col].apply(parse_date_robustly)
-        else: df[col] = pd.NaT
-
-    yes_no_cols_manual = [COL_INVITE_ACEPTADA, COL_RESPUESTA_1ER_MSJ, COL_SESION_AGENDADA_MANUAL]
-    for col in yes_no_cols_manual:
-        if col in df.columns: df[col] = df[col].apply(clean_yes_no_value)
-        else: df[col] = "no"
-
-    text_cols_manual = [COL_QUIEN_PROSPECTO, COL_AVATAR]
-    for col in text_cols_manual:
-        if col in df.columns: df[col] = df[col].apply(lambda x: clean_text_value(x, default="N/D_Interno"))
-        else: df[col] = "N/D_Interno"
-
-    if COL_AVATAR in df.columns:
-        df[COL_AVATAR] = df[COL_AVATAR].astype(str).str.strip().str.title()
-        equivalencias_avatar = {"Jonh Fenner": "John Bermúdez", "Jonh Bermúdez": "John Bermúdez", "Jonh": "John Bermúdez", "John Fenner": "John Bermúdez"}
-        df[COL_AVATAR] = df[COL_AVATAR].replace(equivalencias_avatar)
-
-    email_yes_no_cols = [COL_CONTACTADOS_EMAIL, COL_RESPUESTA_EMAIL, COL_SESION_AGENDADA_EMAIL]
-    for col in email_yes_no_cols:
-        if col in df.columns: df[col] = df[col].apply(clean_yes_no_value)
-        else: df[col] = "no"
-
-    if COL_FECHA_SESION_EMAIL in df.columns: df[COL_FECHA_SESION_EMAIL] = df[COL_FECHA_SESION_EMAIL].apply(parse_date_robustly)
-    else: df[COL_FECHA_SESION_EMAIL] = pd.NaT
-
-    df["FechaFiltroManual"] = pd.NaT
-    if COL_FECHA_INVITE in df.columns and not df[COL_FECHA_INVITE].isnull().all():
-         df["FechaFiltroManual"] = df[COL_FECHA_INVITE]
+        return pd.DataFrame(), None
     
-    return df
+    return df, version
 
 # --- Filtros de Barra Lateral ---
-def display_campaign_filters(df_options): # df_options is a copy of df_base_campaigns_loaded
+def display_campaign_filters(df_options, indice): # df_options is a copy of df_base_campaigns_loaded
+    # `indice`: obtener_indice_filtros de la vista con DIMENSIONES_CAMPANAS (opciones y conteos).
     st.sidebar.header("🎯 Filtros de Campaña")
 
     default_filters_init = {
@@ -174,12 +145,22 @@ def display_campaign_filters(df_options): # df_options is a copy of df_base_camp
         if key not in st.session_state:
             st.session_state[key] = value
 
+    # Filas por opción bajo los otros dos filtros (búsqueda por facetas sobre el índice).
+    active_filters = ((COL_CAMPAIGN, SES_CAMPAIGN_FILTER_KEY, ALL_CAMPAIGNS_STRING),
+                      (COL_QUIEN_PROSPECTO, SES_PROSPECTOR_FILTER_KEY, ALL_PROSPECTORS_STRING),
+                      (COL_AVATAR, SES_AVATAR_FILTER_KEY, ALL_AVATARS_STRING))
+    def counts_under_other_filters(col_name):
+        bitmap = None
+        for other_col, key, all_string in active_filters:
+            selection = st.session_state[key]
+            if other_col != col_name and isinstance(selection, list) and selection and all_string not in selection:
+                other_bitmap = bitmap_valores(indice, other_col, selection)
+                bitmap = other_bitmap if bitmap is None else bitmap & other_bitmap
+        return contar_valores(indice, col_name, bitmap)
+
     # --- Filtro de Campaña ---
-    campaign_options = [ALL_CAMPAIGNS_STRING]
-    if COL_CAMPAIGN in df_options.columns and not df_options[COL_CAMPAIGN].empty:
-        unique_items = df_options[COL_CAMPAIGN].dropna().unique()
-        for item in sorted(list(unique_items)):
-            if item != ALL_CAMPAIGNS_STRING: campaign_options.append(item)
+    campaign_options = [ALL_CAMPAIGNS_STRING] + [
+        item for item in opciones_dimension(indice, COL_CAMPAIGN) if item != ALL_CAMPAIGNS_STRING]
     
     # Validate and potentially correct st.session_state for campaign filter
     current_campaign_selection_from_state = st.session_state[SES_CAMPAIGN_FILTER_KEY]
@@ -200,15 +181,14 @@ def display_campaign_filters(df_options): # df_options is a copy of df_base_camp
     # Streamlit uses st.session_state[KEY] as the widget's current value if KEY is provided.
     selected_campaigns = st.sidebar.multiselect(
         "Seleccionar Campaña(s)", options=campaign_options,
-        key=SES_CAMPAIGN_FILTER_KEY 
+        key=SES_CAMPAIGN_FILTER_KEY,
+        format_func=formato_con_conteo(counts_under_other_filters(COL_CAMPAIGN))
     )
 
     # --- Filtro de Prospectador ---
-    prospector_options = [ALL_PROSPECTORS_STRING]
-    if COL_QUIEN_PROSPECTO in df_options.columns and not df_options[COL_QUIEN_PROSPECTO].empty:
-        unique_items = df_options[df_options[COL_QUIEN_PROSPECTO] != "N/D_Interno"][COL_QUIEN_PROSPECTO].dropna().unique()
-        for item in sorted(list(unique_items)):
-            if item != ALL_PROSPECTORS_STRING: prospector_options.append(item)
+    prospector_options = [ALL_PROSPECTORS_STRING] + [
+        item for item in opciones_dimension(indice, COL_QUIEN_PROSPECTO)
+        if item not in ("N/D_Interno", ALL_PROSPECTORS_STRING)]
 
     current_prospector_selection_from_state = st.session_state[SES_PROSPECTOR_FILTER_KEY]
     prospector_selection_is_valid = True
@@ -225,15 +205,14 @@ def display_campaign_filters(df_options): # df_options is a copy of df_base_camp
 
     selected_prospectors = st.sidebar.multiselect(
         "¿Quién Prospectó?", options=prospector_options,
-        key=SES_PROSPECTOR_FILTER_KEY
+        key=SES_PROSPECTOR_FILTER_KEY,
+        format_func=formato_con_conteo(counts_under_other_filters(COL_QUIEN_PROSPECTO))
     )
 
     # --- Filtro de Avatar ---
-    avatar_options = [ALL_AVATARS_STRING]
-    if COL_AVATAR in df_options.columns and not df_options[COL_AVATAR].empty:
-        unique_items = df_options[df_options[COL_AVATAR] != "N/D_Interno"][COL_AVATAR].dropna().unique()
-        for item in sorted(list(unique_items)):
-            if item != ALL_AVATARS_STRING: avatar_options.append(item)
+    avatar_options = [ALL_AVATARS_STRING] + [
+        item for item in opciones_dimension(indice, COL_AVATAR)
+        if item not in ("N/D_Interno", ALL_AVATARS_STRING)]
         
     current_avatar_selection_from_state = st.session_state[SES_AVATAR_FILTER_KEY]
     avatar_selection_is_valid = True
@@ -250,7 +229,8 @@ def display_campaign_filters(df_options): # df_options is a copy of df_base_camp
 
     selected_avatars = st.sidebar.multiselect(
         "Avatar", options=avatar_options,
-        key=SES_AVATAR_FILTER_KEY
+        key=SES_AVATAR_FILTER_KEY,
+        format_func=formato_con_conteo(counts_under_other_filters(COL_AVATAR))
     )
     
     # --- Filtro de Fecha (uses FechaFiltroManual for min/max) ---
@@ -291,41 +271,20 @@ def display_campaign_filters(df_options): # df_options is a copy of df_base_camp
     )
 
 # --- Aplicar Filtros (excluding date filter) ---
-def apply_common_filters(df, campaigns, prospectors, avatars): 
+def apply_common_filters(df, campaigns, prospectors, avatars, indice=None): 
+    # `indice`: el de la vista (DIMENSIONES_CAMPANAS); con él los tres filtros se resuelven con bitmaps.
     if df.empty: return df
-    df_filtered = df.copy()
-
-    if campaigns and ALL_CAMPAIGNS_STRING not in campaigns:
-        df_filtered = df_filtered[df_filtered[COL_CAMPAIGN].isin(campaigns)]
-            
-    if prospectors and ALL_PROSPECTORS_STRING not in prospectors:
-        df_filtered = df_filtered[df_filtered[COL_QUIEN_PROSPECTO].isin(prospectors)]
-        
-    if avatars and ALL_AVATARS_STRING not in avatars:
-        df_filtered = df_filtered[df_filtered[COL_AVATAR].isin(avatars)]
-        
-    return df_filtered
+    return aplicar_especificacion(df, [
+        valores(COL_CAMPAIGN, campaigns),
+        valores(COL_QUIEN_PROSPECTO, prospectors),
+        valores(COL_AVATAR, avatars),
+    ], indice)
 
 # Helper function to apply date filter for manual prospecting sections
 def apply_manual_date_filter(df, start_date, end_date):
     if df.empty or (start_date is None and end_date is None):
         return df
-    
-    df_date_filtered = df.copy()
-    if "FechaFiltroManual" in df_date_filtered.columns and pd.api.types.is_datetime64_any_dtype(df_date_filtered["FechaFiltroManual"]):
-        s_date = pd.to_datetime(start_date).date() if start_date else None
-        e_date = pd.to_datetime(end_date).date() if end_date else None
-        
-        date_series_for_filter = df_date_filtered["FechaFiltroManual"].dt.tz_localize(None) if df_date_filtered["FechaFiltroManual"].dt.tz is not None else df_date_filtered["FechaFiltroManual"]
-        date_series_for_filter = date_series_for_filter.dt.date
-
-        if s_date and e_date:
-            df_date_filtered = df_date_filtered[(date_series_for_filter >= s_date) & (date_series_for_filter <= e_date)]
-        elif s_date:
-            df_date_filtered = df_date_filtered[date_series_for_filter >= s_date]
-        elif e_date:
-            df_date_filtered = df_date_filtered[date_series_for_filter <= e_date]
-    return df_date_filtered
+    return aplicar_especificacion(df, [fechas("FechaFiltroManual", start_date or None, end_date or None)])
 
 
 # --- Funciones de Análisis y Visualización ---
@@ -752,8 +711,7 @@ def load_email_stats_from_new_sheet():
     VERSIÓN MEJORADA: Busca las tablas en cualquier parte de la hoja y carga todas las campañas.
     """
     try:
-        creds_dict = st.secrets["gcp_service_account"]
-        client = gspread.service_account_from_dict(creds_dict)
+        client = obtener_cliente_gspread()
     except KeyError:
         st.error("Error de Configuración (Secrets): Falta [gcp_service_account] para la nueva hoja.")
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
@@ -913,27 +871,30 @@ def display_new_email_stats_analysis(df, campaign_name, column_mapping):
 
 
 # --- Lógica Principal de la Página ---
-df_base_campaigns_loaded = load_and_prepare_campaign_data()
+df_base_campaigns_loaded, version_campaigns = load_and_prepare_campaign_data()
 
 if df_base_campaigns_loaded.empty:
     st.error("No se pudieron cargar datos válidos de campañas desde la fuente. La página no puede generar análisis.")
 else:
+    campaign_index = obtener_indice_filtros(df_base_campaigns_loaded, "campanas", version_campaigns, DIMENSIONES_CAMPANAS)
     (selected_campaigns, 
      start_date_filter, 
      end_date_filter, 
      selected_prospectors, 
-     selected_avatars) = display_campaign_filters(df_base_campaigns_loaded.copy()) 
+     selected_avatars) = display_campaign_filters(df_base_campaigns_loaded, campaign_index)
 
     df_filtered_common = apply_common_filters(
-        df_base_campaigns_loaded.copy(), 
+        df_base_campaigns_loaded, 
         selected_campaigns, 
         selected_prospectors, 
-        selected_avatars
+        selected_avatars,
+        campaign_index
     )
     
-    display_campaign_potential(df_filtered_common.copy()) 
-    display_manual_prospecting_analysis(df_filtered_common.copy(), start_date_filter, end_date_filter)
-    display_global_manual_prospecting_deep_dive(df_filtered_common.copy(), start_date_filter, end_date_filter)
+    # Copias sin datos (Copy-on-Write): cada sección puede modificar la suya sin afectar a las demás.
+    display_campaign_potential(df_filtered_common.copy(deep=False)) 
+    display_manual_prospecting_analysis(df_filtered_common.copy(deep=False), start_date_filter, end_date_filter)
+    display_global_manual_prospecting_deep_dive(df_filtered_common.copy(deep=False), start_date_filter, end_date_filter)
     
     # ❗️ PASO 1: La siguiente línea ha sido comentada para desactivar la sección que causaba error.
     # display_email_prospecting_analysis(df_filtered_common.copy())
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import gspread
 import datetime
 import plotly.express as px
 import os
@@ -20,6 +19,16 @@ except NameError:
     if project_root not in sys.path:
         sys.path.insert(0, project_root)
 
+from datos.acumulados import obtener_acumulados, resumir_acumulados
+from datos.compartido import vista_compartida
+from datos.conexion import obtener_cliente_gspread
+from datos.esquemas import FECHA, aplicar_esquema, categorizar, columna, encabezados_unicos
+from datos.fechas import FORMATOS_FECHA_COMUNES, ordenar_por_fecha
+from datos.fuentes import cargar_fuentes, fuente
+from datos.motor_analitico import agrupar
+from datos.sincronizacion import sincronizar_hoja
+from filtros.especificacion import aplicar_especificacion, fechas, valores
+
 st.set_page_config(layout="wide", page_title="Análisis de Sesiones y SQL")
 st.title("📊 Análisis de Sesiones y Calificaciones SQL")
 st.markdown(
@@ -39,6 +48,16 @@ COLUMNAS_CENTRALES = [
     "Fuente_Hoja", "Año", "NumSemana", "MesNombre", "AñoMes", "Proceso"
 ]
 SQL_ORDER_OF_IMPORTANCE = ['SQL1', 'SQL2', 'MQL', 'NA', 'SIN CALIFICACIÓN SQL']
+# Cualquier otra calificación (o ninguna) cuenta como 'SIN CALIFICACIÓN SQL'.
+SQL_VALORES_VALIDOS = ['SQL1', 'SQL2', 'MQL', 'NA']
+# Dimensiones de pocos valores distintos: category abarata isin, groupby y value_counts.
+COLUMNAS_CATEGORICAS_SESIONES = ["AE", "LG", "SQL_Estandarizado"]
+# Acumulados por periodo, AE/LG, país y nivel SQL (datos/acumulados.py) para las evoluciones
+# y tablas por mes; incluyen todas las columnas de los filtros de la barra lateral.
+GRANOS_SESIONES = {
+    "semanal": ("Año", "NumSemana", "AE", "LG", "País", "SQL_Estandarizado", "Proceso"),
+    "mensual": ("Año", "AñoMes", "AE", "LG", "País", "SQL_Estandarizado", "Proceso"),
+}
 DF_FINAL_STRUCTURE_EMPTY = pd.DataFrame(columns=COLUMNAS_CENTRALES)
 
 # --- Gestión de Estado de Sesión para Filtros ---
@@ -65,30 +84,6 @@ for key, value in default_filters_config.items():
         st.session_state[key] = value
 
 # --- Funciones de Utilidad ---
-def make_unique_headers(headers_list):
-    counts = {}; new_headers = []
-    for h in headers_list:
-        h_stripped = str(h).strip() if pd.notna(h) else ""
-        if not h_stripped: h_stripped = "Columna_Vacia"
-        if h_stripped in counts:
-            counts[h_stripped] += 1; new_headers.append(f"{h_stripped}_{counts[h_stripped]-1}")
-        else:
-            counts[h_stripped] = 1; new_headers.append(h_stripped)
-    return new_headers
-
-def parse_date_robust(date_val):
-    if pd.isna(date_val) or str(date_val).strip() == "": return pd.NaT
-    if isinstance(date_val, (datetime.datetime, datetime.date)): return pd.to_datetime(date_val)
-    date_str = str(date_val).strip()
-    common_formats = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
-                      "%Y-%m-%d %H:%M:%S", "%Y-%m-%d",
-                      "%m/%d/%Y %H:%M:%S", "%m/%d/%Y")
-    for fmt in common_formats:
-        try: return pd.to_datetime(date_str, format=fmt)
-        except (ValueError, TypeError): continue
-    try: return pd.to_datetime(date_str, errors='coerce')
-    except (ValueError, TypeError): return pd.NaT
-
 def separar_nombre_cargo_suramerica(nombre_cargo_str):
     nombre, apellido, puesto = pd.NA, pd.NA, "No Especificado"
     if pd.isna(nombre_cargo_str) or not isinstance(nombre_cargo_str, str) or not nombre_cargo_str.strip():
@@ -123,11 +118,78 @@ def separar_nombre_cargo_suramerica(nombre_cargo_str):
             str(apellido).strip() if pd.notna(apellido) else pd.NA,
             str(puesto).strip() if pd.notna(puesto) and puesto else "No Especificado")
 
-@st.cache_data(ttl=300)
-def load_sesiones_data():
+VACIOS_SESIONES = ('nan', 'none', '<NA>', '#N/A', 'N/A', 'na', 'nd', 'n/d', 's/d', 's.d.')
+
+def columna_sesiones(nombre, relleno="No Especificado", mayusculas="title"):
+    # El propio valor por defecto escrito a mano también se unifica (p. ej. 'no asignado ae').
+    return columna(nombre, relleno=relleno, vacios=VACIOS_SESIONES + (relleno,), mayusculas=mayusculas)
+
+ESQUEMA_SESIONES = (
+    columna("Fecha", FECHA, formato=FORMATOS_FECHA_COMUNES, requerida=True),
+    columna_sesiones("Empresa"), columna_sesiones("País"), columna_sesiones("Nombre"),
+    columna_sesiones("Apellido"), columna_sesiones("Puesto"), columna_sesiones("Siguientes Pasos"),
+    columna_sesiones("Proceso"),
+    columna_sesiones("AE", "No Asignado AE"), columna_sesiones("LG", "No Asignado LG"),
+    columna_sesiones("Email", mayusculas="lower"), columna_sesiones("LinkedIn", mayusculas="lower"),
+    columna_sesiones("RPA", "No Aplicable", mayusculas="lower"),
+    columna_sesiones("Fuente_Hoja", "Desconocida", mayusculas="lower"),
+    columna("SQL", relleno="", mayusculas="upper"),
+)
+
+def finalize_sesiones_rows(df_consolidado, avisos):
+    # Limpieza común a ambas hojas. Es fila a fila: la sincronización incremental solo la aplica al delta.
+    # Corre en los hilos de cargar_fuentes, sin página: los problemas se añaden a `avisos`
+    # y load_sesiones_rows los muestra.
+    df_procesado = aplicar_esquema(df_consolidado, ESQUEMA_SESIONES)
+    if df_procesado.empty:
+        return DF_FINAL_STRUCTURE_EMPTY.copy()
+
     try:
-        creds_dict_sesiones = st.secrets["gcp_service_account"]
-        client = gspread.service_account_from_dict(creds_dict_sesiones)
+        df_procesado['Año'] = df_procesado['Fecha'].dt.year.astype('Int64')
+        df_procesado['NumSemana'] = df_procesado['Fecha'].dt.isocalendar().week.astype('Int64')
+        df_procesado['MesNombre'] = df_procesado['Fecha'].dt.strftime('%B')
+        df_procesado['AñoMes'] = df_procesado['Fecha'].dt.strftime('%Y-%m')
+    except Exception as e_time:
+        avisos.append(f"Error creando columnas de tiempo: {e_time}")
+        for col_t in ['Año', 'NumSemana', 'MesNombre', 'AñoMes']: df_procesado[col_t] = pd.NA
+
+    df_procesado["SQL_Estandarizado"] = df_procesado["SQL"].where(
+        df_procesado["SQL"].isin(SQL_VALORES_VALIDOS), "SIN CALIFICACIÓN SQL")
+
+    df_final_structure = df_procesado.reindex(columns=COLUMNAS_CENTRALES)
+    try:
+        if 'Año' in df_final_structure.columns: df_final_structure['Año'] = pd.to_numeric(df_final_structure['Año'], errors='coerce').astype('Int64')
+        if 'NumSemana' in df_final_structure.columns: df_final_structure['NumSemana'] = pd.to_numeric(df_final_structure['NumSemana'], errors='coerce').astype('Int64')
+    except Exception as e_type_final: avisos.append(f"ADVERTENCIA al ajustar tipos finales: {e_type_final}")
+    return df_final_structure
+
+def prepare_sesiones_principal_rows(df_principal_raw, avisos):
+    df_principal_raw.columns = encabezados_unicos(df_principal_raw.columns)
+    df_proc_p = pd.DataFrame()
+    for col in ["Fecha", "Empresa", "País", "Nombre", "Apellido", "Puesto", "SQL", "AE", "LG", "Siguientes Pasos", "Email", "RPA", "LinkedIn", "Proceso"]:
+        df_proc_p[col] = df_principal_raw.get(col)
+    df_proc_p["Fuente_Hoja"] = "Principal"
+    return finalize_sesiones_rows(df_proc_p, avisos)
+
+def prepare_sesiones_suramerica_rows(df_suramerica_raw, avisos):
+    df_suramerica_raw.columns = encabezados_unicos(df_suramerica_raw.columns)
+    df_proc_sa = pd.DataFrame()
+    map_cols_sa = {"Fecha": "Fecha", "Empresa": "Empresa", "País": "País", "Siguientes Pasos": "Siguientes Pasos",
+                   "SQL": "SQL", "Correo": "Email", "LinkedIn": "LinkedIn", "LG": "LG", "AE": "AE", "Proceso": "Proceso"}
+    for orig_col, new_col in map_cols_sa.items():
+        df_proc_sa[new_col] = df_suramerica_raw.get(orig_col)
+    if "Nombre y Cargo" in df_suramerica_raw.columns:
+        n_c_split = df_suramerica_raw["Nombre y Cargo"].apply(separar_nombre_cargo_suramerica)
+        df_proc_sa["Nombre"] = n_c_split.apply(lambda x: x[0])
+        df_proc_sa["Apellido"] = n_c_split.apply(lambda x: x[1])
+        df_proc_sa["Puesto"] = n_c_split.apply(lambda x: x[2])
+    else: df_proc_sa["Nombre"], df_proc_sa["Apellido"], df_proc_sa["Puesto"] = pd.NA, pd.NA, "No Especificado"
+    df_proc_sa["Fuente_Hoja"] = "Suramérica"
+    return finalize_sesiones_rows(df_proc_sa, avisos)
+
+def load_sesiones_rows():
+    try:
+        client = obtener_cliente_gspread()
     except KeyError:
         st.error("Error de Configuración (Secrets): Falta [gcp_service_account] en Streamlit Secrets (Sesiones).")
         st.stop()
@@ -138,46 +200,24 @@ def load_sesiones_data():
     all_dataframes = []
     processing_warnings = []
 
-    try: # Hoja Principal
-        workbook_principal = client.open_by_url(SHEET_URL_SESIONES_PRINCIPAL_DEFAULT)
-        sheet_principal = workbook_principal.worksheet(SHEET_NAME_SESIONES_PRINCIPAL)
-        raw_data_principal_list = sheet_principal.get_all_values()
-        if raw_data_principal_list and len(raw_data_principal_list) > 1:
-            headers_p = make_unique_headers(raw_data_principal_list[0])
-            df_principal_raw = pd.DataFrame(raw_data_principal_list[1:], columns=headers_p)
-            df_proc_p = pd.DataFrame()
-            for col in ["Fecha", "Empresa", "País", "Nombre", "Apellido", "Puesto", "SQL", "AE", "LG", "Siguientes Pasos", "Email", "RPA", "LinkedIn", "Proceso"]:
-                df_proc_p[col] = df_principal_raw.get(col)
-            df_proc_p["Fuente_Hoja"] = "Principal"
-            all_dataframes.append(df_proc_p)
-        else: processing_warnings.append(f"Hoja Principal ('{SHEET_NAME_SESIONES_PRINCIPAL}') vacía o sin encabezados.")
-    except Exception as e:
-        processing_warnings.append(f"ADVERTENCIA al cargar Hoja Principal. Error: {e}")
-
-    try: # Hoja Suramérica
-        workbook_suramerica = client.open_by_url(SHEET_URL_SESIONES_SURAMERICA_DEFAULT)
-        sheet_suramerica = workbook_suramerica.worksheet(SHEET_NAME_SESIONES_SURAMERICA)
-        raw_data_suramerica_list = sheet_suramerica.get_all_values()
-        if raw_data_suramerica_list and len(raw_data_suramerica_list) > 1:
-            headers_sa = make_unique_headers(raw_data_suramerica_list[0])
-            df_suramerica_raw = pd.DataFrame(raw_data_suramerica_list[1:], columns=headers_sa)
-            if not df_suramerica_raw.empty:
-                df_proc_sa = pd.DataFrame()
-                map_cols_sa = {"Fecha": "Fecha", "Empresa": "Empresa", "País": "País", "Siguientes Pasos": "Siguientes Pasos",
-                               "SQL": "SQL", "Correo": "Email", "LinkedIn": "LinkedIn", "LG": "LG", "AE": "AE", "Proceso": "Proceso"}
-                for orig_col, new_col in map_cols_sa.items():
-                    df_proc_sa[new_col] = df_suramerica_raw.get(orig_col)
-                if "Nombre y Cargo" in df_suramerica_raw.columns:
-                    n_c_split = df_suramerica_raw["Nombre y Cargo"].apply(separar_nombre_cargo_suramerica)
-                    df_proc_sa["Nombre"] = n_c_split.apply(lambda x: x[0])
-                    df_proc_sa["Apellido"] = n_c_split.apply(lambda x: x[1])
-                    df_proc_sa["Puesto"] = n_c_split.apply(lambda x: x[2])
-                else: df_proc_sa["Nombre"], df_proc_sa["Apellido"], df_proc_sa["Puesto"] = pd.NA, pd.NA, "No Especificado"
-                df_proc_sa["Fuente_Hoja"] = "Suramérica"
-                all_dataframes.append(df_proc_sa)
-        else: processing_warnings.append(f"Hoja Suramérica ('{SHEET_NAME_SESIONES_SURAMERICA}') vacía o sin encabezados.")
-    except Exception as e:
-        processing_warnings.append(f"ADVERTENCIA al cargar Hoja Suramérica. Error: {e}")
+    def sync_sesiones_sheet(sheet_url, sheet_name, prepare_rows):
+        worksheet = client.open_by_url(sheet_url).worksheet(sheet_name)
+        return sincronizar_hoja(f"sesiones::{sheet_url}::{sheet_name}", worksheet,
+                                lambda filas: prepare_rows(filas, processing_warnings))
+
+    # Ambas hojas se descargan en paralelo; la página espera solo a la más lenta.
+    sesiones_sources = [
+        fuente("Principal", lambda: sync_sesiones_sheet(SHEET_URL_SESIONES_PRINCIPAL_DEFAULT, SHEET_NAME_SESIONES_PRINCIPAL, prepare_sesiones_principal_rows)),
+        fuente("Suramérica", lambda: sync_sesiones_sheet(SHEET_URL_SESIONES_SURAMERICA_DEFAULT, SHEET_NAME_SESIONES_SURAMERICA, prepare_sesiones_suramerica_rows)),
+    ]
+    sheet_names = {"Principal": SHEET_NAME_SESIONES_PRINCIPAL, "Suramérica": SHEET_NAME_SESIONES_SURAMERICA}
+    source_results, source_errors = cargar_fuentes(sesiones_sources)
+    for source_name, (df_proc, n_rows) in source_results.items():
+        if n_rows:
+            all_dataframes.append(df_proc)
+        else: processing_warnings.append(f"Hoja {source_name} ('{sheet_names[source_name]}') vacía o sin encabezados.")
+    for source_name, error in source_errors.items():
+        processing_warnings.append(f"ADVERTENCIA al cargar Hoja {source_name}. Error: {error}")
 
     if processing_warnings:
         for warning_msg in processing_warnings: st.warning(warning_msg)
@@ -185,93 +225,26 @@ def load_sesiones_data():
         st.error("No se pudieron cargar datos de ninguna fuente.")
         return DF_FINAL_STRUCTURE_EMPTY.copy()
 
-    df_consolidado = pd.concat(all_dataframes, ignore_index=True, sort=False)
-    if "Fecha" not in df_consolidado.columns or df_consolidado["Fecha"].isnull().all():
-        st.error("Columna 'Fecha' no encontrada o vacía en datos consolidados.")
-        return DF_FINAL_STRUCTURE_EMPTY.copy()
-    df_consolidado["Fecha"] = df_consolidado["Fecha"].apply(parse_date_robust)
-    df_consolidado.dropna(subset=["Fecha"], inplace=True)
-    if df_consolidado.empty:
+    all_dataframes = [df_fuente for df_fuente in all_dataframes if not df_fuente.empty]
+    if not all_dataframes:
         st.info("No hay datos con fechas válidas.")
         return DF_FINAL_STRUCTURE_EMPTY.copy()
-
-    df_procesado = df_consolidado.copy()
-    try:
-        df_procesado['Año'] = df_procesado['Fecha'].dt.year.astype('Int64')
-        df_procesado['NumSemana'] = df_procesado['Fecha'].dt.isocalendar().week.astype('Int64')
-        df_procesado['MesNombre'] = df_procesado['Fecha'].dt.strftime('%B')
-        df_procesado['AñoMes'] = df_procesado['Fecha'].dt.strftime('%Y-%m')
-    except Exception as e_time:
-        st.error(f"Error creando columnas de tiempo: {e_time}")
-        for col_t in ['Año', 'NumSemana', 'MesNombre', 'AñoMes']: df_procesado[col_t] = pd.NA
-
-    default_values_fill = {
-        "AE": "No Asignado AE", "LG": "No Asignado LG", "Puesto": "No Especificado",
-        "Empresa": "No Especificado", "País": "No Especificado", "Nombre": "No Especificado",
-        "Apellido": "No Especificado", "Siguientes Pasos": "No Especificado",
-        "Email": "No Especificado", "RPA": "No Aplicable", "LinkedIn": "No Especificado",
-        "Fuente_Hoja": "Desconocida",
-        "SQL": "TEMP_EMPTY_SQL",
-        "SQL_Estandarizado": "TEMP_EMPTY_SQL",
-        "Proceso": "No Especificado"
-    }
-    generic_empty_na_values_general = ['', 'nan', 'none', 'NaN', 'None', '<NA>', '#N/A', 'N/A', 'na', 'nd', 'n/d', 's/d', 's.d.']
-
-    for col_name in COLUMNAS_CENTRALES:
-        if col_name in ['Fecha', 'Año', 'NumSemana', 'MesNombre', 'AñoMes']: continue
-        default_val = default_values_fill.get(col_name, "No Especificado")
-        if col_name not in df_procesado.columns:
-            df_procesado[col_name] = default_val
-        else:
-            if col_name != "SQL":
-                df_procesado[col_name] = df_procesado[col_name].fillna(default_val)
-        df_procesado[col_name] = df_procesado[col_name].astype(str)
-        if col_name != "SQL":
-            current_col_lower = df_procesado[col_name].str.lower()
-            for empty_pattern in generic_empty_na_values_general:
-                current_col_lower = current_col_lower.replace(empty_pattern, default_val.lower(), regex=False)
-            df_procesado[col_name] = current_col_lower.str.strip()
-            df_procesado.loc[df_procesado[col_name] == '', col_name] = default_val
-            if col_name not in ["SQL_Estandarizado", "Email", "LinkedIn", "RPA", "Fuente_Hoja"]:
-                 df_procesado[col_name] = df_procesado[col_name].str.title()
-                 df_procesado[col_name] = df_procesado[col_name].replace(default_val.title(), default_val, regex=False)
-                 df_procesado[col_name] = df_procesado[col_name].replace("No Asignado Ae", "No Asignado AE", regex=False)
-                 df_procesado[col_name] = df_procesado[col_name].replace("No Asignado Lg", "No Asignado LG", regex=False)
-
-    if "SQL" not in df_procesado.columns:
-        df_procesado["SQL"] = default_values_fill["SQL"]
-
-    df_procesado["SQL"] = df_procesado["SQL"].fillna(default_values_fill["SQL"])
-    df_procesado["SQL"] = df_procesado["SQL"].astype(str).str.strip().str.upper()
-
-    empty_patterns_for_sql = ["", "NAN", "NONE", "<NA>", "N/A", "ND", "N.D", "S/D", "S.D.", "TEMP_EMPTY_SQL", "NO ESPECIFICADO", "NO ASIGNADO SQL"]
-
-    df_procesado["SQL_Estandarizado"] = df_procesado["SQL"].copy()
-
-    for pattern in empty_patterns_for_sql:
-        df_procesado.loc[df_procesado["SQL_Estandarizado"] == pattern.upper(), "SQL_Estandarizado"] = "PLACEHOLDER_FOR_SIN_CALIFICACION"
-
-    df_procesado.loc[df_procesado["SQL_Estandarizado"] == "PLACEHOLDER_FOR_SIN_CALIFICACION", "SQL_Estandarizado"] = "SIN CALIFICACIÓN SQL"
-
-    valid_explicit_sql_values = ['SQL1', 'SQL2', 'MQL', 'NA']
-
-    mask_others_to_standardize = ~df_procesado["SQL_Estandarizado"].isin(valid_explicit_sql_values + ["SIN CALIFICACIÓN SQL"])
-    df_procesado.loc[mask_others_to_standardize, "SQL_Estandarizado"] = "SIN CALIFICACIÓN SQL"
-
-    df_final_structure = pd.DataFrame()
-    for col in COLUMNAS_CENTRALES:
-        if col in df_procesado.columns:
-            df_final_structure[col] = df_procesado[col]
-        else:
-            if col in ['Año', 'NumSemana']: df_final_structure[col] = pd.Series(dtype='Int64')
-            elif col == 'Fecha': df_final_structure[col] = pd.Series(dtype='datetime64[ns]')
-            else: df_final_structure[col] = pd.Series(dtype='object')
+    df_final_structure = pd.concat(all_dataframes, ignore_index=True, sort=False)
     try:
         if 'Fecha' in df_final_structure.columns: df_final_structure['Fecha'] = pd.to_datetime(df_final_structure['Fecha'], errors='coerce')
         if 'Año' in df_final_structure.columns: df_final_structure['Año'] = pd.to_numeric(df_final_structure['Año'], errors='coerce').astype('Int64')
         if 'NumSemana' in df_final_structure.columns: df_final_structure['NumSemana'] = pd.to_numeric(df_final_structure['NumSemana'], errors='coerce').astype('Int64')
     except Exception as e_type_final: st.warning(f"ADVERTENCIA al ajustar tipos finales: {e_type_final}")
-    return df_final_structure.reset_index(drop=True)
+    # Sobre la tabla ya unida: cada hoja se sincroniza por separado y sus categorías no coincidirían.
+    # Ordenada por fecha para que el filtro de fechas de sesiones_filters_spec resuelva el rango con searchsorted.
+    return categorizar(ordenar_por_fecha(df_final_structure, 'Fecha'), COLUMNAS_CATEGORICAS_SESIONES)
+
+# Compartido por todas las sesiones (sin copia por rerun); cada página recibe una vista_compartida.
+# Los acumulados se calculan (o se leen de disco) una vez por recarga, junto con las filas.
+@st.cache_resource(ttl=300)
+def load_sesiones_data():
+    df_sesiones = load_sesiones_rows()
+    return {"datos": df_sesiones, "acumulados": obtener_acumulados("sesiones", df_sesiones, GRANOS_SESIONES)}
 
 def clear_ses_filters_callback():
     for key, value in default_filters_config.items(): st.session_state[key] = value
@@ -397,29 +370,18 @@ def sidebar_filters_sesiones(df_options):
             st.session_state.get(SES_SQL_FILTER_KEY),
             st.session_state.get(SES_PROCESO_FILTER_KEY))
 
-def apply_sesiones_filters(df, start_date, end_date, year_f, week_f_list, ae_f_list, lg_f_list, pais_f_list, sql_f_list, proceso_f_list):
-    if df is None or df.empty: return DF_FINAL_STRUCTURE_EMPTY.copy()
-    df_f = df.copy()
-    if "Fecha" in df_f.columns and pd.api.types.is_datetime64_any_dtype(df_f["Fecha"]):
-        start_dt = pd.to_datetime(start_date, errors='coerce').normalize() if start_date else None
-        end_dt = pd.to_datetime(end_date, errors='coerce').normalize() if end_date else None
-        fecha_series_norm = df_f["Fecha"].dt.normalize()
-        if start_dt and end_dt: df_f = df_f[(fecha_series_norm >= start_dt) & (fecha_series_norm <= end_dt)]
-        elif start_dt: df_f = df_f[fecha_series_norm >= start_dt]
-        elif end_dt: df_f = df_f[fecha_series_norm <= end_dt]
-    if year_f is not None and "Año" in df_f.columns:
-        try: df_f = df_f[df_f["Año"].astype(int) == year_f]
-        except (ValueError, TypeError): st.warning("No se pudo aplicar filtro de año por tipo incompatible.")
-    if week_f_list and "– Todas –" not in week_f_list and "NumSemana" in df_f.columns:
-        try:
-            selected_weeks_int = [int(w) for w in week_f_list if isinstance(w, str) and w.isdigit()]
-            if selected_weeks_int: df_f = df_f[df_f["NumSemana"].astype(int).isin(selected_weeks_int)]
-        except (ValueError, TypeError): st.warning("Semanas seleccionadas contienen valores no numéricos o 'NumSemana' no es numérico.")
+def sesiones_filters_spec(start_date, end_date, year_f, week_f_list, ae_f_list, lg_f_list, pais_f_list, sql_f_list, proceso_f_list):
+    start_dt = pd.to_datetime(start_date, errors='coerce') if start_date else None
+    end_dt = pd.to_datetime(end_date, errors='coerce') if end_date else None
+    # Las semanas llegan como texto; "– Todas –" o ninguna numérica no filtran.
+    selected_weeks_int = [int(w) for w in week_f_list if isinstance(w, str) and w.isdigit()] if week_f_list and "– Todas –" not in week_f_list else []
     filter_map = {"AE": ae_f_list, "LG": lg_f_list, "País": pais_f_list, "SQL_Estandarizado": sql_f_list, "Proceso": proceso_f_list}
-    for col_name, filter_values in filter_map.items():
-        if filter_values and "– Todos –" not in filter_values and col_name in df_f.columns:
-            df_f = df_f[df_f[col_name].astype(str).isin([str(val) for val in filter_values])]
-    return df_f
+    return [
+        fechas("Fecha", None if pd.isna(start_dt) else start_dt, None if pd.isna(end_dt) else end_dt),
+        valores("Año", year_f),
+        valores("NumSemana", selected_weeks_int),
+        *(valores(col_name, [str(val) for val in filter_values] if filter_values else None) for col_name, filter_values in filter_map.items()),
+    ]
 
 def get_sql_category_order(df_column_or_list):
     present_sqls_series = pd.Series(df_column_or_list).astype(str).dropna().unique()
@@ -433,7 +395,7 @@ def display_sesiones_summary_sql(df_filtered):
     total_sesiones = len(df_filtered); st.metric("Total Sesiones (filtradas)", f"{total_sesiones:,}")
     if 'SQL_Estandarizado' in df_filtered.columns:
         st.markdown("#### Distribución por Calificación SQL")
-        sql_counts = df_filtered['SQL_Estandarizado'].value_counts().reset_index()
+        sql_counts = df_filtered['SQL_Estandarizado'].value_counts().loc[lambda c: c > 0].reset_index()
         sql_counts.columns = ['Calificación SQL', 'Número de Sesiones']
         category_order_sql_summary = get_sql_category_order(sql_counts['Calificación SQL'])
         sql_counts['Calificación SQL'] = pd.Categorical(sql_counts['Calificación SQL'], categories=category_order_sql_summary, ordered=True)
@@ -454,7 +416,7 @@ def display_sesiones_summary_sql(df_filtered):
             total_sesiones_tomadas = len(sesiones_tomadas_df)
             st.metric("Total Sesiones Tomadas (SQL1, SQL2, MQL)", f"{total_sesiones_tomadas:,}")
 
-            sql_counts_tomadas = sesiones_tomadas_df['SQL_Estandarizado'].value_counts().reset_index()
+            sql_counts_tomadas = sesiones_tomadas_df['SQL_Estandarizado'].value_counts().loc[lambda c: c > 0].reset_index()
             sql_counts_tomadas.columns = ['Calificación SQL', 'Número de Sesiones']
 
             sql_counts_tomadas['Porcentaje (%)'] = (sql_counts_tomadas['Número de Sesiones'] / total_sesiones_tomadas * 100).round(1)
@@ -484,7 +446,7 @@ def display_sesiones_summary_sql(df_filtered):
             st.markdown("##### Análisis de Tendencia y Composición Mensual de Sesiones Tomadas")
             if 'AñoMes' in sesiones_tomadas_df.columns and not sesiones_tomadas_df['AñoMes'].dropna().empty:
                 # 1. Preparar los datos base
-                evolucion_df = sesiones_tomadas_df.groupby(['AñoMes', 'SQL_Estandarizado']).size().reset_index(name='Cantidad')
+                evolucion_df = agrupar(sesiones_tomadas_df, ['AñoMes', 'SQL_Estandarizado'], nombre_conteo='Cantidad')
                 evolucion_df = evolucion_df.sort_values('AñoMes')
 
                 # 2. Crear un layout de dos columnas
@@ -511,7 +473,7 @@ def display_sesiones_summary_sql(df_filtered):
                     st.markdown("###### Desglose de Datos Mensuales")
 
                     # Calcular tablas base
-                    tabla_absolutos = evolucion_df.pivot_table(index='AñoMes', columns='SQL_Estandarizado', values='Cantidad').fillna(0).astype(int)
+                    tabla_absolutos = evolucion_df.pivot_table(index='AñoMes', columns='SQL_Estandarizado', values='Cantidad', observed=True).fillna(0).astype(int)
 
                     sql_cols_present_ordered = [cat for cat in category_order_tomadas if cat in tabla_absolutos.columns]
                     for cat in category_order_tomadas:
@@ -554,7 +516,7 @@ def display_analisis_por_dimension(df_filtered, dimension_col, dimension_label,
     top_n_dims_list = dim_totals.index.tolist()
     df_top_n = df_filtered_copy[df_filtered_copy[dimension_col].isin(top_n_dims_list)]
     if df_top_n.empty: st.info(f"No hay datos para el Top {top_n} de {dimension_label}."); return
-    summary_dim_sql = df_top_n.groupby([dimension_col, 'SQL_Estandarizado'], observed=False).size().reset_index(name='Cantidad_SQL')
+    summary_dim_sql = agrupar(df_top_n, [dimension_col, 'SQL_Estandarizado'], nombre_conteo='Cantidad_SQL')
     if summary_dim_sql.empty: st.info(f"No hay datos agregados por {dimension_label} y SQL para el Top {top_n}."); return
     sql_category_order_dim_analysis = get_sql_category_order(summary_dim_sql['SQL_Estandarizado'])
     summary_dim_sql['SQL_Estandarizado'] = pd.Categorical(summary_dim_sql['SQL_Estandarizado'], categories=sql_category_order_dim_analysis, ordered=True)
@@ -571,7 +533,7 @@ def display_analisis_por_dimension(df_filtered, dimension_col, dimension_label,
         st.dataframe(pivot_table_dim.style.format(format_dict_dim), use_container_width=True)
     except Exception as e_pivot: st.warning(f"No se pudo generar la tabla pivot para {dimension_label}: {e_pivot}")
 
-def display_evolucion_sql(df_filtered, time_agg_col, display_label_col_name, chart_title, x_axis_label):
+def display_evolucion_sql(df_filtered, sesiones_cargadas, sesiones_spec, time_agg_col, display_label_col_name, chart_title, x_axis_label):
     st.markdown(f"### 📈 {chart_title}")
     required_cols = ['SQL_Estandarizado', time_agg_col]
     if time_agg_col == 'NumSemana' and ('Año' not in df_filtered.columns or 'NumSemana' not in df_filtered.columns) :
@@ -579,26 +541,22 @@ def display_evolucion_sql(df_filtered, time_agg_col, display_label_col_name, cha
     if df_filtered.empty or not all(col in df_filtered.columns for col in required_cols):
         st.info(f"Datos insuficientes. Columnas requeridas: {required_cols}"); return
 
-    df_agg_evol = df_filtered.copy()
-    group_col_for_plot = time_agg_col
+    # Conteos por periodo y SQL leídos de los acumulados de la carga (las filas sin periodo o SQL no cuentan).
+    time_group_cols = ['Año', 'NumSemana'] if time_agg_col == 'NumSemana' else [time_agg_col]
+    summary_time_sql_evol = resumir_acumulados(sesiones_cargadas["acumulados"], sesiones_cargadas["datos"], sesiones_spec,
+                                               time_group_cols + ['SQL_Estandarizado'], nombre_conteo='Número de Sesiones')
+    if summary_time_sql_evol.empty: st.info(f"No hay datos agregados por {x_axis_label.lower()} y SQL."); return
 
+    group_col_for_plot = time_agg_col
     if time_agg_col == 'NumSemana':
         try:
-            df_agg_evol.dropna(subset=['Año', 'NumSemana'], inplace=True)
-            df_agg_evol['Año'] = df_agg_evol['Año'].astype(int)
-            df_agg_evol['NumSemana'] = df_agg_evol['NumSemana'].astype(int)
-            df_agg_evol[display_label_col_name] = df_agg_evol['Año'].astype(str) + '-S' + df_agg_evol['NumSemana'].astype(str).str.zfill(2)
+            summary_time_sql_evol[display_label_col_name] = summary_time_sql_evol['Año'].astype(int).astype(str) + '-S' + summary_time_sql_evol['NumSemana'].astype(int).astype(str).str.zfill(2)
             group_col_for_plot = display_label_col_name
         except (ValueError, TypeError) as e: st.warning(f"Problema con 'Año'/'NumSemana': {e}"); return
     elif time_agg_col == 'AñoMes':
-        df_agg_evol[display_label_col_name] = df_agg_evol[time_agg_col]
+        summary_time_sql_evol[display_label_col_name] = summary_time_sql_evol[time_agg_col]
         group_col_for_plot = display_label_col_name
-
-    df_agg_evol.dropna(subset=[group_col_for_plot, 'SQL_Estandarizado'], inplace=True)
-    if df_agg_evol.empty: st.info(f"No hay datos válidos para '{group_col_for_plot}' y 'SQL_Estandarizado'."); return
-
-    summary_time_sql_evol = df_agg_evol.groupby([group_col_for_plot, 'SQL_Estandarizado'], observed=False).size().reset_index(name='Número de Sesiones')
-    if summary_time_sql_evol.empty: st.info(f"No hay datos agregados por {x_axis_label.lower()} y SQL."); return
+    summary_time_sql_evol = summary_time_sql_evol[[group_col_for_plot, 'SQL_Estandarizado', 'Número de Sesiones']]
 
     summary_time_sql_evol = summary_time_sql_evol.sort_values(by=[group_col_for_plot])
     sql_category_order_evol = get_sql_category_order(summary_time_sql_evol['SQL_Estandarizado'])
@@ -612,7 +570,7 @@ def display_evolucion_sql(df_filtered, time_agg_col, display_label_col_name, cha
     except Exception as e_evol_sql: st.warning(f"No se pudo generar gráfico de evolución para {x_axis_label}: {e_evol_sql}")
 
 
-def display_ae_monthly_assignments(df_filtered):
+def display_ae_monthly_assignments(df_filtered, sesiones_cargadas, sesiones_spec):
     st.markdown("### 📅 Trazabilidad Mensual de Asignaciones por AE")
     
     if df_filtered.empty or 'AE' not in df_filtered.columns or 'AñoMes' not in df_filtered.columns:
@@ -627,7 +585,7 @@ def display_ae_monthly_assignments(df_filtered):
 
     # --- 1. GRÁFICO DE BARRAS CON TOTALES ---
     st.markdown("##### Total de Sesiones por AE (Periodo Filtrado)")
-    total_ae_counts = df_assignments['AE'].value_counts().reset_index()
+    total_ae_counts = df_assignments['AE'].value_counts().loc[lambda c: c > 0].reset_index()
     total_ae_counts.columns = ['AE', 'Total de Sesiones']
     total_ae_counts = total_ae_counts.sort_values('Total de Sesiones', ascending=True) 
 
@@ -643,10 +601,10 @@ def display_ae_monthly_assignments(df_filtered):
 
     # --- 2. GRÁFICO DE LÍNEAS DE TENDENCIA  ---
     st.markdown("##### Evolución Mensual de Sesiones Asignadas por AE")
-    monthly_assignments = df_assignments.groupby(['AñoMes', 'AE']).size().reset_index(name='Cantidad de Sesiones')
+    monthly_assignments = resumir_acumulados(sesiones_cargadas["acumulados"], sesiones_cargadas["datos"], sesiones_spec, ['AñoMes', 'AE'], nombre_conteo='Cantidad de Sesiones')
     monthly_assignments = monthly_assignments.sort_values('AñoMes')
     
-    ae_total_counts_for_legend = df_assignments['AE'].value_counts()
+    ae_total_counts_for_legend = df_assignments['AE'].value_counts().loc[lambda c: c > 0]
     top_aes = ae_total_counts_for_legend.head(15).index.tolist()
     df_chart = monthly_assignments[monthly_assignments['AE'].isin(top_aes)]
 
@@ -671,7 +629,8 @@ def display_ae_monthly_assignments(df_filtered):
                                                      columns='AñoMes',
                                                      values='Cantidad de Sesiones',
                                                      fill_value=0,
-                                                     aggfunc='sum')
+                                                     aggfunc='sum',
+                                                     observed=True)
 
     if not pivot_table_ae.empty:
    
@@ -716,7 +675,8 @@ def display_tabla_sesiones_detalle(df_filtered):
 
 
 try:
-    df_sesiones_base = load_sesiones_data()
+    sesiones_cargadas = load_sesiones_data()
+    df_sesiones_base = vista_compartida(sesiones_cargadas["datos"])
 except Exception as e:
     st.error(f"Error crítico al cargar datos iniciales: {e}")
     st.stop()
@@ -726,7 +686,8 @@ if df_sesiones_base is None or df_sesiones_base.empty:
     st.stop()
 
 start_f, end_f, year_f, week_f, ae_f, lg_f, pais_f, sql_f_val, proceso_f = sidebar_filters_sesiones(df_sesiones_base)
-df_sesiones_filtered = apply_sesiones_filters(df_sesiones_base, start_f, end_f, year_f, week_f, ae_f, lg_f, pais_f, sql_f_val, proceso_f)
+sesiones_spec = sesiones_filters_spec(start_f, end_f, year_f, week_f, ae_f, lg_f, pais_f, sql_f_val, proceso_f)
+df_sesiones_filtered = aplicar_especificacion(df_sesiones_base, sesiones_spec)
 
 # --- Presentación del Dashboard ---
 display_sesiones_summary_sql(df_sesiones_filtered)
@@ -741,12 +702,12 @@ display_analisis_por_dimension(df_filtered=df_sesiones_filtered, dimension_col="
 st.markdown("---")
 
 
-display_ae_monthly_assignments(df_sesiones_filtered)
+display_ae_monthly_assignments(df_sesiones_filtered, sesiones_cargadas, sesiones_spec)
 st.markdown("---")
 
-display_evolucion_sql(df_sesiones_filtered, 'NumSemana', 'Año-Semana', "Evolución Semanal por Calificación SQL", "Semana del Año")
+display_evolucion_sql(df_sesiones_filtered, sesiones_cargadas, sesiones_spec, 'NumSemana', 'Año-Semana', "Evolución Semanal por Calificación SQL", "Semana del Año")
 st.markdown("---")
-display_evolucion_sql(df_sesiones_filtered, 'AñoMes', 'Año-Mes', "Evolución Mensual por Calificación SQL", "Mes del Año")
+display_evolucion_sql(df_sesiones_filtered, sesiones_cargadas, sesiones_spec, 'AñoMes', 'Año-Mes', "Evolución Mensual por Calificación SQL", "Mes del Año")
 st.markdown("---")
 display_tabla_sesiones_detalle(df_sesiones_filtered)
 
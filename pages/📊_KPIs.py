@@ -1,8 +1,6 @@
 # Prospe/pages/📊_KPIs_Semanales.py
 import streamlit as st
 import pandas as pd
-import gspread
-import datetime
 import plotly.express as px
 import os
 import sys
@@ -10,108 +8,24 @@ import sys
 # --- Configuración Inicial del Proyecto y Título de la Página ---
 st.set_page_config(layout="wide", page_title="KPIs Semanales")
 
+project_root = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos.kpis import TASAS_EMBUDO_KPIS, agregar_tasas, calcular_tasa
+from datos.motor_kpis import obtener_kpis, resumir_kpis
+from filtros.especificacion import aplicar_especificacion, fechas, valores
+
 st.title("📊 Dashboard de KPIs") 
 st.markdown(
     "Análisis de métricas absolutas y tasas de conversión siguiendo el proceso de generación de leads." 
 )
 
-# --- Funciones de Procesamiento de Datos ---
-def parse_kpi_value(value_str, column_name=""):
-    cleaned_val = str(value_str).strip().lower()
-    if not cleaned_val: return 0.0
-    try:
-        num_val = pd.to_numeric(cleaned_val, errors='raise')
-        return 0.0 if pd.isna(num_val) else float(num_val)
-    except ValueError:
-        pass
-    
-    if column_name == "Sesiones agendadas": 
-        affirmative_session_texts = ['vc', 'si', 'sí', 'yes', 'true', '1', '1.0']
-        if cleaned_val in affirmative_session_texts: return 1.0
-        return 0.0
-    else:
-        first_part = cleaned_val.split('-')[0].strip()
-        if not first_part: return 0.0
-        try:
-            num_val_from_part = pd.to_numeric(first_part, errors='raise')
-            return 0.0 if pd.isna(num_val_from_part) else float(num_val_from_part)
-        except ValueError:
-            return 0.0
-
-@st.cache_data(ttl=300)
-def load_weekly_kpis_data():
-    try:
-        creds_from_secrets = st.secrets["gcp_service_account"] 
-        client = gspread.service_account_from_dict(creds_from_secrets)
-    except KeyError:
-        st.error("Error de Configuración (Secrets): Falta la sección [gcp_service_account] o alguna de sus claves en los 'Secrets' de Streamlit (KPIs Semanales).")
-        st.stop()
-    except Exception as e:
-        st.error(f"Error al autenticar con Google Sheets para KPIs Semanales vía Secrets: {e}")
-        st.stop()
-
-    sheet_url_kpis = st.secrets.get(
-        "kpis_sheet_url", 
-        "https://docs.google.com/spreadsheets/d/1vaJ2lPK7hbWsuikjmycPePKRrFXiOrlwXMXOdoXRY60/edit?gid=0#gid=0"
-    )
-    try:
-        sheet = client.open_by_url(sheet_url_kpis).sheet1
-        raw_data = sheet.get_all_values()
-        if not raw_data or len(raw_data) <= 1:
-            st.error(f"No se pudieron obtener datos suficientes de Google Sheets para KPIs Semanales (URL: {sheet_url_kpis}).")
-            return pd.DataFrame() 
-        headers = raw_data[0]
-        rows = raw_data[1:]
-    except gspread.exceptions.SpreadsheetNotFound:
-        st.error(f"Error: No se encontró la hoja de KPIs Semanales en la URL: {sheet_url_kpis}")
-        st.stop()
-    except Exception as e:
-        st.error(f"Error al leer la hoja de Google Sheets para KPIs Semanales (URL: {sheet_url_kpis}): {e}")
-        st.stop()
-
-    cleaned_headers = [str(h).strip() for h in headers]
-    df = pd.DataFrame(rows, columns=cleaned_headers)
-
-    if "Fecha" in df.columns:
-        df["Fecha"] = pd.to_datetime(df["Fecha"], format='%d/%m/%Y', errors='coerce')
-        df.dropna(subset=["Fecha"], inplace=True)
-        if not df.empty:
-            df['Año'] = df['Fecha'].dt.year
-            df['NumSemana'] = df['Fecha'].dt.isocalendar().week.astype(int)
-            df['MesNum'] = df['Fecha'].dt.month
-            df['AñoMes'] = df['Fecha'].dt.strftime('%Y-%m')
-        else:
-            for col_time in ['Año', 'NumSemana', 'MesNum']: df[col_time] = pd.Series(dtype='int')
-            df['AñoMes'] = pd.Series(dtype='str')
-    else:
-        st.warning("Columna 'Fecha' no encontrada (KPIs Semanales). No se podrán aplicar filtros de fecha.")
-        for col_time in ['Año', 'NumSemana', 'MesNum']: df[col_time] = pd.Series(dtype='int')
-        df['AñoMes'] = pd.Series(dtype='str')
-
-    # Orden de KPIs deseado para el procesamiento y como referencia
-    kpi_columns_ordered = ["Invites enviadas", "Mensajes Enviados", "Respuestas", "Sesiones agendadas"]
-    for col_name in kpi_columns_ordered: # Usar el orden definido para asegurar que se procesan si existen
-        if col_name not in df.columns:
-            st.warning(f"Columna KPI '{col_name}' no encontrada (KPIs Semanales). Se creará con ceros.")
-            df[col_name] = 0
-        else:
-            # Asegurarse que la columna se procesa correctamente incluso si ya existe
-            df[col_name] = df[col_name].apply(lambda x: parse_kpi_value(x, column_name=col_name)).astype(int)
-
-
-    string_cols_kpis = ["Mes", "Semana", "Analista", "Región"]
-    for col_str in string_cols_kpis:
-        if col_str not in df.columns:
-            df[col_str] = pd.Series(dtype='str')
-        else:
-            df[col_str] = df[col_str].astype(str).str.strip().fillna("N/D")
-    return df
-
-def calculate_rate(numerator, denominator, round_to=1):
-    if denominator == 0: return 0.0
-    return round((numerator / denominator) * 100, round_to)
-
-df_kpis_semanales_raw = load_weekly_kpis_data()
+# --- Carga de Datos ---
+# Hoja, limpieza y acumulados salen del motor de KPIs (datos/motor_kpis.py), compartidos por todas las sesiones.
+kpis_semanales = obtener_kpis("semanales")
+df_kpis_semanales_raw = kpis_semanales["datos"]
 
 if df_kpis_semanales_raw.empty:
     st.error("El DataFrame de KPIs Semanales está vacío después de la carga. No se puede continuar.")
@@ -215,34 +129,17 @@ def sidebar_filters_kpis(df_options):
     return (st.session_state[START_DATE_KEY], st.session_state[END_DATE_KEY], selected_year_int_for_filtering, st.session_state[WEEK_FILTER_KEY], analista_filter_val, region_filter_val)
 
 
-def apply_kpis_filters(df, start_dt, end_dt, year_val, week_list, analista_list, region_list):
-    df_f = df.copy()
-    if "Fecha" in df_f.columns and pd.api.types.is_datetime64_any_dtype(df_f["Fecha"]):
-        start_dt_date = start_dt.date() if isinstance(start_dt, datetime.datetime) else start_dt
-        end_dt_date = end_dt.date() if isinstance(end_dt, datetime.datetime) else end_dt
-        if start_dt_date and end_dt_date:
-            df_f = df_f[(df_f["Fecha"].dt.date >= start_dt_date) & (df_f["Fecha"].dt.date <= end_dt_date)]
-        elif start_dt_date:
-            df_f = df_f[df_f["Fecha"].dt.date >= start_dt_date]
-        elif end_dt_date:
-            df_f = df_f[df_f["Fecha"].dt.date <= end_dt_date]
-    
-    if year_val is not None and "Año" in df_f.columns:
-        df_f = df_f[df_f["Año"] == year_val]
-    
-    if week_list and "– Todas –" not in week_list and "NumSemana" in df_f.columns:
-        selected_weeks_int = [int(w) for w in week_list if w.isdigit()]
-        if selected_weeks_int:
-            df_f = df_f[df_f["NumSemana"].isin(selected_weeks_int)]
-            
-    if "Analista" in df_f.columns: df_f["Analista"] = df_f["Analista"].astype(str).str.strip().replace('', 'N/D')
-    if "Región" in df_f.columns: df_f["Región"] = df_f["Región"].astype(str).str.strip().replace('', 'N/D')
-
-    if analista_list and "– Todos –" not in analista_list and "Analista" in df_f.columns:
-        df_f = df_f[df_f["Analista"].isin(analista_list)]
-    if region_list and "– Todos –" not in region_list and "Región" in df_f.columns:
-        df_f = df_f[df_f["Región"].isin(region_list)]
-    return df_f
+def kpis_filters_spec(start_dt, end_dt, year_val, week_list, analista_list, region_list):
+    # Analista y Región vacíos llegan del motor como 'N/D', así que se filtran tal cual.
+    # Las semanas llegan como texto; "– Todas –" o ninguna numérica no filtran.
+    selected_weeks_int = [int(w) for w in week_list if w.isdigit()] if week_list and "– Todas –" not in week_list else []
+    return [
+        fechas("Fecha", start_dt or None, end_dt or None),
+        valores("Año", year_val),
+        valores("NumSemana", selected_weeks_int),
+        valores("Analista", analista_list),
+        valores("Región", region_list),
+    ]
 
 def display_filtered_kpis_table(df_filtered):
     st.markdown("### 📝 Datos Detallados Filtrados (Vista General)")
@@ -304,10 +201,10 @@ def display_kpi_summary(df_filtered):
     total_sesiones = metrics.get("Sesiones agendadas", 0)
 
     # Tasas calculadas siguiendo el funnel
-    tasa_mensajes_vs_invites = calculate_rate(total_mensajes, total_invites)
-    tasa_respuestas_vs_mensajes = calculate_rate(total_respuestas, total_mensajes)
-    tasa_sesiones_vs_respuestas = calculate_rate(total_sesiones, total_respuestas)
-    tasa_sesiones_vs_invites_global = calculate_rate(total_sesiones, total_invites) # Tasa de conversión general
+    tasa_mensajes_vs_invites = calcular_tasa(total_mensajes, total_invites)
+    tasa_respuestas_vs_mensajes = calcular_tasa(total_respuestas, total_mensajes)
+    tasa_sesiones_vs_respuestas = calcular_tasa(total_sesiones, total_respuestas)
+    tasa_sesiones_vs_invites_global = calcular_tasa(total_sesiones, total_invites) # Tasa de conversión general
 
     # Iconos para las tasas
     rate_icons = ["📨➡️📤", "📤➡️💬", "💬➡️🤝", "📧➡️🤝"] 
@@ -323,7 +220,7 @@ def display_kpi_summary(df_filtered):
                                 help="Porcentaje de invites iniciales que resultaron en una sesión agendada. (Sesiones agendadas / Invites enviadas)")
 
 
-def display_grouped_breakdown(df_filtered, group_by_col, title_prefix, chart_icon="📊"):
+def display_grouped_breakdown(df_filtered, kpis, kpis_spec, group_by_col, title_prefix, chart_icon="📊"):
     st.markdown(f"### {chart_icon} {title_prefix} - KPIs Absolutos y Tasas")
     if group_by_col not in df_filtered.columns:
         st.warning(f"Columna '{group_by_col}' no encontrada para el desglose.")
@@ -345,25 +242,22 @@ def display_grouped_breakdown(df_filtered, group_by_col, title_prefix, chart_ico
         st.warning(f"No hay columnas de KPI numéricas para desglose por {group_by_col}.")
         return
     
-    df_to_group = df_filtered.copy()
-    df_to_group[group_by_col] = df_to_group[group_by_col].astype(str).str.strip().replace('', 'N/D')
-    
-    if df_to_group.empty or df_to_group[group_by_col].nunique() == 0:
+    if df_filtered.empty or df_filtered[group_by_col].nunique() == 0:
         st.info(f"No hay datos con '{group_by_col}' definido para el desglose en el periodo filtrado.")
         return
         
-    summary_df = df_to_group.groupby(group_by_col, as_index=False)[actual_kpi_cols].sum()
+    # Sumas leídas de los acumulados de la carga cuando los filtros lo permiten.
+    summary_df = resumir_kpis(kpis, kpis_spec, [group_by_col])[[group_by_col] + actual_kpi_cols]
     
-    invites_col = "Invites enviadas"
-    mensajes_col = "Mensajes Enviados"
-    respuestas_col = "Respuestas"
     sesiones_col = "Sesiones agendadas"
     
-    # Calcular tasas basadas en el funnel
-    summary_df[rate_col_names['tasa_mens_inv']] = summary_df.apply(lambda r: calculate_rate(r.get(mensajes_col, 0), r.get(invites_col, 0)), axis=1) if invites_col in summary_df and mensajes_col in summary_df else 0.0
-    summary_df[rate_col_names['tasa_resp_mens']] = summary_df.apply(lambda r: calculate_rate(r.get(respuestas_col, 0), r.get(mensajes_col, 0)), axis=1) if mensajes_col in summary_df and respuestas_col in summary_df else 0.0
-    summary_df[rate_col_names['tasa_agen_resp']] = summary_df.apply(lambda r: calculate_rate(r.get(sesiones_col, 0), r.get(respuestas_col, 0)), axis=1) if respuestas_col in summary_df and sesiones_col in summary_df else 0.0
-    summary_df[rate_col_names['tasa_agen_inv']] = summary_df.apply(lambda r: calculate_rate(r.get(sesiones_col, 0), r.get(invites_col, 0)), axis=1) if invites_col in summary_df and sesiones_col in summary_df else 0.0
+    # Calcular tasas basadas en el funnel (sobre columnas completas; 0 si falta alguna columna)
+    summary_df = agregar_tasas(summary_df, {
+        rate_col_names['tasa_mens_inv']: TASAS_EMBUDO_KPIS['mensajes_invites'],
+        rate_col_names['tasa_resp_mens']: TASAS_EMBUDO_KPIS['respuestas_mensajes'],
+        rate_col_names['tasa_agen_resp']: TASAS_EMBUDO_KPIS['sesiones_respuestas'],
+        rate_col_names['tasa_agen_inv']: TASAS_EMBUDO_KPIS['sesiones_invites'],
+    })
     
     if not summary_df.empty:
         # Ordenar las columnas para la tabla: Agrupador, KPIs en orden de funnel, Tasas en orden de funnel
@@ -404,7 +298,7 @@ def display_grouped_breakdown(df_filtered, group_by_col, title_prefix, chart_ico
             fig_rate_resp.update_layout(title_x=0.5, xaxis_tickangle=-45, yaxis_title=rate_to_plot_resp, xaxis_title=group_by_col, margin=dict(b=150), yaxis_ticksuffix="%")
             st.plotly_chart(fig_rate_resp, use_container_width=True)
 
-def display_time_evolution(df_filtered, time_col_agg, time_col_label, chart_title, x_axis_label, chart_icon="📈"):
+def display_time_evolution(df_filtered, kpis, kpis_spec, time_col_agg, time_col_label, chart_title, x_axis_label, chart_icon="📈"):
     st.markdown(f"### {chart_icon} {chart_title}")
     st.caption(f"KPIs sumados por {x_axis_label.lower()} dentro del período filtrado.")
     required_cols_time = ['Fecha', time_col_agg]
@@ -437,7 +331,7 @@ def display_time_evolution(df_filtered, time_col_agg, time_col_label, chart_titl
         group_by_cols_time = ['Año', 'MesNum', 'AñoMes'] 
         sort_by_cols_time = ['Año', 'MesNum']
         
-    df_agg_time = df_filtered.groupby(group_by_cols_time, as_index=False)[kpi_cols_present_time].sum()
+    df_agg_time = resumir_kpis(kpis, kpis_spec, group_by_cols_time)[group_by_cols_time + kpi_cols_present_time]
     
     if df_agg_time.empty:
         st.info(f"No hay datos agregados para mostrar la evolución por {x_axis_label.lower()}.")
@@ -479,7 +373,7 @@ def display_time_evolution(df_filtered, time_col_agg, time_col_label, chart_titl
         st.plotly_chart(fig_time, use_container_width=True)
 
 
-def display_detailed_weekly_analyst_view(df_filtered, semanas_seleccionadas_para_vista):
+def display_detailed_weekly_analyst_view(df_filtered, kpis, kpis_spec, semanas_seleccionadas_para_vista):
     st.markdown("### 📋 Vista Detallada Semanal por Analista") 
 
     if df_filtered.empty:
@@ -500,18 +394,8 @@ def display_detailed_weekly_analyst_view(df_filtered, semanas_seleccionadas_para
         st.warning(f"Faltan las siguientes columnas necesarias para la vista detallada: {', '.join(missing_cols)}")
         return
 
-    df_work = df_filtered[required_cols].copy()
-
-    # Agregación manteniendo el orden de los KPIs
-    agg_dict = {
-        'Invites enviadas': ('Invites enviadas', 'sum'),
-        'Mensajes Enviados': ('Mensajes Enviados', 'sum'),
-        'Respuestas': ('Respuestas', 'sum'),
-        'Sesiones agendadas': ('Sesiones agendadas', 'sum')
-    }
-    df_analyst_weekly = df_work.groupby(
-        ['Año', 'NumSemana', 'Analista', 'Región'], as_index=False
-    ).agg(**agg_dict) 
+    # Agregación semanal por analista (el acumulado semanal de la carga), en el orden de los KPIs
+    df_analyst_weekly = resumir_kpis(kpis, kpis_spec, ['Año', 'NumSemana', 'Analista', 'Región'])
 
     # Renombrar columnas agregadas para claridad y mantener referencia al funnel
     df_analyst_weekly.rename(columns={
@@ -522,18 +406,12 @@ def display_detailed_weekly_analyst_view(df_filtered, semanas_seleccionadas_para
     }, inplace=True)
     
     # Calcular tasas del funnel
-    df_analyst_weekly['% Mens. / Invite'] = df_analyst_weekly.apply( # Tasa de Mensajes vs Invites
-        lambda x: calculate_rate(x['2. Mensajes Enviados'], x['1. Invites enviadas'], round_to=2), axis=1
-    )
-    df_analyst_weekly['% Resp. / Mensaje'] = df_analyst_weekly.apply( # Tasa de Respuesta vs Mensajes
-        lambda x: calculate_rate(x['3. Respuestas'], x['2. Mensajes Enviados'], round_to=2), axis=1
-    )
-    df_analyst_weekly['% Agend. / Respuesta'] = df_analyst_weekly.apply( # Tasa de Sesiones vs Respuestas (antes '% de aceptación')
-        lambda x: calculate_rate(x['4. Sesiones agendadas'], x['3. Respuestas'], round_to=2), axis=1
-    )
-    df_analyst_weekly['% Agend. / Invite (Global)'] = df_analyst_weekly.apply( # Tasa Global de Sesiones vs Invites
-        lambda x: calculate_rate(x['4. Sesiones agendadas'], x['1. Invites enviadas'], round_to=2), axis=1
-    )
+    df_analyst_weekly = agregar_tasas(df_analyst_weekly, {
+        '% Mens. / Invite': ('2. Mensajes Enviados', '1. Invites enviadas'), # Tasa de Mensajes vs Invites
+        '% Resp. / Mensaje': ('3. Respuestas', '2. Mensajes Enviados'), # Tasa de Respuesta vs Mensajes
+        '% Agend. / Respuesta': ('4. Sesiones agendadas', '3. Respuestas'), # Tasa de Sesiones vs Respuestas (antes '% de aceptación')
+        '% Agend. / Invite (Global)': ('4. Sesiones agendadas', '1. Invites enviadas'), # Tasa Global de Sesiones vs Invites
+    }, decimales=2)
 
 
     df_analyst_weekly_sorted = df_analyst_weekly.sort_values(
@@ -587,12 +465,12 @@ def display_detailed_weekly_analyst_view(df_filtered, semanas_seleccionadas_para
             'Analista': 'Total Semana', 'Región': '', 
             '1. Invites enviadas': total_invites,
             '2. Mensajes Enviados': total_mensajes,
-            '% Mens. / Invite': calculate_rate(total_mensajes, total_invites, round_to=2),
+            '% Mens. / Invite': calcular_tasa(total_mensajes, total_invites, decimales=2),
             '3. Respuestas': total_respuestas,
-            '% Resp. / Mensaje': calculate_rate(total_respuestas, total_mensajes, round_to=2),
+            '% Resp. / Mensaje': calcular_tasa(total_respuestas, total_mensajes, decimales=2),
             '4. Sesiones agendadas': total_sesiones,
-            '% Agend. / Respuesta': calculate_rate(total_sesiones, total_respuestas, round_to=2),
-            '% Agend. / Invite (Global)': calculate_rate(total_sesiones, total_invites, round_to=2)
+            '% Agend. / Respuesta': calcular_tasa(total_sesiones, total_respuestas, decimales=2),
+            '% Agend. / Invite (Global)': calcular_tasa(total_sesiones, total_invites, decimales=2)
         }])
 
         df_final_semana = pd.concat([df_display_analistas, df_fila_total], ignore_index=True)
@@ -609,11 +487,8 @@ if "kpis_page_filtro_Semana_v6" in st.session_state:
     del st.session_state["kpis_page_filtro_Semana_v6"]
 
 start_date_val_kpis, end_date_val_kpis, year_val_kpis, week_val_kpis_sidebar, analista_val_kpis, region_val_kpis = sidebar_filters_kpis(df_kpis_semanales_raw) 
-df_kpis_filtered_page = apply_kpis_filters(df_kpis_semanales_raw, start_date_val_kpis, end_date_val_kpis, year_val_kpis, week_val_kpis_sidebar, analista_val_kpis, region_val_kpis)
-
-if "Analista" in df_kpis_filtered_page.columns and analista_val_kpis and "– Todos –" not in analista_val_kpis:
-    if "N/D" not in analista_val_kpis:
-        df_kpis_filtered_page = df_kpis_filtered_page[~df_kpis_filtered_page["Analista"].isin(['N/D', ''])]
+kpis_spec_page = kpis_filters_spec(start_date_val_kpis, end_date_val_kpis, year_val_kpis, week_val_kpis_sidebar, analista_val_kpis, region_val_kpis)
+df_kpis_filtered_page = aplicar_especificacion(df_kpis_semanales_raw, kpis_spec_page)
 
 # --- Presentación del Dashboard ---
 display_kpi_summary(df_kpis_filtered_page) 
@@ -622,9 +497,9 @@ st.markdown("---")
 # Desgloses por Analista y Región
 col_breakdown1, col_breakdown2 = st.columns(2)
 with col_breakdown1:
-    display_grouped_breakdown(df_kpis_filtered_page, "Analista", "Desglose por Analista", chart_icon="🧑‍💻")
+    display_grouped_breakdown(df_kpis_filtered_page, kpis_semanales, kpis_spec_page, "Analista", "Desglose por Analista", chart_icon="🧑‍💻")
 with col_breakdown2:
-    display_grouped_breakdown(df_kpis_filtered_page, "Región", "Desglose por Región", chart_icon="🌎")
+    display_grouped_breakdown(df_kpis_filtered_page, kpis_semanales, kpis_spec_page, "Región", "Desglose por Región", chart_icon="🌎")
 st.markdown("---")
 
 # Tabla detallada filtrada
@@ -654,13 +529,13 @@ selected_weeks_for_detailed_view = st.multiselect(
     key=DETAILED_VIEW_WEEKS_KEY,
     help="Elige una o más semanas (Año-Semana) para un análisis detallado por analista."
 )
-display_detailed_weekly_analyst_view(df_kpis_filtered_page, selected_weeks_for_detailed_view)
+display_detailed_weekly_analyst_view(df_kpis_filtered_page, kpis_semanales, kpis_spec_page, selected_weeks_for_detailed_view)
 st.markdown("---")
 
 # Evoluciones temporales
-display_time_evolution(df_kpis_filtered_page, 'NumSemana', 'Año-Semana', "Evolución Semanal de KPIs", "Semana", chart_icon="🗓️")
+display_time_evolution(df_kpis_filtered_page, kpis_semanales, kpis_spec_page, 'NumSemana', 'Año-Semana', "Evolución Semanal de KPIs", "Semana", chart_icon="🗓️")
 st.markdown("---")
-display_time_evolution(df_kpis_filtered_page, 'AñoMes', 'AñoMes', "Evolución Mensual de KPIs", "Mes (Año-Mes)", chart_icon="📈")
+display_time_evolution(df_kpis_filtered_page, kpis_semanales, kpis_spec_page, 'AñoMes', 'AñoMes', "Evolución Mensual de KPIs", "Mes (Año-Mes)", chart_icon="📈")
 
 
 
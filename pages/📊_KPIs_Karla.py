@@ -1,7 +1,6 @@
 # pages/📊_KPIs_Karla.py
 import streamlit as st
 import pandas as pd
-import gspread
 import datetime
 import plotly.express as px
 import os
@@ -10,6 +9,15 @@ import sys
 # --- Configuración Inicial ---
 st.set_page_config(layout="wide", page_title="KPIs Karla (USA)")
 
+project_root = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos.kpis import TASAS_EMBUDO_KPIS, agregar_tasas, calcular_tasa
+from datos.motor_kpis import obtener_kpis, resumir_kpis
+from filtros.especificacion import aplicar_especificacion, fechas, valores
+
 st.title("📊 Dashboard de KPIs - Karla (USA)")
 st.markdown("Análisis detallado de métricas y embudo de conversión United States - Karla.")
 
@@ -18,97 +26,10 @@ DETAILED_VIEW_WEEKS_KEY = "karla_detailed_view_weeks_v2"
 if DETAILED_VIEW_WEEKS_KEY not in st.session_state:
     st.session_state[DETAILED_VIEW_WEEKS_KEY] = []
 
-# --- Funciones de Procesamiento (VALIDACIÓN ORIGINAL) ---
-def parse_kpi_value(value_str, column_name=""):
-    """
-    Limpia valores asegurando que si no hay dato se tome como 0.
-    Misma lógica que en el archivo original de KPIs.
-    """
-    cleaned_val = str(value_str).strip().lower()
-    if not cleaned_val: return 0.0
-    try:
-        num_val = pd.to_numeric(cleaned_val, errors='raise')
-        return 0.0 if pd.isna(num_val) else float(num_val)
-    except ValueError:
-        pass
-    
-    # Lógica específica para columnas booleanas o texto mixto
-    if column_name == "Sesiones agendadas": 
-        affirmative_session_texts = ['vc', 'si', 'sí', 'yes', 'true', '1', '1.0']
-        if cleaned_val in affirmative_session_texts: return 1.0
-        return 0.0
-    else:
-        first_part = cleaned_val.split('-')[0].strip()
-        if not first_part: return 0.0
-        try:
-            num_val_from_part = pd.to_numeric(first_part, errors='raise')
-            return 0.0 if pd.isna(num_val_from_part) else float(num_val_from_part)
-        except ValueError:
-            return 0.0
-
-def calculate_rate(numerator, denominator, round_to=1):
-    """Calcula tasa de conversión manejando división por cero."""
-    if denominator == 0: return 0.0
-    return round((numerator / denominator) * 100, round_to)
-
-@st.cache_data(ttl=300)
-def load_karla_data():
-    try:
-        creds_from_secrets = st.secrets["gcp_service_account"] 
-        client = gspread.service_account_from_dict(creds_from_secrets)
-    except Exception as e:
-        st.error(f"Error de credenciales: {e}")
-        st.stop()
-
-    sheet_url = st.secrets.get("karla_sheet_url")
-    if not sheet_url:
-        st.error("Falta 'karla_sheet_url' en secrets.")
-        st.stop()
-
-    try:
-        sheet = client.open_by_url(sheet_url).worksheet("Kpis")
-        raw_data = sheet.get_all_values()
-        if len(raw_data) <= 1:
-            return pd.DataFrame() 
-        headers = raw_data[0]
-        rows = raw_data[1:]
-        df = pd.DataFrame(rows, columns=[str(h).strip() for h in headers])
-    except Exception as e:
-        st.error(f"Error leyendo hoja Karla: {e}")
-        st.stop()
-
-    # Procesar Fecha
-    if "Fecha" in df.columns:
-        df["Fecha"] = pd.to_datetime(df["Fecha"], format='%d/%m/%Y', errors='coerce')
-        df.dropna(subset=["Fecha"], inplace=True)
-        if not df.empty:
-            df['Año'] = df['Fecha'].dt.year
-            df['NumSemana'] = df['Fecha'].dt.isocalendar().week.astype(int)
-            df['MesNum'] = df['Fecha'].dt.month
-            df['AñoMes'] = df['Fecha'].dt.strftime('%Y-%m')
-    else:
-        st.warning("Falta columna 'Fecha'.")
-
-    # Procesar Columnas Numéricas con la validación original
-    kpi_columns_ordered = ["Invites enviadas", "Mensajes Enviados", "Respuestas", "Sesiones agendadas"]
-    for col_name in kpi_columns_ordered:
-        if col_name not in df.columns:
-            df[col_name] = 0
-        else:
-            df[col_name] = df[col_name].apply(lambda x: parse_kpi_value(x, column_name=col_name)).astype(int)
-
-    # Limpieza Textos
-    for col in ["Mes", "Semana"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().replace('', 'N/D')
-    
-    # Forzar Analista
-    df["Analista"] = "Karla Hernandez"
-
-    return df
-
 # --- Carga ---
-df_raw = load_karla_data()
+# La hoja 'Kpis' de Karla, limpia y acumulada por el motor de KPIs (datos/motor_kpis.py).
+kpis_karla = obtener_kpis("karla")
+df_raw = kpis_karla["datos"]
 if df_raw.empty: st.stop()
 
 # --- Sidebar Filtros ---
@@ -131,16 +52,12 @@ if "NumSemana" in df_year.columns:
 sel_weeks = st.sidebar.multiselect("Semanas", week_opts, default=["Todas"], key="k_weeks")
 
 # --- Aplicar Filtros ---
-df_filtered = df_raw.copy()
-
-if start_date and end_date and "Fecha" in df_filtered.columns:
-    df_filtered = df_filtered[(df_filtered["Fecha"].dt.date >= start_date) & (df_filtered["Fecha"].dt.date <= end_date)]
-
-if sel_year != "Todos":
-    df_filtered = df_filtered[df_filtered["Año"] == sel_year]
-
-if "Todas" not in sel_weeks:
-    df_filtered = df_filtered[df_filtered["NumSemana"].isin(sel_weeks)]
+karla_spec = [
+    fechas("Fecha", start_date, end_date) if start_date and end_date else None,
+    valores("Año", None if sel_year == "Todos" else sel_year),
+    valores("NumSemana", [] if "Todas" in sel_weeks else sel_weeks),
+]
+df_filtered = aplicar_especificacion(df_raw, karla_spec)
 
 # --- DASHBOARD ---
 
@@ -157,10 +74,10 @@ for i, col in enumerate(kpi_cols):
 
 st.markdown("---")
 # Tasas Totales
-t_msj = calculate_rate(metrics["Mensajes Enviados"], metrics["Invites enviadas"])
-t_resp = calculate_rate(metrics["Respuestas"], metrics["Mensajes Enviados"])
-t_cita = calculate_rate(metrics["Sesiones agendadas"], metrics["Respuestas"])
-t_glob = calculate_rate(metrics["Sesiones agendadas"], metrics["Invites enviadas"])
+t_msj = calcular_tasa(metrics["Mensajes Enviados"], metrics["Invites enviadas"])
+t_resp = calcular_tasa(metrics["Respuestas"], metrics["Mensajes Enviados"])
+t_cita = calcular_tasa(metrics["Sesiones agendadas"], metrics["Respuestas"])
+t_glob = calcular_tasa(metrics["Sesiones agendadas"], metrics["Invites enviadas"])
 
 ct1, ct2, ct3, ct4 = st.columns(4)
 ct1.metric("📨 Tasa Mens./Invite", f"{t_msj:.1f}%")
@@ -196,21 +113,22 @@ if not df_filtered.empty:
     )
 
     if selected_weeks_view:
-        df_filtered['WeekLabel'] = df_filtered['Año'].astype(str) + "-S" + df_filtered['NumSemana'].astype(str).str.zfill(2)
-        df_detail = df_filtered[df_filtered['WeekLabel'].isin(selected_weeks_view)].copy()
-        
-        # Agrupar
-        df_weekly_agg = df_detail.groupby(['WeekLabel', 'Analista'])[kpi_cols].sum().reset_index()
+        # Agrupar (del acumulado semanal de la carga cuando los filtros lo permiten)
+        df_weekly_agg = resumir_kpis(kpis_karla, karla_spec, ['Año', 'NumSemana', 'Analista'])
+        df_weekly_agg.insert(0, 'WeekLabel', df_weekly_agg['Año'].astype(str) + "-S" + df_weekly_agg['NumSemana'].astype(str).str.zfill(2))
+        df_weekly_agg = df_weekly_agg[df_weekly_agg['WeekLabel'].isin(selected_weeks_view)]
         
         # Nombres exactos del original para las columnas calculadas
         df_weekly_agg['1. Invites enviadas'] = df_weekly_agg['Invites enviadas']
         df_weekly_agg['2. Mensajes Enviados'] = df_weekly_agg['Mensajes Enviados']
-        df_weekly_agg['% Mens. / Invite'] = df_weekly_agg.apply(lambda x: calculate_rate(x['Mensajes Enviados'], x['Invites enviadas']), axis=1)
         df_weekly_agg['3. Respuestas'] = df_weekly_agg['Respuestas']
-        df_weekly_agg['% Resp. / Mensaje'] = df_weekly_agg.apply(lambda x: calculate_rate(x['Respuestas'], x['Mensajes Enviados']), axis=1)
         df_weekly_agg['4. Sesiones agendadas'] = df_weekly_agg['Sesiones agendadas']
-        df_weekly_agg['% Agend. / Respuesta'] = df_weekly_agg.apply(lambda x: calculate_rate(x['Sesiones agendadas'], x['Respuestas']), axis=1)
-        df_weekly_agg['% Agend. / Invite (Global)'] = df_weekly_agg.apply(lambda x: calculate_rate(x['Sesiones agendadas'], x['Invites enviadas']), axis=1)
+        df_weekly_agg = agregar_tasas(df_weekly_agg, {
+            '% Mens. / Invite': TASAS_EMBUDO_KPIS['mensajes_invites'],
+            '% Resp. / Mensaje': TASAS_EMBUDO_KPIS['respuestas_mensajes'],
+            '% Agend. / Respuesta': TASAS_EMBUDO_KPIS['sesiones_respuestas'],
+            '% Agend. / Invite (Global)': TASAS_EMBUDO_KPIS['sesiones_invites'],
+        })
         
         for week in selected_weeks_view:
             st.markdown(f"#### {week}")
@@ -230,10 +148,10 @@ if not df_filtered.empty:
                 t_respuestas = week_data['3. Respuestas'].sum()
                 t_sesiones = week_data['4. Sesiones agendadas'].sum()
 
-                r_mens_inv = calculate_rate(t_mensajes, t_invites, round_to=2)
-                r_resp_msj = calculate_rate(t_respuestas, t_mensajes, round_to=2)
-                r_cita_resp = calculate_rate(t_sesiones, t_respuestas, round_to=2)
-                r_global = calculate_rate(t_sesiones, t_invites, round_to=2)
+                r_mens_inv = calcular_tasa(t_mensajes, t_invites, decimales=2)
+                r_resp_msj = calcular_tasa(t_respuestas, t_mensajes, decimales=2)
+                r_cita_resp = calcular_tasa(t_sesiones, t_respuestas, decimales=2)
+                r_global = calcular_tasa(t_sesiones, t_invites, decimales=2)
 
                 total_row = pd.DataFrame([{
                     'Analista': 'Total Semana',
@@ -269,13 +187,13 @@ if not df_filtered.empty:
     tab_w, tab_m = st.tabs(["Semanas", "Meses"])
     
     with tab_w:
-        df_w = df_filtered.groupby(["Año", "NumSemana"])[kpi_cols].sum().reset_index()
+        df_w = resumir_kpis(kpis_karla, karla_spec, ["Año", "NumSemana"])
         df_w["Semana"] = df_w["Año"].astype(str) + "-S" + df_w["NumSemana"].astype(str).str.zfill(2)
         df_w = df_w.sort_values(["Año", "NumSemana"])
         fig_w = px.line(df_w, x="Semana", y=kpi_cols, markers=True, title="Evolución Semanal")
         st.plotly_chart(fig_w, use_container_width=True)
         
     with tab_m:
-        df_m = df_filtered.groupby("AñoMes")[kpi_cols].sum().reset_index().sort_values("AñoMes")
+        df_m = resumir_kpis(kpis_karla, karla_spec, ["AñoMes"])
         fig_m = px.line(df_m, x="AñoMes", y=kpi_cols, markers=True, title="Evolución Mensual")
         st.plotly_chart(fig_m, use_container_width=True)
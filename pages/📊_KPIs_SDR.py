@@ -1,130 +1,31 @@
 # pages/📊_KPIs_SDR.py
 import streamlit as st
 import pandas as pd
-import gspread
-import datetime
 import plotly.express as px
+import os
+import sys
 
 # --- Configuración Inicial de la Página ---
 st.set_page_config(layout="wide", page_title="KPIs SDR (Evelyn)")
+
+project_root = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from datos.kpis import calcular_tasa
+from datos.motor_kpis import obtener_kpis, resumir_kpis
+from filtros.especificacion import aplicar_especificacion, fechas, valores
+
 st.title("📊 Dashboard de KPIs de SDR (Evelyn)")
 st.markdown(
     "Análisis de métricas absolutas y tasas de conversión para el SDR."
 )
 
-# --- Funciones de Procesamiento de Datos ---
-
-def parse_kpi_value(value_str, column_name=""):
-    """
-    Parsea un valor de KPI, que puede ser numérico o de texto ('si', 'vc', etc.),
-    a un valor numérico flotante.
-    """
-    cleaned_val = str(value_str).strip().lower()
-    if not cleaned_val: return 0.0
-    try:
-        # Intenta convertir directamente a número
-        num_val = pd.to_numeric(cleaned_val, errors='raise')
-        return 0.0 if pd.isna(num_val) else float(num_val)
-    except ValueError:
-        # Si falla, procesa como texto
-        pass
-    
-    # Lógica especial para columnas que pueden tener texto afirmativo
-    if column_name == "Sesiones agendadas":
-        affirmative_session_texts = ['vc', 'si', 'sí', 'yes', 'true', '1', '1.0']
-        if cleaned_val in affirmative_session_texts: return 1.0
-        return 0.0
-    else:
-        # Intenta extraer un número de una cadena (ej. '1 - Realizada')
-        first_part = cleaned_val.split('-')[0].strip()
-        if not first_part: return 0.0
-        try:
-            num_val_from_part = pd.to_numeric(first_part, errors='raise')
-            return 0.0 if pd.isna(num_val_from_part) else float(num_val_from_part)
-        except ValueError:
-            return 0.0
-
-@st.cache_data(ttl=300)
-def load_sdr_kpi_data():
-    """
-    Carga los datos de KPIs para el SDR desde la hoja 'KPI's SDR'.
-    """
-    try:
-        creds_from_secrets = st.secrets["gcp_service_account"]
-        client = gspread.service_account_from_dict(creds_from_secrets)
-    except KeyError:
-        st.error("Error de Configuración (Secrets): Falta la sección [gcp_service_account] en los 'Secrets' de Streamlit.")
-        st.stop()
-    except Exception as e:
-        st.error(f"Error al autenticar con Google Sheets para KPIs de SDR: {e}")
-        st.stop()
-
-    sheet_url_kpis = st.secrets.get(
-    "main_prostraction_sheet_url",
-    "https://docs.google.com/spreadsheets/d/1_J_WLYf2cjiKp2JTxsFj1KYoGTzPA730Bw3YP4-q7Fs/edit?gid=0#gid=0"
-    )
-    
-    try:
-        workbook = client.open_by_url(sheet_url_kpis)
-     
-        sheet = workbook.worksheet("KPI´s SDR") 
-        
-        raw_data = sheet.get_all_values()
-        if not raw_data or len(raw_data) <= 1:
-            st.error(f"No se pudieron obtener datos suficientes de la hoja 'KPI´s SDR'.")
-            return pd.DataFrame()
-        headers = raw_data[0]
-        rows = raw_data[1:]
-    except gspread.exceptions.WorksheetNotFound:
-        st.error(f"Error: No se encontró la hoja de cálculo 'KPI´s SDR' en el Google Sheet.")
-        st.stop()
-    except Exception as e:
-        st.error(f"Error al leer la hoja 'KPI´s SDR': {e}")
-        st.stop()
-
-    cleaned_headers = [str(h).strip() for h in headers]
-    df = pd.DataFrame(rows, columns=cleaned_headers)
-
-    if "Fecha" in df.columns:
-        df["Fecha"] = pd.to_datetime(df["Fecha"], format='%d/%m/%Y', errors='coerce')
-        df.dropna(subset=["Fecha"], inplace=True)
-        if not df.empty:
-            df['Año'] = df['Fecha'].dt.year
-            df['NumSemana'] = df['Fecha'].dt.isocalendar().week.astype(int)
-            df['MesNum'] = df['Fecha'].dt.month
-            df['AñoMes'] = df['Fecha'].dt.strftime('%Y-%m')
-        else:
-            for col_time in ['Año', 'NumSemana', 'MesNum']: df[col_time] = pd.Series(dtype='int')
-            df['AñoMes'] = pd.Series(dtype='str')
-    else:
-        st.warning("Columna 'Fecha' no encontrada. No se podrán aplicar filtros de fecha.")
-        for col_time in ['Año', 'NumSemana', 'MesNum']: df[col_time] = pd.Series(dtype='int')
-        df['AñoMes'] = pd.Series(dtype='str')
-
-    kpi_columns_ordered = ["Invites enviadas", "Mensajes Enviados", "Respuestas", "Sesiones agendadas"]
-    for col_name in kpi_columns_ordered:
-        if col_name not in df.columns:
-            st.warning(f"Columna KPI '{col_name}' no encontrada. Se creará con ceros.")
-            df[col_name] = 0
-        else:
-            df[col_name] = df[col_name].apply(lambda x: parse_kpi_value(x, column_name=col_name)).astype(int)
-
-    string_cols_kpis = ["Mes", "Semana", "Analista", "Región"]
-    for col_str in string_cols_kpis:
-        if col_str not in df.columns:
-            df[col_str] = pd.Series(dtype='str')
-        else:
-            df[col_str] = df[col_str].astype(str).str.strip().fillna("N/D")
-    
-    return df
-
-def calculate_rate(numerator, denominator, round_to=1):
-    """Calcula una tasa como porcentaje, manejando la división por cero."""
-    if denominator == 0: return 0.0
-    return round((numerator / denominator) * 100, round_to)
-
 # --- Carga de Datos ---
-df_kpis_sdr_raw = load_sdr_kpi_data()
+# La pestaña 'KPI´s SDR' del dataset maestro, limpia y acumulada por el motor de KPIs (datos/motor_kpis.py).
+kpis_sdr = obtener_kpis("sdr")
+df_kpis_sdr_raw = kpis_sdr["datos"]
 
 if df_kpis_sdr_raw.empty:
     st.error("El DataFrame de KPIs de SDR está vacío después de la carga. No se puede continuar.")
@@ -199,21 +100,14 @@ def sidebar_filters_sdr(df_options):
     return (st.session_state[START_DATE_KEY], st.session_state[END_DATE_KEY], selected_year_int,
             st.session_state[WEEK_FILTER_KEY], st.session_state[ANALISTA_FILTER_KEY], st.session_state[REGION_FILTER_KEY])
 
-def apply_sdr_filters(df, start_dt, end_dt, year_val, week_list, analista_list, region_list):
-    """Aplica todos los filtros al DataFrame."""
-    df_f = df.copy()
-    if "Fecha" in df_f.columns and pd.api.types.is_datetime64_any_dtype(df_f["Fecha"]):
-        start_dt_date = start_dt.date() if isinstance(start_dt, datetime.datetime) else start_dt
-        end_dt_date = end_dt.date() if isinstance(end_dt, datetime.datetime) else end_dt
-        if start_dt_date and end_dt_date:
-            df_f = df_f[(df_f["Fecha"].dt.date >= start_dt_date) & (df_f["Fecha"].dt.date <= end_dt_date)]
-    
-    if analista_list and "– Todos –" not in analista_list and "Analista" in df_f.columns:
-        df_f = df_f[df_f["Analista"].isin(analista_list)]
-    if region_list and "– Todos –" not in region_list and "Región" in df_f.columns:
-        df_f = df_f[df_f["Región"].isin(region_list)]
-        
-    return df_f
+def sdr_filters_spec(start_dt, end_dt, year_val, week_list, analista_list, region_list):
+    """Los filtros de la barra lateral como especificación (filtros.especificacion)."""
+    # El rango de fechas solo se aplica con los dos extremos elegidos.
+    return [
+        fechas("Fecha", start_dt, end_dt) if start_dt and end_dt else None,
+        valores("Analista", analista_list),
+        valores("Región", region_list),
+    ]
 
 # --- Componentes de Visualización  ---
 def display_kpi_summary(df_filtered):
@@ -236,10 +130,10 @@ def display_kpi_summary(df_filtered):
     total_respuestas = metrics.get("Respuestas", 0)
     total_sesiones = metrics.get("Sesiones agendadas", 0)
 
-    tasa_mensajes_vs_invites = calculate_rate(total_mensajes, total_invites)
-    tasa_respuestas_vs_mensajes = calculate_rate(total_respuestas, total_mensajes)
-    tasa_sesiones_vs_respuestas = calculate_rate(total_sesiones, total_respuestas)
-    tasa_sesiones_vs_invites_global = calculate_rate(total_sesiones, total_invites)
+    tasa_mensajes_vs_invites = calcular_tasa(total_mensajes, total_invites)
+    tasa_respuestas_vs_mensajes = calcular_tasa(total_respuestas, total_mensajes)
+    tasa_sesiones_vs_respuestas = calcular_tasa(total_sesiones, total_respuestas)
+    tasa_sesiones_vs_invites_global = calcular_tasa(total_sesiones, total_invites)
 
     rate_icons = ["📨➡️📤", "📤➡️💬", "💬➡️🤝", "📧➡️🤝"]
     col_metrics_rates = st.columns(4)
@@ -248,14 +142,14 @@ def display_kpi_summary(df_filtered):
     col_metrics_rates[2].metric(f"{rate_icons[2]} Tasa Agend. / Respuesta", f"{tasa_sesiones_vs_respuestas:.1f}%")
     col_metrics_rates[3].metric(f"{rate_icons[3]} Tasa Agend. / Invite (Global)", f"{tasa_sesiones_vs_invites_global:.1f}%")
 
-def display_grouped_breakdown(df_filtered, group_by_col, title_prefix, chart_icon="📊"):
+def display_grouped_breakdown(df_filtered, kpis, sdr_spec, group_by_col, title_prefix, chart_icon="📊"):
     st.markdown(f"### {chart_icon} {title_prefix}")
     if group_by_col not in df_filtered.columns or df_filtered.empty:
         st.warning(f"No hay datos o falta la columna '{group_by_col}'.")
         return
         
     kpi_cols_funnel = ["Invites enviadas", "Mensajes Enviados", "Respuestas", "Sesiones agendadas"]
-    summary_df = df_filtered.groupby(group_by_col, as_index=False)[kpi_cols_funnel].sum()
+    summary_df = resumir_kpis(kpis, sdr_spec, [group_by_col])[[group_by_col] + kpi_cols_funnel]
     
     if not summary_df.empty:
         st.markdown(f"##### Tabla Resumen por {group_by_col}")
@@ -266,18 +160,17 @@ def display_grouped_breakdown(df_filtered, group_by_col, title_prefix, chart_ico
 # --- Flujo Principal de la Página ---
 start_date_val, end_date_val, year_val, week_val, analista_val, region_val = sidebar_filters_sdr(df_kpis_sdr_raw)
 
-df_kpis_sdr_filtered = apply_sdr_filters(
-    df_kpis_sdr_raw, start_date_val, end_date_val, year_val, week_val, analista_val, region_val
-)
+sdr_spec = sdr_filters_spec(start_date_val, end_date_val, year_val, week_val, analista_val, region_val)
+df_kpis_sdr_filtered = aplicar_especificacion(df_kpis_sdr_raw, sdr_spec)
 
 # --- Presentación del Dashboard ---
 if not df_kpis_sdr_filtered.empty:
     display_kpi_summary(df_kpis_sdr_filtered)
     st.markdown("---")
     
-    display_grouped_breakdown(df_kpis_sdr_filtered, "Analista", "Desglose por Analista", chart_icon="🧑‍💻")
+    display_grouped_breakdown(df_kpis_sdr_filtered, kpis_sdr, sdr_spec, "Analista", "Desglose por Analista", chart_icon="🧑‍💻")
     st.markdown("---")
-    display_grouped_breakdown(df_kpis_sdr_filtered, "Región", "Desglose por Región", chart_icon="🌎")
+    display_grouped_breakdown(df_kpis_sdr_filtered, kpis_sdr, sdr_spec, "Región", "Desglose por Región", chart_icon="🌎")
     st.markdown("---")
 
     with st.expander("Ver tabla de datos detallados del período filtrado"):
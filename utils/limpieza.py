@@ -1,20 +1,75 @@
+import numpy as np
 import pandas as pd
 
 def limpiar_valor_kpi(val):
     return str(val).strip().lower() if pd.notna(val) else "no"
 
+def limpiar_valores_kpi(serie):
+    """limpiar_valor_kpi aplicado a toda una columna de una vez."""
+    return serie.astype(object).where(serie.notna(), "no").astype(str).str.strip().str.lower()
+
+VALORES_SIN_RESPUESTA = ["no", "", "nan"]
+
+# Columnas booleanas del embudo. El cargador las añade una vez por versión
+# del dataset (agregar_columnas_embudo) y los componentes solo las suman.
+EMBUDO_INVITE_ACEPTADA = "_embudo_invite_aceptada"
+EMBUDO_PRIMER_MENSAJE = "_embudo_primer_mensaje"
+EMBUDO_RESPUESTA = "_embudo_respuesta"
+EMBUDO_SESION = "_embudo_sesion"
+EMBUDO_OPORTUNIDAD = "_embudo_oportunidad"
+COLUMNAS_EMBUDO = [EMBUDO_INVITE_ACEPTADA, EMBUDO_PRIMER_MENSAJE, EMBUDO_RESPUESTA,
+                   EMBUDO_SESION, EMBUDO_OPORTUNIDAD]
+
+def agregar_columnas_embudo(df):
+    """
+    Añade a `df` las columnas EMBUDO_* con los mismos criterios que
+    limpiar_valor_kpi: invite aceptada y sesión agendada si valen "si";
+    primer mensaje y respuesta si no están vacíos ni son "no". Una
+    oportunidad es una invite aceptada con respuesta y sesión en "no".
+    Si falta la columna de origen, la del embudo queda en False.
+    """
+    def valores(columna):
+        if columna in df.columns:
+            return limpiar_valores_kpi(df[columna])
+        return pd.Series("", index=df.index)
+
+    sesion = valores("Sesion Agendada?")
+    df[EMBUDO_INVITE_ACEPTADA] = valores("¿Invite Aceptada?") == "si"
+    df[EMBUDO_PRIMER_MENSAJE] = ~valores("Fecha Primer Mensaje").isin(VALORES_SIN_RESPUESTA)
+    df[EMBUDO_RESPUESTA] = ~valores("Respuesta Primer Mensaje").isin(VALORES_SIN_RESPUESTA)
+    df[EMBUDO_SESION] = sesion == "si"
+    df[EMBUDO_OPORTUNIDAD] = df[EMBUDO_INVITE_ACEPTADA] & df[EMBUDO_RESPUESTA] & (sesion == "no")
+    return df
+
+def contar_embudo(df):
+    """Totales del embudo de `df`, que debe traer las columnas de agregar_columnas_embudo."""
+    def contar(columna):
+        return int(np.count_nonzero(df[columna].to_numpy(dtype=bool)))
+
+    return {
+        "total": len(df),
+        "inv_acept": contar(EMBUDO_INVITE_ACEPTADA),
+        "primeros_mensajes_enviados_count": contar(EMBUDO_PRIMER_MENSAJE),
+        "resp_primer": contar(EMBUDO_RESPUESTA),
+        "sesiones": contar(EMBUDO_SESION),
+        "oportunidades": contar(EMBUDO_OPORTUNIDAD),
+    }
+
 def limpiar_nombre_completo(nombre, apellido):
     return (str(nombre).strip() + " " + str(apellido).strip()).lower()
 
+# Alias de Avatar (ya en formato título) -> nombre canónico. Los cargadores lo
+# aplican sobre las categorías de la columna (datos/esquemas.py).
+EQUIVALENCIAS_AVATAR = {
+    "Jonh Fenner": "John Bermúdez",
+    "Jonh Bermúdez": "John Bermúdez",
+    "Jonh": "John Bermúdez",
+    "John Fenner": "John Bermúdez"
+}
+
 def estandarizar_avatar(avatar):
     avatar = str(avatar).strip().title()
-    equivalencias = {
-        "Jonh Fenner": "John Bermúdez",
-        "Jonh Bermúdez": "John Bermúdez",
-        "Jonh": "John Bermúdez",
-        "John Fenner": "John Bermúdez"
-    }
-    return equivalencias.get(avatar, avatar)
+    return EQUIVALENCIAS_AVATAR.get(avatar, avatar)
 
 def calcular_dias_respuesta(df):
     return df
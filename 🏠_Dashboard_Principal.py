@@ -1,7 +1,6 @@
 # Proyecto/🏠_Dashboard_Principal.py
 
 import streamlit as st
-import pandas as pd
 import sys
 import os
 import shutil
@@ -21,9 +20,13 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # --- IMPORTS MODULARES ---
-from datos.carga_datos import cargar_y_limpiar_datos, cargar_y_procesar_datos
+from datos.carga_datos import construir_datos_base, obtener_vista, cargar_y_procesar_datos
+from datos.cubo_embudo import construir_cubo_embudo, obtener_conteos_embudo
 from filtros.filtros_sidebar import mostrar_filtros_sidebar
-from filtros.aplicar_filtros import aplicar_filtros
+from filtros.cache_filtros import filtrar_con_cache
+from filtros.busqueda_difusa import admite_busqueda_difusa, buscar_similares, obtener_indice_difuso
+from filtros.indice_busqueda import filtrar_busqueda, obtener_indice_busqueda
+from filtros.indice_filtros import obtener_indice_filtros
 from componentes.tabla_prospectos import mostrar_tabla_filtrada
 from componentes.indicadores_kpis import mostrar_kpis
 from componentes.embudo_conversion import mostrar_embudo
@@ -34,7 +37,7 @@ from componentes.analisis_avatars import mostrar_analisis_por_avatar
 from componentes.analisis_prospectadores import mostrar_analisis_por_prospectador 
 from componentes.oportunidades_calientes import mostrar_oportunidades_calientes
 
-from utils.limpieza import limpiar_valor_kpi
+from utils.limpieza import COLUMNAS_EMBUDO, contar_embudo
 
 # --- CONFIGURACIÓN GENERAL ---
 st.set_page_config(page_title="Dashboard", 
@@ -66,58 +69,69 @@ Explora métricas clave y gestiona tus leads.
 """)
 
 # --- CARGA DE DATOS ---
-@st.cache_data
-def get_processed_data():
-    df_base_loaded = cargar_y_limpiar_datos()
-    if df_base_loaded is None or df_base_loaded.empty:
-        return pd.DataFrame()
-    df_processed_loaded = cargar_y_procesar_datos(df_base_loaded.copy())
-    return df_processed_loaded
+# Se procesa una vez por versión del dataset maestro y todas las sesiones
+# comparten el resultado; cada una recibe una vista sin copia de los datos.
+# La vista limpia (con las columnas del embudo) se guarda en disco: al
+# reiniciar se sirve sin volver a limpiar la hoja.
+def build_dashboard_view(hojas):
+    df_base_loaded = construir_datos_base(hojas)
+    if df_base_loaded.empty:
+        return df_base_loaded
+    return cargar_y_procesar_datos(df_base_loaded)
 
 
-df_global = get_processed_data()
+df_global, version_datos = obtener_vista("dashboard", build_dashboard_view, persistir=True)
 
 if df_global.empty:
     st.error("No se pudieron cargar datos. El dashboard no puede continuar.")
     st.stop()
 
 # --- CÁLCULO DE MÉTRICAS BASE ---
-total_base = len(df_global)
-base_inv_acept = sum(limpiar_valor_kpi(x) == "si" for x in df_global["¿Invite Aceptada?"]) if "¿Invite Aceptada?" in df_global.columns else 0
-base_primeros_mensajes_enviados_count = sum(pd.notna(x) and str(x).strip().lower() not in ["no", "", "nan"] for x in df_global["Fecha Primer Mensaje"]) if "Fecha Primer Mensaje" in df_global.columns else 0
-base_resp_primer = sum(limpiar_valor_kpi(x) not in ["no", "", "nan"] for x in df_global["Respuesta Primer Mensaje"]) if "Respuesta Primer Mensaje" in df_global.columns else 0
-base_sesiones = sum(limpiar_valor_kpi(x) == "si" for x in df_global["Sesion Agendada?"]) if "Sesion Agendada?" in df_global.columns else 0
+# Solo cambian con el dataset: se cuentan una vez por versión.
+conteos_base = obtener_conteos_embudo(df_global, "dashboard", version_datos)
 
 base_kpis_counts = {
-    "total_base": total_base, "inv_acept": base_inv_acept,
-    "primeros_mensajes_enviados_count": base_primeros_mensajes_enviados_count,
-    "resp_primer": base_resp_primer, "sesiones": base_sesiones
+    "total_base": conteos_base["total"], "inv_acept": conteos_base["inv_acept"],
+    "primeros_mensajes_enviados_count": conteos_base["primeros_mensajes_enviados_count"],
+    "resp_primer": conteos_base["resp_primer"], "sesiones": conteos_base["sesiones"]
 }
 
 # --- FILTROS Y PROCESAMIENTO ---
+# Índices de la versión actual: opciones y conteos de la barra lateral y el filtrado,
+# y los trigramas de la búsqueda aproximada, construidos al cargar la versión y no
+# en la primera búsqueda.
+indice_filtros = obtener_indice_filtros(df_global, "dashboard", version_datos)
+indice_difuso = obtener_indice_difuso(df_global, "dashboard", version_datos)
 (filtro_fuente_lista, filtro_proceso, filtro_pais, filtro_industria,
  filtro_avatar, filtro_prospectador, filtro_invite_aceptada_simple,
  filtro_sesion_agendada, fecha_ini, fecha_fin,
- busqueda_texto) = mostrar_filtros_sidebar(df_global.copy())
-
-df_filtrado_sidebar = aplicar_filtros(
-    df_global.copy(), filtro_fuente_lista, filtro_proceso, filtro_pais,
-    filtro_industria, filtro_avatar, filtro_prospectador,
-    filtro_invite_aceptada_simple, filtro_sesion_agendada, fecha_ini,
-    fecha_fin)
-
-df_kpis = df_filtrado_sidebar.copy()
-df_tabla_detalle = df_filtrado_sidebar.copy()
-
-if busqueda_texto:
-    busq_term = busqueda_texto.lower().strip()
-    if busq_term:
-        mask = pd.Series([False] * len(df_tabla_detalle), index=df_tabla_detalle.index)
-        columnas_busqueda = ["Empresa", "Puesto", "Nombre", "Apellido"]
-        for col in columnas_busqueda:
-            if col in df_tabla_detalle.columns:
-                 mask |= df_tabla_detalle[col].astype(str).str.lower().str.contains(busq_term, na=False)
-        df_tabla_detalle = df_tabla_detalle[mask]
+ busqueda_texto, busqueda_difusa) = mostrar_filtros_sidebar(df_global, indice_filtros)
+
+def agregados_embudo(df):
+    # Totales del embudo y su desglose por dimensión (el cubo que leen los análisis de abajo).
+    return {**contar_embudo(df), "cubo": construir_cubo_embudo(df)}
+
+# Volver a una combinación de filtros ya usada (por cualquier sesión) reutiliza
+# las filas, los totales y el cubo del embudo guardados para esta versión del dataset.
+df_filtrado_sidebar, conteos_filtrados = filtrar_con_cache(
+    df_global, indice_filtros, "dashboard", version_datos,
+    (filtro_fuente_lista, filtro_proceso, filtro_pais, filtro_industria,
+     filtro_avatar, filtro_prospectador, filtro_invite_aceptada_simple,
+     filtro_sesion_agendada, fecha_ini, fecha_fin),
+    agregados_embudo)
+cubo_embudo = conteos_filtrados.pop("cubo")
+
+df_kpis = df_filtrado_sidebar
+df_tabla_detalle = df_filtrado_sidebar
+
+# Búsqueda por prefijo de palabra en Empresa/Puesto/Nombre/Apellido, sin distinguir acentos;
+# la aproximada devuelve los prospectos más parecidos por empresa o persona, del más parecido al menos.
+# Si la búsqueda solo tiene formas jurídicas ("sa de cv") no hay con qué comparar y se busca exacto.
+if busqueda_texto and busqueda_difusa and admite_busqueda_difusa(busqueda_texto):
+    df_tabla_detalle = buscar_similares(df_tabla_detalle, indice_difuso, busqueda_texto)
+elif busqueda_texto:
+    df_tabla_detalle = filtrar_busqueda(
+        df_tabla_detalle, obtener_indice_busqueda(df_global, "dashboard", version_datos), busqueda_texto)
 
 # --- RENDERIZADO ---
 
@@ -133,14 +147,14 @@ st.header("📊 Detalle de Prospectos Filtrados")
 
 df_equipo_principal = df_tabla_detalle[df_tabla_detalle['Fuente_Analista'] == 'Equipo Principal']
 st.subheader(f"Prospectos del Equipo Principal ({len(df_equipo_principal)})")
-mostrar_tabla_filtrada(df_equipo_principal, key_suffix="principal")
+mostrar_tabla_filtrada(df_equipo_principal.drop(columns=COLUMNAS_EMBUDO), key_suffix="principal")
 
 st.markdown("<br><br>", unsafe_allow_html=True)
 
 # 2. El resto de tu dashboard, que funciona con datos unificados (df_kpis)
 (filtered_total, filtered_primeros_mensajes_enviados_count, filtered_inv_acept,
  filtered_resp_primer, filtered_sesiones,
- _) = mostrar_kpis(df_kpis, base_kpis_counts, limpiar_valor_kpi)
+ _) = mostrar_kpis(df_kpis, base_kpis_counts, conteos_filtrados)
 
 mostrar_embudo(filtered_total, filtered_inv_acept, filtered_resp_primer,
                filtered_sesiones, filtered_primeros_mensajes_enviados_count,
@@ -151,29 +165,29 @@ mostrar_embudo(filtered_total, filtered_inv_acept, filtered_resp_primer,
 st.header("💡 ¿Dónde Enfocar tus Esfuerzos de Prospección?")
 
 if "Industria" in df_kpis.columns:
-    mostrar_analisis_dimension_agendamiento_flexible(df_kpis, "Industria", "Industrias", top_n_grafico=10, mostrar_tabla_completa=False)
+    mostrar_analisis_dimension_agendamiento_flexible(df_kpis, "Industria", "Industrias", top_n_grafico=10, mostrar_tabla_completa=False, cubo=cubo_embudo)
 else:
     st.caption("Columna 'Industria' no encontrada para análisis.")
 
 if "Pais" in df_kpis.columns:
-    mostrar_analisis_dimension_agendamiento_flexible(df_kpis, "Pais", "Países", top_n_grafico=10, mostrar_tabla_completa=True)
+    mostrar_analisis_dimension_agendamiento_flexible(df_kpis, "Pais", "Países", top_n_grafico=10, mostrar_tabla_completa=True, cubo=cubo_embudo)
 else:
     st.caption("Columna 'Pais' no encontrada para análisis.")
 
 if "Puesto" in df_kpis.columns:
-    mostrar_analisis_dimension_agendamiento_flexible(df_kpis, "Puesto", "Puestos", top_n_grafico=10, mostrar_tabla_completa=False)
+    mostrar_analisis_dimension_agendamiento_flexible(df_kpis, "Puesto", "Puestos", top_n_grafico=10, mostrar_tabla_completa=False, cubo=cubo_embudo)
 else:
     st.caption("Columna 'Puesto' no encontrada para análisis.")
 
 if "Proceso" in df_kpis.columns:
-    mostrar_analisis_procesos_con_prospectador(df_kpis, top_n_grafico_proceso=10, mostrar_tabla_proceso=True)
+    mostrar_analisis_procesos_con_prospectador(df_kpis, top_n_grafico_proceso=10, mostrar_tabla_proceso=True, cubo=cubo_embudo)
 else:
     st.caption("Columna 'Proceso' no encontrada para análisis de procesos.")
 
 # --- SECCIÓN DE ANÁLISIS DE RENDIMIENTO  ---
-mostrar_analisis_por_prospectador(df_kpis)
-mostrar_analisis_por_avatar(df_kpis)
+mostrar_analisis_por_prospectador(df_kpis, cubo_embudo)
+mostrar_analisis_por_avatar(df_kpis, cubo_embudo)
 
-mostrar_resumen_ejecutivo(df_kpis, limpiar_valor_kpi, base_kpis_counts, filtered_sesiones)
+mostrar_resumen_ejecutivo(df_kpis, base_kpis_counts, filtered_sesiones, conteos_filtrados, cubo_embudo)
 
 